@@ -0,0 +1,359 @@
+"""Baseline schema
+
+Every table of the original application, as Base.metadata.create_all made
+them before the session store, outbound queue and migrations were added.
+Databases created that way are marked with ``alembic stamp 0001`` and then
+upgraded; ones that create_all made from the current models already have
+every table and index and are marked with ``alembic stamp head``.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 03:06:14.649363
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('domains',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('imap_server', sa.String(), nullable=False),
+    sa.Column('imap_port', sa.Integer(), nullable=True),
+    sa.Column('smtp_server', sa.String(), nullable=False),
+    sa.Column('smtp_port', sa.Integer(), nullable=True),
+    sa.Column('use_ssl', sa.Boolean(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('theme_config', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_domains_id'), 'domains', ['id'], unique=False)
+    op.create_index(op.f('ix_domains_name'), 'domains', ['name'], unique=True)
+
+    op.create_table('themes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('display_name', sa.String(), nullable=True),
+    sa.Column('css_variables', sa.JSON(), nullable=True),
+    sa.Column('is_default', sa.Boolean(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_themes_id'), 'themes', ['id'], unique=False)
+    op.create_index(op.f('ix_themes_name'), 'themes', ['name'], unique=True)
+
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('hashed_password', sa.String(), nullable=False),
+    sa.Column('full_name', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('is_admin', sa.Boolean(), nullable=True),
+    sa.Column('domain_id', sa.Integer(), nullable=True),
+    sa.Column('theme_preferences', sa.JSON(), nullable=True),
+    sa.Column('storage_quota_mb', sa.Integer(), nullable=True),
+    sa.Column('storage_used_mb', sa.Integer(), nullable=True),
+    sa.Column('email_quota_daily', sa.Integer(), nullable=True),
+    sa.Column('email_sent_today', sa.Integer(), nullable=True),
+    sa.Column('last_quota_reset', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.Column('last_login', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['domain_id'], ['domains.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+
+    op.create_table('chat_channels',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('domain_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('channel_type', sa.Enum('PUBLIC', 'PRIVATE', 'DIRECT_MESSAGE', name='channeltype'), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['domain_id'], ['domains.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_chat_channels_id'), 'chat_channels', ['id'], unique=False)
+
+    op.create_table('contact_groups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('color', sa.String(length=7), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('domain_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['domain_id'], ['domains.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_contact_groups_id'), 'contact_groups', ['id'], unique=False)
+
+    op.create_table('contacts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('first_name', sa.String(length=100), nullable=False),
+    sa.Column('last_name', sa.String(length=100), nullable=True),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('phone', sa.String(length=50), nullable=True),
+    sa.Column('company', sa.String(length=200), nullable=True),
+    sa.Column('job_title', sa.String(length=200), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('is_favorite', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('domain_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['domain_id'], ['domains.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_contacts_id'), 'contacts', ['id'], unique=False)
+
+    op.create_table('email_accounts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email_address', sa.String(), nullable=False),
+    sa.Column('display_name', sa.String(), nullable=True),
+    sa.Column('imap_username', sa.String(), nullable=False),
+    sa.Column('imap_password', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('domain_id', sa.Integer(), nullable=True),
+    sa.Column('is_primary', sa.Boolean(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.ForeignKeyConstraint(['domain_id'], ['domains.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_email_accounts_id'), 'email_accounts', ['id'], unique=False)
+
+    op.create_table('file_storages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('storage_type', sa.Enum('SFTP', 'S3', 'FTP', name='filestoragetype'), nullable=False),
+    sa.Column('host', sa.String(length=255), nullable=False),
+    sa.Column('port', sa.Integer(), nullable=True),
+    sa.Column('username', sa.String(length=255), nullable=False),
+    sa.Column('password', sa.String(length=255), nullable=False),
+    sa.Column('bucket_name', sa.String(length=255), nullable=True),
+    sa.Column('region', sa.String(length=100), nullable=True),
+    sa.Column('access_key', sa.String(length=255), nullable=True),
+    sa.Column('secret_key', sa.String(length=500), nullable=True),
+    sa.Column('base_path', sa.String(length=500), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('domain_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['domain_id'], ['domains.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_file_storages_id'), 'file_storages', ['id'], unique=False)
+
+    op.create_table('rss_feeds',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('url', sa.String(length=500), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('last_fetched', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_rss_feeds_id'), 'rss_feeds', ['id'], unique=False)
+
+    op.create_table('user_presence',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.Enum('ONLINE', 'AWAY', 'BUSY', 'OFFLINE', name='userstatus'), nullable=True),
+    sa.Column('status_message', sa.String(length=255), nullable=True),
+    sa.Column('last_seen', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id')
+    )
+    op.create_index(op.f('ix_user_presence_id'), 'user_presence', ['id'], unique=False)
+
+    op.create_table('chat_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('channel_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('message_type', sa.Enum('TEXT', 'FILE', 'IMAGE', 'SYSTEM', name='messagetype'), nullable=True),
+    sa.Column('file_url', sa.String(length=500), nullable=True),
+    sa.Column('reply_to_id', sa.Integer(), nullable=True),
+    sa.Column('is_edited', sa.Boolean(), nullable=True),
+    sa.Column('is_deleted', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.Column('edited_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['channel_id'], ['chat_channels.id'], ),
+    sa.ForeignKeyConstraint(['reply_to_id'], ['chat_messages.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_chat_messages_id'), 'chat_messages', ['id'], unique=False)
+
+    op.create_table('contact_group_memberships',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('contact_id', sa.Integer(), nullable=False),
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.Column('added_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['contact_id'], ['contacts.id'], ),
+    sa.ForeignKeyConstraint(['group_id'], ['contact_groups.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_contact_group_memberships_id'), 'contact_group_memberships', ['id'], unique=False)
+
+    op.create_table('file_bookmarks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('path', sa.String(length=1000), nullable=False),
+    sa.Column('storage_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['storage_id'], ['file_storages.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_file_bookmarks_id'), 'file_bookmarks', ['id'], unique=False)
+
+    op.create_table('file_search_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('search_term', sa.String(length=500), nullable=False),
+    sa.Column('storage_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('results_count', sa.Integer(), nullable=True),
+    sa.Column('search_path', sa.String(length=1000), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['storage_id'], ['file_storages.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_file_search_history_id'), 'file_search_history', ['id'], unique=False)
+
+    op.create_table('rss_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('feed_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=500), nullable=False),
+    sa.Column('link', sa.String(length=1000), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('author', sa.String(length=255), nullable=True),
+    sa.Column('published_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('guid', sa.String(length=500), nullable=True),
+    sa.Column('is_read', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.ForeignKeyConstraint(['feed_id'], ['rss_feeds.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_rss_entries_guid'), 'rss_entries', ['guid'], unique=True)
+    op.create_index(op.f('ix_rss_entries_id'), 'rss_entries', ['id'], unique=False)
+
+    op.create_table('chat_members',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('channel_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('is_admin', sa.Boolean(), nullable=True),
+    sa.Column('can_post', sa.Boolean(), nullable=True),
+    sa.Column('joined_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.Column('last_read_message_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['channel_id'], ['chat_channels.id'], ),
+    sa.ForeignKeyConstraint(['last_read_message_id'], ['chat_messages.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_chat_members_id'), 'chat_members', ['id'], unique=False)
+
+    op.create_table('chat_notifications',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('channel_id', sa.Integer(), nullable=False),
+    sa.Column('message_id', sa.Integer(), nullable=False),
+    sa.Column('is_read', sa.Boolean(), nullable=True),
+    sa.Column('sound_played', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.ForeignKeyConstraint(['channel_id'], ['chat_channels.id'], ),
+    sa.ForeignKeyConstraint(['message_id'], ['chat_messages.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_chat_notifications_id'), 'chat_notifications', ['id'], unique=False)
+
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_chat_notifications_id'), table_name='chat_notifications')
+
+    op.drop_table('chat_notifications')
+    op.drop_index(op.f('ix_chat_members_id'), table_name='chat_members')
+
+    op.drop_table('chat_members')
+    op.drop_index(op.f('ix_rss_entries_id'), table_name='rss_entries')
+    op.drop_index(op.f('ix_rss_entries_guid'), table_name='rss_entries')
+
+    op.drop_table('rss_entries')
+    op.drop_index(op.f('ix_file_search_history_id'), table_name='file_search_history')
+
+    op.drop_table('file_search_history')
+    op.drop_index(op.f('ix_file_bookmarks_id'), table_name='file_bookmarks')
+
+    op.drop_table('file_bookmarks')
+    op.drop_index(op.f('ix_contact_group_memberships_id'), table_name='contact_group_memberships')
+
+    op.drop_table('contact_group_memberships')
+    op.drop_index(op.f('ix_chat_messages_id'), table_name='chat_messages')
+
+    op.drop_table('chat_messages')
+    op.drop_index(op.f('ix_user_presence_id'), table_name='user_presence')
+
+    op.drop_table('user_presence')
+    op.drop_index(op.f('ix_rss_feeds_id'), table_name='rss_feeds')
+
+    op.drop_table('rss_feeds')
+    op.drop_index(op.f('ix_file_storages_id'), table_name='file_storages')
+
+    op.drop_table('file_storages')
+    op.drop_index(op.f('ix_email_accounts_id'), table_name='email_accounts')
+
+    op.drop_table('email_accounts')
+    op.drop_index(op.f('ix_contacts_id'), table_name='contacts')
+
+    op.drop_table('contacts')
+    op.drop_index(op.f('ix_contact_groups_id'), table_name='contact_groups')
+
+    op.drop_table('contact_groups')
+    op.drop_index(op.f('ix_chat_channels_id'), table_name='chat_channels')
+
+    op.drop_table('chat_channels')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+
+    op.drop_table('users')
+    op.drop_index(op.f('ix_themes_name'), table_name='themes')
+    op.drop_index(op.f('ix_themes_id'), table_name='themes')
+
+    op.drop_table('themes')
+    op.drop_index(op.f('ix_domains_name'), table_name='domains')
+    op.drop_index(op.f('ix_domains_id'), table_name='domains')
+
+    op.drop_table('domains')
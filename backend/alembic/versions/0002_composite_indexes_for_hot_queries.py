@@ -0,0 +1,48 @@
+"""Composite indexes for hot queries
+
+Indexes for the chat, contact, user, account, RSS and file storage lookups
+that run on nearly every request. RSS entry lookups by guid are already
+served by the unique ix_rss_entries_guid. On PostgreSQL they are built
+CONCURRENTLY so writes are not blocked while a large table is indexed.
+IF NOT EXISTS covers databases whose tables create_all made after the
+indexes were added to the models.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 03:06:42.716572
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_chat_messages_channel_id_id', 'chat_messages', ['channel_id', 'id']),
+    ('ix_chat_messages_channel_id_created_at', 'chat_messages', ['channel_id', 'created_at']),
+    ('ix_chat_members_channel_id_user_id', 'chat_members', ['channel_id', 'user_id']),
+    ('ix_contacts_user_id_domain_id_email', 'contacts', ['user_id', 'domain_id', 'email']),
+    ('ix_users_email_domain_id', 'users', ['email', 'domain_id']),
+    ('ix_email_accounts_user_id_is_active', 'email_accounts', ['user_id', 'is_active']),
+    ('ix_file_storages_user_id_domain_id', 'file_storages', ['user_id', 'domain_id']),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, if_not_exists=True,
+                            postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
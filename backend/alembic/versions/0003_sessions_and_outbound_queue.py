@@ -0,0 +1,74 @@
+"""Session store and outbound queue tables
+
+auth_sessions backs refresh-token sessions and outbound_messages the
+durable delivery queue; neither exists in the 0001 baseline.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 11:02:51.384410
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('auth_sessions',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('refresh_hash', sa.String(length=64), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('last_used_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('revoked_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_auth_sessions_revoked_at', 'auth_sessions', ['revoked_at'], unique=False)
+    op.create_index('ix_auth_sessions_user_id', 'auth_sessions', ['user_id'], unique=False)
+
+    op.create_table('outbound_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('email_account_id', sa.Integer(), nullable=False),
+    sa.Column('domain_id', sa.Integer(), nullable=False),
+    sa.Column('sender', sa.String(length=255), nullable=False),
+    sa.Column('recipients', sa.JSON(), nullable=False),
+    sa.Column('subject', sa.String(length=998), nullable=True),
+    sa.Column('message', sa.LargeBinary(), nullable=True),
+    sa.Column('message_path', sa.String(length=500), nullable=True),
+    sa.Column('status', sa.Enum('QUEUED', 'SENDING', 'RETRY', 'SENT', 'DEAD', name='outboundstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['domain_id'], ['domains.id'], ),
+    sa.ForeignKeyConstraint(['email_account_id'], ['email_accounts.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outbound_messages_id'), 'outbound_messages', ['id'], unique=False)
+    op.create_index('ix_outbound_messages_status_next_attempt', 'outbound_messages', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbound_messages_status_next_attempt', table_name='outbound_messages')
+    op.drop_index(op.f('ix_outbound_messages_id'), table_name='outbound_messages')
+
+    op.drop_table('outbound_messages')
+    op.drop_index('ix_auth_sessions_user_id', table_name='auth_sessions')
+    op.drop_index('ix_auth_sessions_revoked_at', table_name='auth_sessions')
+
+    op.drop_table('auth_sessions')
@@ -0,0 +1,30 @@
+"""Outbound claim token
+
+Lets a delivery record its outcome only while it still holds the claim on
+its outbound_messages row.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 09:41:27.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('outbound_messages', sa.Column('claim_token', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('outbound_messages') as batch_op:
+        batch_op.drop_column('claim_token')
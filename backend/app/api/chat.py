@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
 from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional, Dict
+from typing import List, Optional
 from datetime import datetime, timezone
 
-from app.database.database import get_db
+from app.database.database import get_db, get_read_db, AsyncSessionLocal
+from app.database.sqlite import write_queue
 from app.api.routes.auth import get_current_user
+from app.services.principal_cache import Principal
+from app.services.chat_fanout import manager
+from app.core.responses import dumps, fast_response
 from app.models.models import User, Domain
 from app.models.chat import (
     ChatChannel, ChatMember, ChatMessage, UserPresence, 
@@ -17,42 +22,10 @@ from app.schemas.chat import (
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[int, List[WebSocket]] = {}
-
-    async def connect(self, websocket: WebSocket, user_id: int):
-        await websocket.accept()
-        if user_id not in self.active_connections:
-            self.active_connections[user_id] = []
-        self.active_connections[user_id].append(websocket)
-
-    def disconnect(self, websocket: WebSocket, user_id: int):
-        if user_id in self.active_connections:
-            self.active_connections[user_id].remove(websocket)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-
-    async def send_personal_message(self, message: str, user_id: int):
-        if user_id in self.active_connections:
-            for connection in self.active_connections[user_id]:
-                try:
-                    await connection.send_text(message)
-                except:
-                    # Connection might be closed
-                    pass
-
-    async def broadcast_to_channel(self, message: str, channel_members: List[int]):
-        for user_id in channel_members:
-            await self.send_personal_message(message, user_id)
-
-manager = ConnectionManager()
-
 @router.get("/channels", response_model=List[ChatChannelResponse])
 def get_user_channels(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     """Get all channels the user is a member of"""
     channels = db.query(ChatChannel).join(ChatMember).filter(
@@ -86,8 +59,8 @@ def get_user_channels(
 
 @router.get("/users", response_model=List[ChatMemberResponse])
 def get_domain_users(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     """Get all users in the same domain for direct messaging"""
     users = db.query(User).filter(
@@ -108,7 +81,7 @@ def get_domain_users(
 @router.post("/channels", response_model=ChatChannelResponse)
 def create_channel(
     channel_data: ChatChannelCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new chat channel"""
@@ -143,6 +116,8 @@ def create_channel(
     
     db.commit()
     db.refresh(channel)
+    # Members already connected start receiving the channel, whichever worker holds them
+    anyio.from_thread.run(manager.add_members, channel.id, {current_user.id, *(channel_data.member_ids or [])})
     
     return ChatChannelResponse(
         id=channel.id,
@@ -157,7 +132,7 @@ def create_channel(
 @router.post("/channels/direct")
 def create_direct_message_channel(
     target_user_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create or get existing direct message channel between two users"""
@@ -210,6 +185,7 @@ def create_direct_message_channel(
         db.add(member)
     
     db.commit()
+    anyio.from_thread.run(manager.add_members, channel.id, [current_user.id, target_user_id])
     
     return {"channel_id": channel.id}
 
@@ -218,8 +194,8 @@ def get_channel_messages(
     channel_id: int,
     limit: int = 50,
     offset: int = 0,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     """Get messages for a specific channel"""
     # Verify user is member of channel
@@ -238,27 +214,27 @@ def get_channel_messages(
         joinedload(ChatMessage.user)
     ).order_by(ChatMessage.created_at.desc()).offset(offset).limit(limit).all()
     
-    return [ChatMessageResponse(
-        id=msg.id,
-        channel_id=msg.channel_id,
-        user_id=msg.user_id,
-        username=msg.user.username,
-        content=msg.content,
-        message_type=msg.message_type,
-        created_at=msg.created_at,
-        is_edited=msg.is_edited,
-        reply_to_id=msg.reply_to_id
-    ) for msg in reversed(messages)]
+    return fast_response([{
+        "id": msg.id,
+        "channel_id": msg.channel_id,
+        "user_id": msg.user_id,
+        "username": msg.user.username,
+        "content": msg.content,
+        "message_type": msg.message_type,
+        "created_at": msg.created_at,
+        "is_edited": msg.is_edited,
+        "reply_to_id": msg.reply_to_id
+    } for msg in reversed(messages)])
 
 @router.post("/channels/{channel_id}/messages")
 def send_message(
     channel_id: int,
     message_data: SendMessageRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Send a message to a channel"""
-    # Verify user is member and can post
+    # Checked on the primary: a lagging replica could still grant a revoked can_post
     member = db.query(ChatMember).filter(
         ChatMember.channel_id == channel_id,
         ChatMember.user_id == current_user.id
@@ -267,64 +243,100 @@ def send_message(
     if not member or not member.can_post:
         raise HTTPException(status_code=403, detail="Cannot post to this channel")
     
-    message = ChatMessage(
-        channel_id=channel_id,
-        user_id=current_user.id,
-        content=message_data.content,
-        message_type=message_data.message_type or MessageType.TEXT,
-        reply_to_id=message_data.reply_to_id
-    )
+    # Set here rather than by the database so the broadcast frame needs no read-back
+    created_at = datetime.now(timezone.utc)
+    message_type = message_data.message_type or MessageType.TEXT
     
-    db.add(message)
-    db.commit()
-    db.refresh(message)
+    def insert_message(write_db: Session) -> int:
+        message = ChatMessage(
+            channel_id=channel_id,
+            user_id=current_user.id,
+            content=message_data.content,
+            message_type=message_type,
+            reply_to_id=message_data.reply_to_id,
+            created_at=created_at
+        )
+        write_db.add(message)
+        write_db.flush()
+        return message.id
     
-    # Notify other channel members via WebSocket
-    channel_members = db.query(ChatMember.user_id).filter(
-        ChatMember.channel_id == channel_id,
-        ChatMember.user_id != current_user.id
-    ).all()
+    # Group-committed with other writes in SQLite production mode
+    message_id = write_queue.run(insert_message)
     
-    # Broadcast to WebSocket connections (simplified)
-    # In production, you'd want proper message formatting
+    # Serialized once for every subscriber, on every worker; the sender's other tabs get it too
+    frame = dumps({"type": "message", "message": {
+        "id": message_id,
+        "channel_id": channel_id,
+        "user_id": current_user.id,
+        "username": current_user.username,
+        "content": message_data.content,
+        "message_type": message_type,
+        "created_at": created_at,
+        "is_edited": False,
+        "reply_to_id": message_data.reply_to_id
+    }}).decode()
+    anyio.from_thread.run(manager.broadcast_to_channel, frame, channel_id)
     
-    return {"message": "Message sent", "message_id": message.id}
+    return {"message": "Message sent", "message_id": message_id}
 
 @router.put("/presence")
 def update_presence(
     status: UserStatus,
     status_message: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Update user presence status"""
-    presence = db.query(UserPresence).filter(
-        UserPresence.user_id == current_user.id
-    ).first()
-    
-    if not presence:
-        presence = UserPresence(
-            user_id=current_user.id,
-            status=status,
-            status_message=status_message
-        )
-        db.add(presence)
-    else:
-        presence.status = status
-        presence.status_message = status_message
-        presence.last_seen = datetime.now(timezone.utc)
+    def upsert_presence(write_db: Session):
+        presence = write_db.query(UserPresence).filter(
+            UserPresence.user_id == current_user.id
+        ).first()
+        
+        if not presence:
+            presence = UserPresence(
+                user_id=current_user.id,
+                status=status,
+                status_message=status_message
+            )
+            write_db.add(presence)
+        else:
+            presence.status = status
+            presence.status_message = status_message
+            presence.last_seen = datetime.now(timezone.utc)
     
-    db.commit()
+    write_queue.run(upsert_presence)
     
     return {"message": "Presence updated"}
 
+async def authenticate_websocket(token: Optional[str]) -> Optional[Principal]:
+    """Resolve the access token a WebSocket client connects with, like
+    get_current_user does for HTTP requests; None when it is not valid"""
+    if not token:
+        return None
+    async with AsyncSessionLocal() as db:
+        try:
+            return await get_current_user(token, db)
+        except HTTPException:
+            return None
+
+@router.websocket("/ws")
 @router.websocket("/ws/{user_id}")
 async def websocket_endpoint(
     websocket: WebSocket, 
-    user_id: int,
+    user_id: Optional[int] = None,
+    token: Optional[str] = Query(None),
     db: Session = Depends(get_db)
 ):
-    """WebSocket endpoint for real-time chat"""
+    """WebSocket endpoint for real-time chat.
+    
+    Connect with the access token as ?token=...; the user comes from the
+    token. A user id in the path is only accepted when it matches.
+    """
+    principal = await authenticate_websocket(token)
+    if principal is None or (user_id is not None and user_id != principal.id):
+        # Closing before accept() rejects the handshake
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    user_id = principal.id
     await manager.connect(websocket, user_id)
     
     # Update user presence to online
@@ -344,7 +356,7 @@ async def websocket_endpoint(
             # Handle incoming WebSocket messages here
             
     except WebSocketDisconnect:
-        manager.disconnect(websocket, user_id)
+        await manager.disconnect(websocket, user_id)
         
         # Update user presence to offline
         if presence:
@@ -3,9 +3,10 @@ from sqlalchemy.orm import Session
 from sqlalchemy import or_, func
 from typing import List
 
-from app.database.database import get_db
+from app.database.database import get_db, get_read_db
 from app.api.routes.auth import get_current_user
-from app.models.models import User
+from app.services.principal_cache import Principal
+from app.core.responses import fast_response
 from app.models.contacts import Contact, ContactGroup, ContactGroupMembership
 from app.schemas.contacts import (
     ContactCreate, ContactUpdate, ContactResponse,
@@ -24,8 +25,8 @@ def get_contacts(
     search: str = None,
     group_id: int = None,
     favorites_only: bool = False,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     """Get contacts for the current user with optional filtering"""
     query = db.query(Contact).filter(
@@ -53,12 +54,12 @@ def get_contacts(
         query = query.filter(Contact.is_favorite == True)
     
     contacts = query.offset(skip).limit(limit).all()
-    return contacts
+    return fast_response(contacts, ContactResponse)
 
 @router.post("/contacts", response_model=ContactResponse)
 def create_contact(
     contact_data: ContactCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new contact"""
@@ -89,8 +90,8 @@ def create_contact(
 @router.get("/contacts/{contact_id}", response_model=ContactResponse)
 def get_contact(
     contact_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     """Get a specific contact"""
     contact = db.query(Contact).filter(
@@ -108,7 +109,7 @@ def get_contact(
 def update_contact(
     contact_id: int,
     contact_data: ContactUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update a contact"""
@@ -147,7 +148,7 @@ def update_contact(
 @router.delete("/contacts/{contact_id}")
 def delete_contact(
     contact_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a contact"""
@@ -167,7 +168,7 @@ def delete_contact(
 @router.post("/contacts/search", response_model=List[ContactResponse])
 def search_contacts(
     search_request: ContactSearchRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Advanced contact search"""
@@ -191,7 +192,7 @@ def search_contacts(
 @router.post("/contacts/import")
 def import_contacts(
     import_request: ContactImportRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Bulk import contacts"""
@@ -237,8 +238,8 @@ def import_contacts(
 # Contact Group operations
 @router.get("/contact-groups", response_model=List[ContactGroupResponse])
 def get_contact_groups(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     """Get contact groups for the current user"""
     groups = db.query(ContactGroup).filter(
@@ -257,7 +258,7 @@ def get_contact_groups(
 @router.post("/contact-groups", response_model=ContactGroupResponse)
 def create_contact_group(
     group_data: ContactGroupCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new contact group"""
@@ -279,7 +280,7 @@ def create_contact_group(
 @router.delete("/contact-groups/{group_id}")
 def delete_contact_group(
     group_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a contact group"""
@@ -300,7 +301,7 @@ def delete_contact_group(
 def add_contact_to_group(
     group_id: int,
     membership_data: ContactGroupMembershipCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Add a contact to a group"""
@@ -346,7 +347,7 @@ def add_contact_to_group(
 def remove_contact_from_group(
     group_id: int,
     contact_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Remove a contact from a group"""
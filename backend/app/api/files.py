@@ -5,8 +5,9 @@ from typing import List
 import io
 
 from app.database.database import get_db
+from app.database.sqlite import write_queue
 from app.api.routes.auth import get_current_user
-from app.models.models import User
+from app.services.principal_cache import Principal
 from app.models.files import FileStorage, FileBookmark, FileSearchHistory
 from app.schemas.files import (
     FileStorageCreate, FileStorageResponse, DirectoryListing,
@@ -18,7 +19,7 @@ router = APIRouter()
 
 @router.get("/storages", response_model=List[FileStorageResponse])
 def get_user_storages(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all file storages for the current user"""
@@ -32,7 +33,7 @@ def get_user_storages(
 @router.post("/storages", response_model=FileStorageResponse)
 def create_storage(
     storage_data: FileStorageCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new file storage connection"""
@@ -51,7 +52,7 @@ def create_storage(
 @router.get("/storages/{storage_id}/test")
 def test_storage_connection(
     storage_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Test connection to a file storage"""
@@ -76,7 +77,7 @@ def test_storage_connection(
 async def browse_directory(
     storage_id: int,
     path: str = "/",
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> DirectoryListing:
     """Browse files and directories in storage"""
@@ -99,7 +100,7 @@ async def browse_directory(
 async def search_files(
     storage_id: int,
     search_request: FileSearchRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> FileSearchResult:
     """Search for files in storage"""
@@ -121,15 +122,15 @@ async def search_files(
         )
         
         # Save search to history
-        search_history = FileSearchHistory(
-            search_term=search_request.search_term,
-            storage_id=storage_id,
-            user_id=current_user.id,
-            results_count=result.total_results,
-            search_path=search_request.path or "/"
-        )
-        db.add(search_history)
-        db.commit()
+        def record_search(write_db: Session):
+            write_db.add(FileSearchHistory(
+                search_term=search_request.search_term,
+                storage_id=storage_id,
+                user_id=current_user.id,
+                results_count=result.total_results,
+                search_path=search_request.path or "/"
+            ))
+        await write_queue.run_async(record_search)
         
         return result
     except Exception as e:
@@ -139,7 +140,7 @@ async def search_files(
 async def download_file(
     storage_id: int,
     file_path: str,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Download a file from storage"""
@@ -170,7 +171,7 @@ async def download_file(
 @router.delete("/storages/{storage_id}")
 def delete_storage(
     storage_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a file storage"""
@@ -190,7 +191,7 @@ def delete_storage(
 # Bookmarks
 @router.get("/bookmarks", response_model=List[FileBookmarkResponse])
 def get_bookmarks(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get user's file bookmarks"""
@@ -202,7 +203,7 @@ def get_bookmarks(
 @router.post("/bookmarks", response_model=FileBookmarkResponse)
 def create_bookmark(
     bookmark_data: FileBookmarkCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new file bookmark"""
@@ -229,7 +230,7 @@ def create_bookmark(
 @router.delete("/bookmarks/{bookmark_id}")
 def delete_bookmark(
     bookmark_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a file bookmark"""
@@ -3,15 +3,25 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from pydantic import BaseModel
-from app.database.database import get_db
+from app.database.database import get_db, get_read_db, engine, async_engine, read_engine
+from app.database.routing import replica_router
+from app.database.sqlite import write_queue
+from app.database.pool_metrics import pool_stats
 from app.models.models import Domain, User, EmailAccount
+from app.models.sessions import AuthSession
 from app.schemas.schemas import Domain as DomainSchema, DomainCreate, User as UserSchema
 from app.api.routes.auth import get_current_user
-from app.core.security import get_password_hash
+from app.services.principal_cache import Principal, principal_cache
+from app.services.tenant_registry import tenant_registry
+from app.services.sessions import session_store
+from app.core.security import hash_password
+from app.services.circuit_breaker import circuit_breakers
+from app.services.smtp_pool import smtp_pool
+from app.services.chat_fanout import manager as chat_manager
 
 router = APIRouter()
 
-def verify_admin(current_user: User = Depends(get_current_user)):
+def verify_admin(current_user: Principal = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
@@ -22,8 +32,8 @@ async def get_all_domains(
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
-    admin_user: User = Depends(verify_admin),
-    db: Session = Depends(get_db)
+    admin_user: Principal = Depends(verify_admin),
+    db: Session = Depends(get_read_db)
 ):
     query = db.query(Domain)
     
@@ -36,7 +46,7 @@ async def get_all_domains(
 @router.post("/domains", response_model=DomainSchema)
 async def create_domain(
     domain: DomainCreate,
-    admin_user: User = Depends(verify_admin),
+    admin_user: Principal = Depends(verify_admin),
     db: Session = Depends(get_db)
 ):
     # Check if domain already exists
@@ -55,7 +65,7 @@ async def create_domain(
 async def update_domain(
     domain_id: int,
     domain_update: DomainCreate,
-    admin_user: User = Depends(verify_admin),
+    admin_user: Principal = Depends(verify_admin),
     db: Session = Depends(get_db)
 ):
     domain = db.query(Domain).filter(Domain.id == domain_id).first()
@@ -67,12 +77,13 @@ async def update_domain(
     
     db.commit()
     db.refresh(domain)
+    tenant_registry.invalidate_domain(domain_id)
     return domain
 
 @router.delete("/domains/{domain_id}")
 async def delete_domain(
     domain_id: int,
-    admin_user: User = Depends(verify_admin),
+    admin_user: Principal = Depends(verify_admin),
     db: Session = Depends(get_db)
 ):
     domain = db.query(Domain).filter(Domain.id == domain_id).first()
@@ -86,12 +97,13 @@ async def delete_domain(
     
     db.delete(domain)
     db.commit()
+    tenant_registry.invalidate_domain(domain_id)
     return {"message": "Domain deleted successfully"}
 
 @router.post("/domains/{domain_id}/toggle")
 async def toggle_domain_status(
     domain_id: int,
-    admin_user: User = Depends(verify_admin),
+    admin_user: Principal = Depends(verify_admin),
     db: Session = Depends(get_db)
 ):
     domain = db.query(Domain).filter(Domain.id == domain_id).first()
@@ -100,6 +112,7 @@ async def toggle_domain_status(
     
     domain.is_active = not domain.is_active
     db.commit()
+    tenant_registry.invalidate_domain(domain_id)
     
     return {"message": f"Domain {'activated' if domain.is_active else 'deactivated'} successfully"}
 
@@ -110,8 +123,8 @@ async def get_all_users(
     limit: int = 100,
     domain_id: Optional[int] = None,
     search: Optional[str] = None,
-    admin_user: User = Depends(verify_admin),
-    db: Session = Depends(get_db)
+    admin_user: Principal = Depends(verify_admin),
+    db: Session = Depends(get_read_db)
 ):
     query = db.query(User)
     
@@ -141,7 +154,7 @@ class UserCreateRequest(BaseModel):
 @router.post("/users")
 async def create_user(
     user_data: UserCreateRequest,
-    admin_user: User = Depends(verify_admin),
+    admin_user: Principal = Depends(verify_admin),
     db: Session = Depends(get_db)
 ):
     # Check if user already exists (by email in domain)
@@ -160,7 +173,7 @@ async def create_user(
     db_user = User(
         username=user_data.username,
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await hash_password(user_data.password),
         full_name=user_data.full_name,
         is_admin=user_data.is_admin,
         domain_id=user_data.domain_id,
@@ -202,7 +215,7 @@ class UserUpdateRequest(BaseModel):
 async def update_user(
     user_id: int,
     user_data: UserUpdateRequest,
-    admin_user: User = Depends(verify_admin),
+    admin_user: Principal = Depends(verify_admin),
     db: Session = Depends(get_db)
 ):
     user = db.query(User).filter(User.id == user_id).first()
@@ -218,7 +231,7 @@ async def update_user(
     if user_data.is_admin is not None:
         user.is_admin = user_data.is_admin
     if user_data.password is not None:
-        user.hashed_password = get_password_hash(user_data.password)
+        user.hashed_password = await hash_password(user_data.password)
     if user_data.storage_quota_mb is not None:
         user.storage_quota_mb = user_data.storage_quota_mb
     if user_data.email_quota_daily is not None:
@@ -226,13 +239,16 @@ async def update_user(
     
     db.commit()
     db.refresh(user)
+    if user_data.password is not None:
+        session_store.revoke_user(db, user.id)
+    principal_cache.invalidate_user(user.id)
     
     return {"message": "User updated successfully"}
 
 @router.delete("/users/{user_id}")
 async def delete_user(
     user_id: int,
-    admin_user: User = Depends(verify_admin),
+    admin_user: Principal = Depends(verify_admin),
     db: Session = Depends(get_db)
 ):
     if user_id == admin_user.id:
@@ -242,18 +258,22 @@ async def delete_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Delete associated email accounts
+    # Delete associated email accounts and sessions
     db.query(EmailAccount).filter(EmailAccount.user_id == user_id).delete()
+    session_store.revoke_user(db, user_id)
+    db.query(AuthSession).filter(AuthSession.user_id == user_id).delete()
     
     db.delete(user)
     db.commit()
+    principal_cache.invalidate_user(user_id)
+    tenant_registry.invalidate_user(user_id)
     
     return {"message": "User deleted successfully"}
 
 @router.post("/users/{user_id}/toggle")
 async def toggle_user_status(
     user_id: int,
-    admin_user: User = Depends(verify_admin),
+    admin_user: Principal = Depends(verify_admin),
     db: Session = Depends(get_db)
 ):
     if user_id == admin_user.id:
@@ -265,6 +285,9 @@ async def toggle_user_status(
     
     user.is_active = not user.is_active
     db.commit()
+    if not user.is_active:
+        session_store.revoke_user(db, user.id)
+    principal_cache.invalidate_user(user.id)
     
     return {"message": f"User {'activated' if user.is_active else 'deactivated'} successfully"}
 
@@ -275,23 +298,25 @@ class PasswordResetRequest(BaseModel):
 async def reset_user_password(
     user_id: int,
     password_data: PasswordResetRequest,
-    admin_user: User = Depends(verify_admin),
+    admin_user: Principal = Depends(verify_admin),
     db: Session = Depends(get_db)
 ):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    user.hashed_password = get_password_hash(password_data.new_password)
+    user.hashed_password = await hash_password(password_data.new_password)
     db.commit()
+    session_store.revoke_user(db, user.id)
+    principal_cache.invalidate_user(user.id)
     
     return {"message": "Password reset successfully"}
 
 # System Statistics
 @router.get("/statistics")
 async def get_system_statistics(
-    admin_user: User = Depends(verify_admin),
-    db: Session = Depends(get_db)
+    admin_user: Principal = Depends(verify_admin),
+    db: Session = Depends(get_read_db)
 ):
     total_domains = db.query(func.count(Domain.id)).scalar()
     active_domains = db.query(func.count(Domain.id)).filter(Domain.is_active == True).scalar()
@@ -322,6 +347,42 @@ async def get_system_statistics(
         }
     }
 
+@router.get("/upstream-health")
+async def get_upstream_health(admin_user: Principal = Depends(verify_admin)):
+    """Circuit breaker state and adaptive timeouts per IMAP/SMTP server"""
+    return circuit_breakers.stats()
+
+@router.get("/smtp-pool")
+async def get_smtp_pool_stats(admin_user: Principal = Depends(verify_admin)):
+    """Pooled SMTP session counts and reuse/recycle counters"""
+    return smtp_pool.stats()
+
+@router.get("/principal-cache")
+async def get_principal_cache_stats(admin_user: Principal = Depends(verify_admin)):
+    """Authenticated principal cache size and hit rate"""
+    return principal_cache.stats()
+
+@router.get("/tenant-registry")
+async def get_tenant_registry_stats(admin_user: Principal = Depends(verify_admin)):
+    """Cached domain and email account rows and their hit rate"""
+    return tenant_registry.stats()
+
+@router.get("/db-pool")
+async def get_db_pool_stats(admin_user: Principal = Depends(verify_admin)):
+    """Connection pool status, checkout latency and the routes holding connections"""
+    return {
+        "sync": pool_stats(engine, "db"),
+        "async": pool_stats(async_engine.sync_engine, "db_async"),
+        "read": pool_stats(read_engine, "db_read"),
+        "writer": write_queue.stats(),
+        "replicas": replica_router.stats(),
+    }
+
+@router.get("/chat-fanout")
+async def get_chat_fanout_stats(admin_user: Principal = Depends(verify_admin)):
+    """Chat sockets held by this worker, bus subscriptions and delivery counts"""
+    return chat_manager.stats()
+
 # Email Account Management (Admin view)
 @router.get("/email-accounts")
 async def get_all_email_accounts(
@@ -329,8 +390,8 @@ async def get_all_email_accounts(
     limit: int = 100,
     user_id: Optional[int] = None,
     domain_id: Optional[int] = None,
-    admin_user: User = Depends(verify_admin),
-    db: Session = Depends(get_db)
+    admin_user: Principal = Depends(verify_admin),
+    db: Session = Depends(get_read_db)
 ):
     query = db.query(EmailAccount).join(User)
     
@@ -370,7 +431,7 @@ async def get_all_email_accounts(
 @router.delete("/email-accounts/{account_id}")
 async def delete_email_account(
     account_id: int,
-    admin_user: User = Depends(verify_admin),
+    admin_user: Principal = Depends(verify_admin),
     db: Session = Depends(get_db)
 ):
     account = db.query(EmailAccount).filter(EmailAccount.id == account_id).first()
@@ -379,5 +440,6 @@ async def delete_email_account(
     
     db.delete(account)
     db.commit()
+    tenant_registry.invalidate_account(account_id)
     
     return {"message": "Email account deleted successfully"}
\ No newline at end of file
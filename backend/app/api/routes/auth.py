@@ -1,43 +1,101 @@
+import asyncio
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database.database import get_db
+from app.database.database import get_db, get_async_db
 from app.models.models import User, Domain, EmailAccount
-from app.schemas.schemas import Token, User as UserSchema
-from app.core.security import create_access_token, verify_password, verify_token
+from app.schemas.schemas import Token, RefreshRequest, User as UserSchema
+from app.core.security import create_access_token, verify_password_async, verify_token, login_slots
 from app.core.config import settings
+from app.core.request_context import current_user_id
+from app.services.principal_cache import Principal, principal_cache, hash_token
+from app.services.tenant_registry import RowSnapshot, tenant_registry
+from app.services.sessions import session_store, revoked_sessions, InvalidRefreshToken
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    token_hash = hash_token(token)
+    principal = principal_cache.get(token_hash)
+    if principal is not None:
+        if principal.session_id is not None and revoked_sessions.is_revoked(principal.session_id):
+            principal_cache.invalidate(token_hash)
+            raise credentials_exception
+        current_user_id.set(principal.id)
+        return principal
+    
     payload = verify_token(token)
     if payload is None:
         raise credentials_exception
         
     email: str = payload.get("sub")
     domain_id: int = payload.get("domain_id")
+    session_id: str = payload.get("sid")
     
     if email is None:
         raise credentials_exception
+    
+    if session_id is not None and revoked_sessions.is_revoked(session_id):
+        raise credentials_exception
         
-    user = db.query(User).filter(
+    result = await db.execute(select(User).where(
         User.email == email, 
         User.domain_id == domain_id,
         User.is_active == True
-    ).first()
+    ))
+    user = result.scalars().first()
     
     if user is None:
         raise credentials_exception
-        
-    return user
+    
+    principal = Principal.from_user(user, session_id)
+    principal_cache.put(token_hash, principal, payload.get("exp"))
+    # Read-only sessions route by user, for read-your-writes
+    current_user_id.set(principal.id)
+    return principal
+
+class AccountContext:
+    """The mail account a request acts on, with its domain"""
+
+    __slots__ = ("email_account", "domain")
+
+    def __init__(self, email_account: RowSnapshot, domain: RowSnapshot):
+        self.email_account = email_account
+        self.domain = domain
+
+async def get_account_context(
+    account_id: int = Query(...),
+    current_user: Principal = Depends(get_current_user)
+) -> AccountContext:
+    # Verify account belongs to current user
+    email_account, domain = await tenant_registry.resolve(account_id, current_user.id)
+    if not email_account:
+        raise HTTPException(status_code=404, detail="Email account not found")
+    if not domain:
+        raise HTTPException(status_code=404, detail="Domain not found")
+    return AccountContext(email_account, domain)
+
+def issue_tokens(user: User, session_id: str, refresh_token: str) -> dict:
+    access_token = create_access_token(
+        data={"sub": user.email, "domain_id": user.domain_id, "sid": session_id},
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
 
 @router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
@@ -56,13 +114,34 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
         User.is_active == True
     ).first()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = False, None
+    if user:
+        # Bound concurrent logins so a burst waits here rather than piling onto the hashing threads
+        try:
+            await asyncio.wait_for(login_slots.acquire(), settings.LOGIN_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins in progress, please retry",
+                headers={"Retry-After": "1"},
+            )
+        try:
+            valid, new_hash = await verify_password_async(form_data.password, user.hashed_password)
+        finally:
+            login_slots.release()
+    
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if new_hash:
+        # Stored hash predates the current BCRYPT_ROUNDS
+        user.hashed_password = new_hash
+        db.commit()
+    
     # Auto-create email account if it doesn't exist
     existing_email_account = db.query(EmailAccount).filter(
         EmailAccount.user_id == user.id,
@@ -84,14 +163,39 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
         db.add(email_account)
         db.commit()
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email, "domain_id": user.domain_id},
-        expires_delta=access_token_expires
-    )
-    
-    return {"access_token": access_token, "token_type": "bearer"}
+    session_id, refresh_token = session_store.create(db, user.id)
+    return issue_tokens(user, session_id, refresh_token)
+
+@router.post("/refresh", response_model=Token)
+def refresh(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Swap a refresh token for a new access token and a new refresh token
+
+    A plain def, so the blocking session queries run in the threadpool.
+    """
+    try:
+        auth_session, user, refresh_token = session_store.rotate(db, request.refresh_token)
+    except InvalidRefreshToken as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return issue_tokens(user, auth_session.id, refresh_token)
+
+@router.post("/logout")
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if current_user.session_id is not None:
+        session_store.revoke(db, current_user.session_id)
+    principal_cache.invalidate(hash_token(token))
+    return {"message": "Logged out"}
 
 @router.get("/me", response_model=UserSchema)
-async def read_users_me(current_user: User = Depends(get_current_user)):
-    return current_user
\ No newline at end of file
+async def read_users_me(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    user = await db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
\ No newline at end of file
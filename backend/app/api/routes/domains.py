@@ -2,9 +2,10 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database.database import get_db
-from app.models.models import Domain, User
+from app.models.models import Domain
 from app.schemas.schemas import Domain as DomainSchema, DomainCreate
 from app.api.routes.auth import get_current_user
+from app.services.principal_cache import Principal
 
 router = APIRouter()
 
@@ -12,7 +13,7 @@ router = APIRouter()
 async def get_domains(
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     if not current_user.is_admin:
@@ -27,7 +28,7 @@ async def get_domains(
 @router.post("/", response_model=DomainSchema)
 async def create_domain(
     domain: DomainCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Only allow admins to create domains
@@ -48,7 +49,7 @@ async def create_domain(
 @router.get("/{domain_id}", response_model=DomainSchema)
 async def get_domain(
     domain_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     domain = db.query(Domain).filter(Domain.id == domain_id).first()
@@ -1,15 +1,65 @@
-from typing import List, Optional
+import asyncio
+import json
+import math
+import os
+import tempfile
+import uuid
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, Form, UploadFile, File
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from app.database.database import get_db
-from app.models.models import User, EmailAccount, Domain
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.database import get_async_db, AsyncSessionLocal
+from app.core.config import settings
+from app.models.models import EmailAccount
+from app.models.outbound import OutboundMessage, OutboundStatus
+from app.models.contacts import ContactGroup, ContactGroupMembership
 from app.schemas.schemas import EmailMessage, EmailFolder
-from app.api.routes.auth import get_current_user
+from app.api.routes.auth import get_current_user, get_account_context, AccountContext
+from app.services.principal_cache import Principal
+from app.core.responses import fast_response
 from app.services.email_service import email_service
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.mail_export import mail_export_service
+from app.services.mail_import import mail_import_service, iter_messages
+from app.services.outbound_queue import outbound_queue, status_dict, FINAL
+from app.services.mime_stream import AttachmentSource, generate_message, write_message
+from app.services.bulk_send import bulk_send_service, BulkTemplate, contact_group_recipients
+from app.services.rate_limit import send_limiter, RateLimitExceeded
 
 router = APIRouter()
 
+def service_unavailable(error: CircuitOpenError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"Mail server temporarily unavailable: {str(error)}",
+        headers={"Retry-After": str(int(error.retry_after))}
+    )
+
+def too_many_requests(error: RateLimitExceeded) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=str(error),
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+    )
+
+@asynccontextmanager
+async def counted_send(current_user: Principal, recipients: int):
+    """Count a send against the user's rate limits, and each of its
+    ``recipients`` against the daily quota, before queuing it; the quota is
+    given back if the block then fails"""
+    try:
+        await send_limiter.acquire(current_user, quota=recipients)
+    except RateLimitExceeded as e:
+        raise too_many_requests(e)
+    try:
+        yield
+    except BaseException:
+        await send_limiter.release_quota(current_user.id, recipients)
+        raise
+
 class SendMessageRequest(BaseModel):
     to: List[str]
     cc: Optional[List[str]] = None
@@ -19,15 +69,27 @@ class SendMessageRequest(BaseModel):
     body_html: Optional[str] = None
     # Note: attachments will be handled separately for now
 
+class BulkRecipient(BaseModel):
+    email: str
+    fields: Dict[str, str] = {}
+
+class BulkSendRequest(BaseModel):
+    subject: str
+    body_text: Optional[str] = None
+    body_html: Optional[str] = None
+    recipients: Optional[List[BulkRecipient]] = None
+    contact_group_id: Optional[int] = None
+
 @router.get("/accounts", response_model=List[dict])
 async def get_user_email_accounts(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    accounts = db.query(EmailAccount).filter(
+    result = await db.execute(select(EmailAccount).where(
         EmailAccount.user_id == current_user.id,
         EmailAccount.is_active == True
-    ).all()
+    ))
+    accounts = result.scalars().all()
     
     return [
         {
@@ -41,262 +103,454 @@ async def get_user_email_accounts(
 
 @router.get("/folders")
 async def get_folders(
-    account_id: int = Query(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    context: AccountContext = Depends(get_account_context)
 ):
-    # Verify account belongs to current user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == account_id,
-        EmailAccount.user_id == current_user.id,
-        EmailAccount.is_active == True
-    ).first()
-    
-    if not email_account:
-        raise HTTPException(status_code=404, detail="Email account not found")
-    
-    domain = db.query(Domain).filter(Domain.id == email_account.domain_id).first()
-    if not domain:
-        raise HTTPException(status_code=404, detail="Domain not found")
+    email_account, domain = context.email_account, context.domain
     
     try:
         folders = await email_service.get_folders(domain, email_account)
         return folders
+    except CircuitOpenError as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch folders: {str(e)}")
 
 @router.get("/messages", response_model=List[EmailMessage])
 async def get_messages(
-    account_id: int = Query(...),
+    context: AccountContext = Depends(get_account_context),
     folder: str = Query("INBOX"),
-    limit: int = Query(50, le=100),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: int = Query(50, le=100)
 ):
-    # Verify account belongs to current user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == account_id,
-        EmailAccount.user_id == current_user.id,
-        EmailAccount.is_active == True
-    ).first()
-    
-    if not email_account:
-        raise HTTPException(status_code=404, detail="Email account not found")
-    
-    domain = db.query(Domain).filter(Domain.id == email_account.domain_id).first()
-    if not domain:
-        raise HTTPException(status_code=404, detail="Domain not found")
+    email_account, domain = context.email_account, context.domain
     
     try:
         messages = await email_service.get_messages(domain, email_account, folder, limit)
-        return messages
+        return fast_response(messages)
+    except CircuitOpenError as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch messages: {str(e)}")
 
 @router.get("/message/{message_id}")
 async def get_message(
     message_id: str,
-    account_id: int = Query(...),
-    folder: str = Query("INBOX"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    context: AccountContext = Depends(get_account_context),
+    folder: str = Query("INBOX")
 ):
-    # Verify account belongs to current user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == account_id,
-        EmailAccount.user_id == current_user.id,
-        EmailAccount.is_active == True
-    ).first()
-    
-    if not email_account:
-        raise HTTPException(status_code=404, detail="Email account not found")
-    
-    domain = db.query(Domain).filter(Domain.id == email_account.domain_id).first()
-    if not domain:
-        raise HTTPException(status_code=404, detail="Domain not found")
+    email_account, domain = context.email_account, context.domain
     
     try:
         message = await email_service.get_message_content(domain, email_account, message_id, folder)
         return message
+    except CircuitOpenError as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch message: {str(e)}")
 
 @router.post("/send")
 async def send_message(
     message_data: SendMessageRequest,
-    account_id: int = Query(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    context: AccountContext = Depends(get_account_context),
+    current_user: Principal = Depends(get_current_user)
 ):
-    # Verify account belongs to current user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == account_id,
-        EmailAccount.user_id == current_user.id,
-        EmailAccount.is_active == True
-    ).first()
-    
-    if not email_account:
-        raise HTTPException(status_code=404, detail="Email account not found")
+    email_account, domain = context.email_account, context.domain
+    recipients = message_data.to + (message_data.cc or []) + (message_data.bcc or [])
+    
+    async with counted_send(current_user, len(recipients)):
+        try:
+            # For now, no attachments support via JSON API
+            # Attachments would need a separate multipart endpoint
+            attachment_list = []
+            
+            message_bytes = email_service.compose_message(
+                email_account, message_data.to, message_data.subject,
+                message_data.body_text, message_data.body_html,
+                message_data.cc, attachment_list
+            )
+            outbound = await outbound_queue.enqueue(
+                current_user.id, domain, email_account, recipients, message_data.subject, message_bytes
+            )
+            
+            return {
+                "success": True,
+                "message": "Email queued for delivery",
+                "outbound_id": outbound["id"],
+                "status": outbound["status"]
+            }
+            
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to queue email: {str(e)}")
+
+def split_addresses(value: Optional[str]) -> List[str]:
+    return [address.strip() for address in (value or "").split(",") if address.strip()]
+
+@router.post("/send/multipart")
+async def send_message_with_attachments(
+    context: AccountContext = Depends(get_account_context),
+    to: str = Form(...),
+    subject: str = Form(""),
+    cc: Optional[str] = Form(None),
+    bcc: Optional[str] = Form(None),
+    body_text: Optional[str] = Form(None),
+    body_html: Optional[str] = Form(None),
+    files: List[UploadFile] = File([]),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Queue a message with attachments; address fields are comma-separated.
+    
+    Uploads stay in their temp files and the MIME message is written to the
+    outbound spool with streaming base64, so memory use does not grow with
+    attachment size.
+    """
+    email_account, domain = context.email_account, context.domain
+    
+    to_addresses, cc_addresses = split_addresses(to), split_addresses(cc)
+    if not to_addresses:
+        raise HTTPException(status_code=400, detail="At least one recipient is required")
+    
+    os.makedirs(settings.OUTBOUND_SPOOL_DIR, exist_ok=True)
+    spool_path = os.path.join(settings.OUTBOUND_SPOOL_DIR, f"{uuid.uuid4().hex}.eml")
+    parts = generate_message(
+        email_account.email_address, to_addresses, subject, body_text, body_html, cc_addresses,
+        [AttachmentSource(upload.filename or "attachment", upload.file, upload.content_type) for upload in files],
+        settings.MAX_ATTACHMENT_MB * 1024 * 1024
+    )
+    
+    def spool():
+        with open(spool_path, "wb") as spool_file:
+            write_message(spool_file, parts)
+    
+    recipients = to_addresses + cc_addresses + split_addresses(bcc)
+    async with counted_send(current_user, len(recipients)):
+        try:
+            await asyncio.to_thread(spool)
+            outbound = await outbound_queue.enqueue(
+                current_user.id, domain, email_account,
+                recipients, subject, spool_path
+            )
+        except ValueError as e:
+            os.remove(spool_path)
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            if os.path.exists(spool_path):
+                os.remove(spool_path)
+            raise HTTPException(status_code=500, detail=f"Failed to queue email: {str(e)}")
+        finally:
+            for upload in files:
+                await upload.close()
+    
+    return {
+        "success": True,
+        "message": "Email queued for delivery",
+        "outbound_id": outbound["id"],
+        "status": outbound["status"]
+    }
+
+async def get_outbound_message(message_id: int, current_user: Principal, db: AsyncSession) -> OutboundMessage:
+    result = await db.execute(select(OutboundMessage).where(
+        OutboundMessage.id == message_id,
+        OutboundMessage.user_id == current_user.id
+    ))
+    message = result.scalars().first()
+    if not message:
+        raise HTTPException(status_code=404, detail="Outbound message not found")
+    return message
+
+@router.get("/outbox")
+async def get_outbox(
+    status: Optional[str] = Query(None, regex="^(queued|sending|retry|sent|dead)$"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Recent outbound messages with their delivery status, newest first"""
+    query = select(OutboundMessage).where(OutboundMessage.user_id == current_user.id)
+    if status:
+        query = query.where(OutboundMessage.status == OutboundStatus(status))
+    result = await db.execute(query.order_by(OutboundMessage.id.desc()).limit(limit))
+    messages = result.scalars().all()
+    return [status_dict(message) for message in messages]
+
+@router.get("/outbox/{message_id}")
+async def get_outbound_status(
+    message_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return status_dict(await get_outbound_message(message_id, current_user, db))
+
+@router.get("/outbox/{message_id}/events")
+async def stream_outbound_status(
+    message_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Server-sent events with the delivery status, until it is final"""
+    await get_outbound_message(message_id, current_user, db)
+    
+    async def events():
+        last = None
+        while True:
+            async with AsyncSessionLocal() as poll_db:
+                message = await poll_db.get(OutboundMessage, message_id)
+                current = status_dict(message) if message else None
+            if current is None:
+                return
+            if current != last:
+                yield f"data: {json.dumps(current)}\n\n"
+                last = current
+            if message.status in FINAL:
+                return
+            # Woken early by an in-process worker; polls when delivery runs elsewhere
+            await outbound_queue.wait_for_change(message_id, settings.OUTBOUND_POLL_SECONDS)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@router.post("/outbox/{message_id}/retry")
+async def retry_outbound_message(
+    message_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    message = await get_outbound_message(message_id, current_user, db)
+    if message.status != OutboundStatus.DEAD:
+        raise HTTPException(status_code=409, detail="Only failed messages can be retried")
+    requeued = await outbound_queue.retry(message.id)
+    if requeued is None:
+        raise HTTPException(status_code=409, detail="Only failed messages can be retried")
+    return requeued
+
+@router.get("/export")
+async def export_folder(
+    context: AccountContext = Depends(get_account_context),
+    folder: str = Query("INBOX"),
+    format: str = Query("mbox", regex="^(mbox|maildir)$"),
+    start_uid: int = Query(1, ge=1),
+    uid_validity: Optional[int] = Query(None)
+):
+    """Stream a whole folder as mbox or zipped Maildir.
     
-    domain = db.query(Domain).filter(Domain.id == email_account.domain_id).first()
-    if not domain:
-        raise HTTPException(status_code=404, detail="Domain not found")
+    Interrupted exports resume by passing the last received UID + 1 as
+    start_uid together with the X-Export-Uid-Validity value of the first run.
+    """
+    email_account, domain = context.email_account, context.domain
     
     try:
-        # For now, no attachments support via JSON API
-        # Attachments would need a separate multipart endpoint
-        attachment_list = []
-        
-        success = await email_service.send_message(
-            domain, email_account, message_data.to, message_data.subject, 
-            message_data.body_text, message_data.body_html,
-            message_data.cc, message_data.bcc, attachment_list
+        headers, stream = await mail_export_service.export_folder(
+            domain, email_account, folder, format, start_uid, uid_validity
         )
-        
-        return {"success": success, "message": "Email sent successfully"}
-        
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except CircuitOpenError as e:
+        raise service_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export folder: {str(e)}")
+    
+    return StreamingResponse(stream, media_type=mail_export_service.media_type(format), headers=headers)
+
+async def _run_import_job(domain, email_account, folder, path, filename, job):
+    try:
+        with open(path, "rb") as spooled:
+            await mail_import_service.run_import(
+                domain, email_account, folder, iter_messages(spooled, filename), job
+            )
+    finally:
+        os.unlink(path)
+
+@router.post("/import")
+async def import_messages(
+    context: AccountContext = Depends(get_account_context),
+    folder: str = Query("INBOX"),
+    file: UploadFile = File(...),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Import an mbox file, a single .eml or a zip of .eml files into a folder.
+    
+    The upload is spooled to disk and appended in the background; poll
+    /import/{job_id} for progress.
+    """
+    email_account, domain = context.email_account, context.domain
+    
+    filename = file.filename or "upload.mbox"
+    spooled = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1])
+    try:
+        with spooled:
+            while chunk := await file.read(1024 * 1024):
+                await asyncio.to_thread(spooled.write, chunk)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
+        os.unlink(spooled.name)
+        raise HTTPException(status_code=500, detail=f"Failed to store upload: {str(e)}")
+    
+    job = mail_import_service.start_job(folder, current_user.id)
+    mail_import_service.run_in_background(
+        _run_import_job(domain, email_account, folder, spooled.name, filename, job)
+    )
+    return job.to_dict()
+
+@router.get("/import/{job_id}")
+async def get_import_status(
+    job_id: str,
+    current_user: Principal = Depends(get_current_user)
+):
+    job = mail_import_service.get_job(job_id)
+    if not job or job.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job.to_dict()
+
+@router.post("/bulk")
+async def bulk_send(
+    request: BulkSendRequest,
+    context: AccountContext = Depends(get_account_context),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Mail merge: send one template to a recipient list or a contact group.
+    
+    {{ field }} placeholders in the subject and bodies are filled from each
+    recipient's fields (first_name, last_name, full_name, company and
+    job_title for contact groups). Poll /bulk/{job_id} for progress.
+    """
+    email_account, domain = context.email_account, context.domain
+    
+    if (request.recipients is None) == (request.contact_group_id is None):
+        raise HTTPException(status_code=400, detail="Provide either recipients or contact_group_id")
+    
+    if request.contact_group_id is not None:
+        group = (await db.execute(select(ContactGroup).where(
+            ContactGroup.id == request.contact_group_id,
+            ContactGroup.user_id == current_user.id
+        ))).scalars().first()
+        if not group:
+            raise HTTPException(status_code=404, detail="Contact group not found")
+        total = await db.scalar(select(func.count()).select_from(ContactGroupMembership).where(
+            ContactGroupMembership.group_id == group.id
+        ))
+        recipients = contact_group_recipients(group.id, current_user.id)
+    else:
+        total = len(request.recipients)
+        recipients = ({**recipient.fields, "email": recipient.email} for recipient in request.recipients)
+    
+    if total > settings.BULK_MAX_RECIPIENTS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.BULK_MAX_RECIPIENTS} recipients per bulk send"
+        )
+    
+    job = bulk_send_service.start_job(current_user.id, total)
+    template = BulkTemplate(request.subject, request.body_text, request.body_html)
+    bulk_send_service.run_in_background(bulk_send_service.run(job, domain, email_account, template, recipients))
+    return job.to_dict()
+
+def get_bulk_job(job_id: str, current_user: Principal):
+    job = bulk_send_service.get_job(job_id)
+    if not job or job.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Bulk send job not found")
+    return job
+
+@router.get("/bulk/{job_id}")
+async def get_bulk_status(
+    job_id: str,
+    current_user: Principal = Depends(get_current_user)
+):
+    return get_bulk_job(job_id, current_user).to_dict()
+
+@router.get("/bulk/{job_id}/results")
+async def get_bulk_results(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Per-recipient outcomes in the order they were processed"""
+    job = get_bulk_job(job_id, current_user)
+    return {"total": len(job.results), "results": job.results[offset:offset + limit]}
+
+@router.post("/bulk/{job_id}/cancel")
+async def cancel_bulk_send(
+    job_id: str,
+    current_user: Principal = Depends(get_current_user)
+):
+    job = get_bulk_job(job_id, current_user)
+    job.cancelled = True
+    return job.to_dict()
 
 @router.post("/move/{message_id}")
 async def move_message(
     message_id: str,
-    account_id: int = Query(...),
+    context: AccountContext = Depends(get_account_context),
     from_folder: str = Query(...),
-    to_folder: str = Query(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    to_folder: str = Query(...)
 ):
-    # Verify account belongs to current user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == account_id,
-        EmailAccount.user_id == current_user.id,
-        EmailAccount.is_active == True
-    ).first()
-    
-    if not email_account:
-        raise HTTPException(status_code=404, detail="Email account not found")
-    
-    domain = db.query(Domain).filter(Domain.id == email_account.domain_id).first()
-    if not domain:
-        raise HTTPException(status_code=404, detail="Domain not found")
+    email_account, domain = context.email_account, context.domain
     
     try:
         success = await email_service.move_message(domain, email_account, message_id, from_folder, to_folder)
         return {"success": success, "message": "Message moved successfully"}
         
+    except CircuitOpenError as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to move message: {str(e)}")
 
 @router.delete("/message/{message_id}")
 async def delete_message(
     message_id: str,
-    account_id: int = Query(...),
-    folder: str = Query("INBOX"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    context: AccountContext = Depends(get_account_context),
+    folder: str = Query("INBOX")
 ):
-    # Verify account belongs to current user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == account_id,
-        EmailAccount.user_id == current_user.id,
-        EmailAccount.is_active == True
-    ).first()
-    
-    if not email_account:
-        raise HTTPException(status_code=404, detail="Email account not found")
-    
-    domain = db.query(Domain).filter(Domain.id == email_account.domain_id).first()
-    if not domain:
-        raise HTTPException(status_code=404, detail="Domain not found")
+    email_account, domain = context.email_account, context.domain
     
     try:
         success = await email_service.delete_message(domain, email_account, message_id, folder)
         return {"success": success, "message": "Message deleted successfully"}
         
+    except CircuitOpenError as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete message: {str(e)}")
 
 @router.post("/message/{message_id}/read")
 async def mark_message_as_read(
     message_id: str,
-    account_id: int = Query(...),
-    folder: str = Query("INBOX"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    context: AccountContext = Depends(get_account_context),
+    folder: str = Query("INBOX")
 ):
-    # Verify account belongs to current user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == account_id,
-        EmailAccount.user_id == current_user.id,
-        EmailAccount.is_active == True
-    ).first()
-    
-    if not email_account:
-        raise HTTPException(status_code=404, detail="Email account not found")
-    
-    domain = db.query(Domain).filter(Domain.id == email_account.domain_id).first()
-    if not domain:
-        raise HTTPException(status_code=404, detail="Domain not found")
+    email_account, domain = context.email_account, context.domain
     
     try:
         success = await email_service.mark_as_read(domain, email_account, message_id, folder)
         return {"success": success, "message": "Message marked as read"}
         
+    except CircuitOpenError as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to mark message as read: {str(e)}")
 
 @router.post("/message/{message_id}/unread")
 async def mark_message_as_unread(
     message_id: str,
-    account_id: int = Query(...),
-    folder: str = Query("INBOX"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    context: AccountContext = Depends(get_account_context),
+    folder: str = Query("INBOX")
 ):
-    # Verify account belongs to current user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == account_id,
-        EmailAccount.user_id == current_user.id,
-        EmailAccount.is_active == True
-    ).first()
-    
-    if not email_account:
-        raise HTTPException(status_code=404, detail="Email account not found")
-    
-    domain = db.query(Domain).filter(Domain.id == email_account.domain_id).first()
-    if not domain:
-        raise HTTPException(status_code=404, detail="Domain not found")
+    email_account, domain = context.email_account, context.domain
     
     try:
         success = await email_service.mark_as_unread(domain, email_account, message_id, folder)
         return {"success": success, "message": "Message marked as unread"}
         
+    except CircuitOpenError as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to mark message as unread: {str(e)}")
 
 @router.get("/search")
 async def search_messages(
-    account_id: int = Query(...),
+    context: AccountContext = Depends(get_account_context),
     query: str = Query(...),
     folder: str = Query("INBOX"),
-    limit: int = Query(50, le=100),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: int = Query(50, le=100)
 ):
-    # Verify account belongs to current user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == account_id,
-        EmailAccount.user_id == current_user.id,
-        EmailAccount.is_active == True
-    ).first()
-    
-    if not email_account:
-        raise HTTPException(status_code=404, detail="Email account not found")
-    
-    domain = db.query(Domain).filter(Domain.id == email_account.domain_id).first()
-    if not domain:
-        raise HTTPException(status_code=404, detail="Domain not found")
+    email_account, domain = context.email_account, context.domain
     
     try:
         # For now, return filtered messages based on subject/sender
@@ -314,28 +568,16 @@ async def search_messages(
         
         return filtered_messages
         
+    except CircuitOpenError as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to search messages: {str(e)}")
 
 @router.get("/statistics")
 async def get_email_statistics(
-    account_id: int = Query(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    context: AccountContext = Depends(get_account_context)
 ):
-    # Verify account belongs to current user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == account_id,
-        EmailAccount.user_id == current_user.id,
-        EmailAccount.is_active == True
-    ).first()
-    
-    if not email_account:
-        raise HTTPException(status_code=404, detail="Email account not found")
-    
-    domain = db.query(Domain).filter(Domain.id == email_account.domain_id).first()
-    if not domain:
-        raise HTTPException(status_code=404, detail="Domain not found")
+    email_account, domain = context.email_account, context.domain
     
     try:
         folders = await email_service.get_folders(domain, email_account)
@@ -356,30 +598,18 @@ async def get_email_statistics(
             ]
         }
         
+    except CircuitOpenError as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get statistics: {str(e)}")
 
 @router.get("/threads")
 async def get_threaded_messages(
-    account_id: int = Query(...),
+    context: AccountContext = Depends(get_account_context),
     folder: str = Query("INBOX"),
-    limit: int = Query(50, le=100),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: int = Query(50, le=100)
 ):
-    # Verify account belongs to current user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == account_id,
-        EmailAccount.user_id == current_user.id,
-        EmailAccount.is_active == True
-    ).first()
-    
-    if not email_account:
-        raise HTTPException(status_code=404, detail="Email account not found")
-    
-    domain = db.query(Domain).filter(Domain.id == email_account.domain_id).first()
-    if not domain:
-        raise HTTPException(status_code=404, detail="Domain not found")
+    email_account, domain = context.email_account, context.domain
     
     try:
         threads = await email_service.get_threaded_messages(domain, email_account, folder, limit)
@@ -403,34 +633,24 @@ async def get_threaded_messages(
         
         return result
         
+    except CircuitOpenError as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get threaded messages: {str(e)}")
 
 @router.get("/thread/{thread_id}")
 async def get_thread(
     thread_id: str,
-    account_id: int = Query(...),
-    folder: str = Query("INBOX"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    context: AccountContext = Depends(get_account_context),
+    folder: str = Query("INBOX")
 ):
-    # Verify account belongs to current user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == account_id,
-        EmailAccount.user_id == current_user.id,
-        EmailAccount.is_active == True
-    ).first()
-    
-    if not email_account:
-        raise HTTPException(status_code=404, detail="Email account not found")
-    
-    domain = db.query(Domain).filter(Domain.id == email_account.domain_id).first()
-    if not domain:
-        raise HTTPException(status_code=404, detail="Domain not found")
+    email_account, domain = context.email_account, context.domain
     
     try:
         messages = await email_service.get_thread_messages(domain, email_account, thread_id, folder)
         return messages
         
+    except CircuitOpenError as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get thread messages: {str(e)}")
\ No newline at end of file
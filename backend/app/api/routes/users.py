@@ -2,16 +2,18 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database.database import get_db
-from app.models.models import User, EmailAccount
+from app.models.models import EmailAccount
 from app.schemas.schemas import User as UserSchema, EmailAccount as EmailAccountSchema, EmailAccountCreate
 from app.api.routes.auth import get_current_user
+from app.services.principal_cache import Principal
+from app.services.tenant_registry import tenant_registry
 from app.core.security import get_password_hash
 
 router = APIRouter()
 
 @router.get("/me/accounts", response_model=List[EmailAccountSchema])
 async def get_my_email_accounts(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     accounts = db.query(EmailAccount).filter(
@@ -24,7 +26,7 @@ async def get_my_email_accounts(
 @router.post("/me/accounts", response_model=EmailAccountSchema)
 async def create_email_account(
     account: EmailAccountCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Check if email account already exists for this user
@@ -59,7 +61,7 @@ async def create_email_account(
 @router.put("/me/accounts/{account_id}/primary")
 async def set_primary_account(
     account_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Verify account belongs to current user
@@ -79,13 +81,14 @@ async def set_primary_account(
     # Set this account as primary
     account.is_primary = True
     db.commit()
+    tenant_registry.invalidate_user(current_user.id)
     
     return {"message": "Primary account updated"}
 
 @router.delete("/me/accounts/{account_id}")
 async def delete_email_account(
     account_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     account = db.query(EmailAccount).filter(
@@ -99,5 +102,6 @@ async def delete_email_account(
     # Soft delete
     account.is_active = False
     db.commit()
+    tenant_registry.invalidate_account(account_id)
     
     return {"message": "Email account deleted"}
\ No newline at end of file
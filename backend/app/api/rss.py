@@ -3,9 +3,9 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 
-from app.database.database import get_db
+from app.database.database import get_db, get_read_db
 from app.api.routes.auth import get_current_user
-from app.models.models import User
+from app.services.principal_cache import Principal
 from app.models.rss import RSSFeed, RSSEntry
 from app.services.rss_service import RSSService
 from app.schemas.rss import (
@@ -18,8 +18,8 @@ rss_service = RSSService()
 
 @router.get("/feeds", response_model=List[RSSFeedWithStats])
 def get_user_feeds(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     """Get all RSS feeds for the current user"""
     feeds = rss_service.get_user_feeds(db, current_user.id)
@@ -54,7 +54,7 @@ def get_user_feeds(
 @router.post("/feeds", response_model=RSSFeedResponse)
 def add_feed(
     feed_data: RSSFeedCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Add a new RSS feed"""
@@ -83,7 +83,7 @@ def add_feed(
 def update_feed(
     feed_id: int,
     feed_data: RSSFeedUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update an RSS feed"""
@@ -117,7 +117,7 @@ def update_feed(
 @router.delete("/feeds/{feed_id}")
 def delete_feed(
     feed_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete an RSS feed"""
@@ -137,7 +137,7 @@ def delete_feed(
 @router.post("/feeds/{feed_id}/refresh")
 def refresh_feed(
     feed_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Manually refresh a specific RSS feed"""
@@ -161,8 +161,8 @@ def get_feed_entries(
     feed_id: int,
     limit: int = Query(50, le=100),
     offset: int = Query(0, ge=0),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     """Get entries for a specific RSS feed"""
     # Verify user owns this feed
@@ -194,8 +194,8 @@ def get_all_entries(
     limit: int = Query(50, le=100),
     offset: int = Query(0, ge=0),
     unread_only: bool = Query(False),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     """Get all RSS entries for the current user"""
     entries = rss_service.get_all_entries_for_user(
@@ -218,7 +218,7 @@ def get_all_entries(
 @router.post("/entries/{entry_id}/read")
 def mark_entry_read(
     entry_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Mark an RSS entry as read"""
@@ -231,7 +231,7 @@ def mark_entry_read(
 
 @router.post("/refresh-all")
 def refresh_all_feeds(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Refresh all RSS feeds for the current user"""
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 try:
     from pydantic_settings import BaseSettings
 except ImportError:
@@ -7,11 +7,130 @@ import os
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./webmail.db"
+    ASYNC_DATABASE_URL: Optional[str] = None  # derived from DATABASE_URL when unset
     SECRET_KEY: str = "your-secret-key-here"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14
+    SESSION_REVOCATION_POLL_SECONDS: float = 5.0
+    SESSION_REFRESH_GRACE_SECONDS: float = 30.0  # a just-rotated refresh token still renews this long
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000"]
     REDIS_URL: str = "redis://localhost:6379"
+    # Create missing tables at startup; turn off where `alembic upgrade head` manages the schema
+    AUTO_CREATE_SCHEMA: bool = True
+    
+    # Database connection pool (seconds); each engine, sync and async, gets its own
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_SLOW_CHECKOUT_SECONDS: float = 0.1  # log a warning naming the routes holding connections
+    
+    # SQLite production mode: WAL, tuned pragmas and one writer thread with group commit
+    SQLITE_PRODUCTION_MODE: bool = True
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    SQLITE_WRITE_BATCH_SIZE: int = 64
+    SQLITE_WRITE_BATCH_WINDOW_MS: float = 2.0
+    
+    # Read replicas for get_read_db routes (seconds); writes and users who just wrote use the primary
+    DATABASE_REPLICA_URLS: List[str] = []
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_SECONDS: float = 2.0
+    
+    # Password hashing; existing hashes are upgraded on login when BCRYPT_ROUNDS changes
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    LOGIN_CONCURRENCY: int = 8
+    LOGIN_QUEUE_TIMEOUT: float = 10.0
+    
+    # Authenticated principal cache (seconds)
+    PRINCIPAL_CACHE_TTL: float = 30.0
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Cached Domain/EmailAccount rows for mail routes (seconds)
+    TENANT_REGISTRY_TTL: float = 300.0
+    TENANT_REGISTRY_MAX_ENTRIES: int = 10000
+    
+    # Response serialization
+    FAST_JSON_RESPONSES: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
+    # Upstream mail server circuit breakers and adaptive timeouts (seconds)
+    CIRCUIT_ERROR_THRESHOLD: float = 0.5
+    CIRCUIT_MIN_CALLS: int = 5
+    CIRCUIT_WINDOW_SIZE: int = 200
+    CIRCUIT_WINDOW_SECONDS: int = 60
+    CIRCUIT_OPEN_SECONDS: int = 30
+    UPSTREAM_TIMEOUT_MIN: float = 2.0
+    UPSTREAM_TIMEOUT_MAX: float = 30.0
+    UPSTREAM_TIMEOUT_P99_MULTIPLIER: float = 3.0
+    
+    # Folder export
+    EXPORT_BATCH_BYTES: int = 8 * 1024 * 1024
+    EXPORT_BATCH_MAX_MESSAGES: int = 100
+    EXPORT_FETCH_TIMEOUT: float = 120.0
+    
+    # Bulk import
+    IMPORT_CONNECTIONS: int = 4
+    IMPORT_QUEUE_SIZE: int = 32
+    IMPORT_APPEND_TIMEOUT: float = 60.0
+    IMPORT_JOB_RETENTION_SECONDS: float = 3600.0  # finished jobs stay pollable this long
+    IMPORT_MAX_JOBS: int = 1000
+    
+    # SMTP session pool (seconds)
+    SMTP_POOL_MAX_MESSAGES: int = 100
+    SMTP_POOL_IDLE_SECONDS: float = 60.0
+    SMTP_POOL_NOOP_AFTER: float = 10.0
+    SMTP_POOL_MAX_IDLE_PER_KEY: int = 4
+    SMTP_STREAM_CHUNK_BYTES: int = 1024 * 1024
+    
+    # Outbound delivery queue (seconds)
+    OUTBOUND_WORKER_IN_PROCESS: bool = True
+    OUTBOUND_WORKERS: int = 8
+    OUTBOUND_DOMAIN_CONCURRENCY: int = 4
+    OUTBOUND_MAX_ATTEMPTS: int = 8
+    OUTBOUND_RETRY_BASE: float = 30.0
+    OUTBOUND_RETRY_MAX: float = 3600.0
+    OUTBOUND_POLL_SECONDS: float = 2.0
+    OUTBOUND_CLAIM_TIMEOUT: float = 300.0
+    OUTBOUND_SPOOL_DIR: str = "./spool/outbound"
+    MAX_ATTACHMENT_MB: int = 25
+    
+    # Bulk send / mail merge
+    BULK_CONNECTIONS: int = 4
+    BULK_DOMAIN_RATE: float = 10.0  # messages per second to one recipient domain
+    BULK_QUOTA_BLOCK: int = 50
+    BULK_MAX_RECIPIENTS: int = 10000
+    BULK_JOB_RETENTION_SECONDS: float = 3600.0  # finished jobs and their results stay pollable this long
+    BULK_MAX_JOBS: int = 200
+    
+    # Send rate limits and daily quota accounting
+    RATE_LIMIT_BACKEND: str = "memory"  # or "redis" to share limits between workers
+    SEND_RATE_PER_USER: float = 1.0  # messages per second, sustained
+    SEND_BURST_PER_USER: int = 20
+    SEND_RATE_PER_DOMAIN: float = 20.0
+    SEND_BURST_PER_DOMAIN: int = 200
+    QUOTA_FLUSH_SECONDS: float = 30.0
+    
+    # Real-time chat delivery between API workers
+    CHAT_BUS_BACKEND: str = "memory"  # or "redis" so messages reach sockets held by other workers
+    CHAT_SEND_QUEUE_SIZE: int = 256  # frames waiting for one client before it is dropped as too slow
+    CHAT_SEND_TIMEOUT: float = 10.0  # seconds one frame may take to send
+    
+    # Copy of sent messages to the Sent folder (seconds)
+    SENT_COPY_ENABLED: bool = True
+    SENT_COPY_FOLDER: str = "Sent"
+    SENT_COPY_SPOOL_DIR: str = "./spool/sent"
+    SENT_COPY_APPEND_TIMEOUT: float = 60.0
+    SENT_COPY_IDLE_SECONDS: float = 60.0
+    SENT_COPY_MAX_ATTEMPTS: int = 10
+    SENT_COPY_RETRY_BASE: float = 5.0
+    SENT_COPY_RETRY_MAX: float = 900.0
     
     class Config:
         env_file = ".env"
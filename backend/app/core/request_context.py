@@ -0,0 +1,25 @@
+from contextvars import ContextVar
+from typing import Optional
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# "METHOD /path" of the request being handled; threadpool workers inherit it
+current_route: ContextVar[str] = ContextVar("current_route", default="-")
+# Id of the authenticated user, set by get_current_user
+current_user_id: ContextVar[Optional[int]] = ContextVar("current_user_id", default=None)
+
+class RequestContextMiddleware:
+    """Records the current route so code far from the handler can name it in logs"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        method = scope.get("method", "WS")
+        token = current_route.set(f"{method} {scope['path']}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_route.reset(token)
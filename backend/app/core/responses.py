@@ -0,0 +1,71 @@
+import enum
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+from uuid import UUID
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+def _default(obj: Any) -> Any:
+    """Fallback encoder for types neither orjson nor json handle natively"""
+    if isinstance(obj, BaseModel):
+        # Trusted internal models: emit field values as-is, skipping the
+        # serializer pass (no aliases or custom serializers are applied)
+        return obj.__dict__
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (Decimal, UUID)):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (or compact stdlib json as a fallback)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+_field_cache: Dict[Type[BaseModel], Tuple[str, ...]] = {}
+
+def _schema_fields(schema: Type[BaseModel]) -> Tuple[str, ...]:
+    fields = _field_cache.get(schema)
+    if fields is None:
+        fields = tuple(schema.model_fields)
+        _field_cache[schema] = fields
+    return fields
+
+def rows_to_dicts(rows: Iterable[Any], schema: Type[BaseModel]) -> List[Dict[str, Any]]:
+    """Project trusted ORM rows onto the fields of a response schema without validating them"""
+    fields = _schema_fields(schema)
+    return [{field: getattr(row, field) for field in fields} for row in rows]
+
+def fast_response(content: Any, schema: Optional[Type[BaseModel]] = None):
+    """Opt-in fast path for list endpoints that return trusted internal objects.
+
+    Returning a Response bypasses FastAPI's response_model validation and
+    jsonable_encoder pass. When FAST_JSON_RESPONSES is disabled the content is
+    returned untouched so the route falls back to the regular validated path.
+    """
+    if not settings.FAST_JSON_RESPONSES:
+        return content
+    if schema is not None:
+        content = rows_to_dicts(content, schema)
+    return FastJSONResponse(content)
@@ -1,13 +1,105 @@
+from typing import Any, Dict, Optional
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.database.pool_metrics import TimedAsyncAdaptedQueuePool, TimedQueuePool, instrument_pool
+from app.database.routing import RoutingSession, replica_router
+from app.database.sqlite import apply_pragmas, is_sqlite_file, sqlite_production_mode, use_immediate_transactions, write_queue
+
+def pool_options(url: str, poolclass) -> Dict[str, Any]:
+    """Pool settings for ``url``; in-memory and aiosqlite databases keep SQLAlchemy's default pools"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and (
+        parsed.database in (None, "", ":memory:") or parsed.get_driver_name() == "aiosqlite"
+    ):
+        # Each aiosqlite connection owns a thread, so SQLAlchemy opens one per checkout
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
 
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
+    **pool_options(settings.DATABASE_URL, TimedQueuePool)
+)
+instrument_pool(engine, "db")
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RoutingSession)
+
+if sqlite_production_mode(settings.DATABASE_URL):
+    apply_pragmas(engine)
+    # Query-only connections for read-heavy routes; under WAL they run alongside the writer
+    read_engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        **pool_options(settings.DATABASE_URL, TimedQueuePool)
+    )
+    apply_pragmas(read_engine, query_only=True)
+    instrument_pool(read_engine, "db_read")
+    # The write queue's one connection, owned by its writer thread
+    writer_engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=TimedQueuePool, pool_size=1, max_overflow=0,
+    )
+    apply_pragmas(writer_engine)
+    use_immediate_transactions(writer_engine)
+    instrument_pool(writer_engine, "db_writer")
+    write_queue.configure(
+        sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=writer_engine),
+        serialized=True,
+    )
+else:
+    read_engine = engine
+    write_queue.configure(SessionLocal, serialized=False)
+
+def replica_engine(url: str):
+    if not is_sqlite_file(url):
+        return create_engine(url, **pool_options(url, TimedQueuePool))
+    replica = create_engine(url, connect_args={"check_same_thread": False},
+                            **pool_options(url, TimedQueuePool))
+    if settings.SQLITE_PRODUCTION_MODE:
+        apply_pragmas(replica, query_only=True)
+    return replica
+
+replicas = {}
+for number, url in enumerate(settings.DATABASE_REPLICA_URLS, start=1):
+    replicas[f"replica{number}"] = replica_engine(url)
+    instrument_pool(replicas[f"replica{number}"], f"db_replica{number}")
+replica_router.configure(settings.DATABASE_URL, replicas)
+# Read-only sessions: a replica when one is close enough behind, otherwise read_engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine,
+                                class_=RoutingSession, info={"read_only": True})
+
+# Async drivers for the same database
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def async_database_url(url: str, override: Optional[str] = None) -> str:
+    if override:
+        return override
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = async_database_url(settings.DATABASE_URL, settings.ASYNC_DATABASE_URL)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL, TimedAsyncAdaptedQueuePool)
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_pool(async_engine.sync_engine, "db_async")
+if sqlite_production_mode(ASYNC_DATABASE_URL):
+    apply_pragmas(async_engine.sync_engine)
+# Objects stay readable after commit without another round trip
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -16,4 +108,17 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db():
+    """Session for routes that only read; routed to replicas, or query-only connections in SQLite production mode"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    """Session for async routes; queries await the driver instead of blocking the event loop"""
+    async with AsyncSessionLocal() as db:
+        yield db
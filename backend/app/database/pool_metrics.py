@@ -0,0 +1,109 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.request_context import current_route
+
+logger = logging.getLogger(__name__)
+
+class _TimedCheckout:
+    """Times Pool.connect(): the wait for a free slot plus checkout handlers such as pre-ping"""
+
+    metrics_name = "db"
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except Exception:
+            metrics.inc(f"{self.metrics_name}.checkout_failures")
+            raise
+        waited = time.perf_counter() - started
+        metrics.observe(f"{self.metrics_name}.checkout_seconds", waited)
+        if waited >= settings.DB_SLOW_CHECKOUT_SECONDS:
+            metrics.inc(f"{self.metrics_name}.slow_checkouts")
+            record_id, previous = getattr(_checkout, "record_id", None), getattr(_checkout, "previous", None)
+            released = f"{previous[0]} held it for {previous[1]:.2f}s" if previous else "it was newly opened"
+            logger.warning(
+                f"Waited {waited:.3f}s for a {self.metrics_name} connection in {current_route.get()}; "
+                f"{released}; also in use by {describe_holders(self, exclude=record_id)}"
+            )
+        return connection
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+# Checked-out connections per pool: id(connection record) -> (route, checked out at)
+_holders: Dict[int, Dict[int, Tuple[str, float]]] = {}
+# Last holder of each pooled connection: id(connection record) -> (route, seconds held)
+_last_holders: Dict[int, Tuple[str, float]] = {}
+_holders_lock = threading.Lock()
+# Set by the checkout event for the connect() call that triggered it, on the same thread
+_checkout = threading.local()
+
+def describe_holders(pool, limit: int = 5, exclude: Optional[int] = None) -> str:
+    now = time.monotonic()
+    with _holders_lock:
+        held = sorted((h for record_id, h in _holders.get(id(pool), {}).items() if record_id != exclude),
+                      key=lambda h: h[1])[:limit]
+    if not held:
+        return "nobody"
+    return ", ".join(f"{route} ({now - since:.1f}s)" for route, since in held)
+
+def _update_gauges(pool, name: str, in_use: int):
+    metrics.set_gauge(f"{name}.in_use", in_use)
+    metrics.set_gauge(f"{name}.overflow", max(0, pool.overflow()))
+
+def instrument_pool(engine, name: str):
+    """Feed the metrics registry from an engine's pool events under ``name``"""
+    pool = engine.pool
+    if not isinstance(pool, _TimedCheckout):
+        # In-memory and aiosqlite databases keep SQLAlchemy's default pools
+        return
+    pool.metrics_name = name
+    holders = _holders.setdefault(id(pool), {})
+    metrics.set_gauge(f"{name}.pool_size", pool.size())
+
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.inc(f"{name}.connections_opened")
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        record_id = id(connection_record)
+        with _holders_lock:
+            holders[record_id] = (current_route.get(), time.monotonic())
+            _checkout.record_id, _checkout.previous = record_id, _last_holders.get(record_id)
+            in_use = len(holders)
+        _update_gauges(pool, name, in_use)
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        record_id = id(connection_record)
+        with _holders_lock:
+            held = holders.pop(record_id, None)
+            if held is not None:
+                held = _last_holders[record_id] = (held[0], time.monotonic() - held[1])
+            in_use = len(holders)
+        if held is not None:
+            metrics.observe(f"{name}.hold_seconds", held[1])
+        _update_gauges(pool, name, in_use)
+
+    @event.listens_for(pool, "close")
+    def on_close(dbapi_connection, connection_record):
+        with _holders_lock:
+            _last_holders.pop(id(connection_record), None)
+
+def pool_stats(engine, name: str) -> Dict[str, Any]:
+    pool = engine.pool
+    stats: Dict[str, Any] = {"pool": pool.status(), **metrics.snapshot(f"{name}.")}
+    if isinstance(pool, _TimedCheckout):
+        stats["held_by"] = describe_holders(pool, limit=20)
+    return stats
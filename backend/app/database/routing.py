@@ -0,0 +1,163 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.request_context import current_user_id
+
+logger = logging.getLogger(__name__)
+
+def _sqlite_mtime(path: str) -> float:
+    # Under WAL, recent writes live in the -wal file
+    return max((os.path.getmtime(p) for p in (path, path + "-wal") if os.path.exists(p)), default=0.0)
+
+class Replica:
+    __slots__ = ("name", "engine", "lag", "healthy")
+
+    def __init__(self, name: str, engine: Engine):
+        self.name = name
+        self.engine = engine
+        self.lag: Optional[float] = None
+        self.healthy = False
+
+class ReplicaRouter:
+    """Picks a read replica for read-only sessions, or None for the primary.
+
+    Replica lag is probed at most every REPLICA_LAG_CHECK_SECONDS; replicas
+    further behind than REPLICA_MAX_LAG_SECONDS, or that fail the probe, are
+    skipped. A user who committed a write is kept off replicas until it has
+    had time to replicate (read-your-writes); that is tracked per worker.
+    """
+
+    def __init__(self):
+        self.primary_url: Optional[str] = None
+        self.replicas: List[Replica] = []
+        self._last_write: Dict[int, float] = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+        self.counters = {"replica_reads": 0, "primary_reads": 0, "sticky_reads": 0, "lagging": 0}
+
+    def configure(self, primary_url: str, replicas: Dict[str, Engine]):
+        self.primary_url = primary_url
+        self.replicas = [Replica(name, engine) for name, engine in replicas.items()]
+        self._checked_at = 0.0
+
+    def note_write(self, user_id: Optional[int] = None):
+        """Remember that ``user_id`` (default: the current user) just committed a write"""
+        user_id = current_user_id.get() if user_id is None else user_id
+        if user_id is not None and self.replicas:
+            self._last_write[user_id] = time.monotonic()
+
+    def choose(self) -> Optional[Engine]:
+        if not self.replicas:
+            return None
+        self._refresh_lag()
+        now = time.monotonic()
+        user_id = current_user_id.get()
+        wrote_at = self._last_write.get(user_id) if user_id is not None else None
+        since_write = None if wrote_at is None else now - wrote_at
+        stale_after = settings.REPLICA_MAX_LAG_SECONDS + settings.REPLICA_LAG_CHECK_SECONDS
+        if since_write is not None and since_write > stale_after:
+            # No usable replica can still be missing this write
+            self._last_write.pop(user_id, None)
+            since_write = None
+
+        candidates = [r for r in self.replicas
+                      if r.healthy and r.lag is not None and r.lag <= settings.REPLICA_MAX_LAG_SECONDS]
+        if since_write is not None:
+            # The lag was measured up to REPLICA_LAG_CHECK_SECONDS ago and may have grown since
+            fresh = [r for r in candidates if r.lag + settings.REPLICA_LAG_CHECK_SECONDS < since_write]
+            if candidates and not fresh:
+                self.counters["sticky_reads"] += 1
+            candidates = fresh
+        if not candidates:
+            self.counters["primary_reads"] += 1
+            return None
+        self.counters["replica_reads"] += 1
+        return candidates[next(self._next) % len(candidates)].engine
+
+    def _refresh_lag(self):
+        if time.monotonic() - self._checked_at < settings.REPLICA_LAG_CHECK_SECONDS:
+            return
+        if not self._lock.acquire(blocking=False):
+            # Another thread is probing; use the previous measurements
+            return
+        try:
+            self._checked_at = time.monotonic()
+            for replica in self.replicas:
+                try:
+                    replica.lag = self._probe(replica)
+                    replica.healthy = True
+                except Exception as e:
+                    if replica.healthy:
+                        logger.warning(f"Read replica {replica.name} is unavailable: {e}")
+                    replica.healthy = False
+                if replica.healthy and replica.lag > settings.REPLICA_MAX_LAG_SECONDS:
+                    self.counters["lagging"] += 1
+        finally:
+            self._lock.release()
+
+    def _probe(self, replica: Replica) -> float:
+        """Seconds the replica is behind the primary"""
+        url = replica.engine.url
+        if url.get_backend_name() == "sqlite":
+            # Local setups copy the primary file (see replicate_sqlite.py)
+            primary = _sqlite_mtime(make_url(self.primary_url).database)
+            copy = _sqlite_mtime(url.database)
+            if not copy:
+                raise FileNotFoundError(url.database)
+            with replica.engine.connect() as connection:
+                connection.exec_driver_sql("SELECT 1")
+            # Like PostgreSQL below: caught up, or behind since the copy was made
+            return 0.0 if primary <= copy else time.time() - copy
+        with replica.engine.connect() as connection:
+            if connection.dialect.name == "postgresql":
+                # Fully replayed means caught up, however old the last transaction is
+                return float(connection.exec_driver_sql(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                ).scalar())
+            connection.exec_driver_sql("SELECT 1")
+            return 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "replicas": [{"name": r.name, "healthy": r.healthy,
+                          "lag": None if r.lag is None else round(r.lag, 3)} for r in self.replicas],
+            "sticky_users": len(self._last_write),
+            **self.counters,
+        }
+
+class RoutingSession(Session):
+    """Session whose reads go to a replica when it is marked read-only.
+
+    Sessions from ReadSessionLocal carry ``info["read_only"]``; they pick a
+    replica (or fall back to their own bind) on first use and keep it, so a
+    request sees one consistent snapshot. Everything else uses the primary.
+    """
+
+    def get_bind(self, mapper=None, *, clause=None, **kw):
+        if self.info.get("read_only") and not self._flushing:
+            if "replica" not in self.info:
+                self.info["replica"] = replica_router.choose()
+            if self.info["replica"] is not None:
+                return self.info["replica"]
+        return super().get_bind(mapper, clause=clause, **kw)
+
+@event.listens_for(Session, "after_flush")
+def _flushed(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(Session, "after_commit")
+def _committed(session):
+    if session.info.pop("wrote", False):
+        replica_router.note_write()
+
+# Global replica router instance, configured in app.database.database
+replica_router = ReplicaRouter()
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.database.routing import replica_router
+
+logger = logging.getLogger(__name__)
+
+def is_sqlite_file(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+def sqlite_production_mode(url: str) -> bool:
+    return settings.SQLITE_PRODUCTION_MODE and is_sqlite_file(url)
+
+def apply_pragmas(engine, query_only: bool = False):
+    """Set WAL and the tuned pragmas on every new connection of ``engine``.
+
+    journal_mode is stored in the database file, the rest are per connection.
+    With WAL, readers never block the writer or each other.
+    """
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+        f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}",
+        # Negative sizes are in KiB rather than pages
+        f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}",
+    ]
+    if query_only:
+        pragmas.append("PRAGMA query_only=ON")
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+def use_immediate_transactions(engine):
+    """Take the write lock at BEGIN instead of on the first write.
+
+    pysqlite's own transaction handling is turned off so SAVEPOINTs work,
+    and a writer never has to upgrade a read lock, which is what fails with
+    "database is locked" even with a busy timeout.
+    """
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def on_begin(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+WriteJob = Callable[[Session], Any]
+
+class WriteQueue:
+    """Runs database writes on one thread, committing them in groups.
+
+    ``run(job)`` calls ``job(session)`` and returns its result once the
+    write is committed. In SQLite production mode jobs from every request
+    queue up for a single writer thread, which takes up to
+    SQLITE_WRITE_BATCH_SIZE of them (waiting SQLITE_WRITE_BATCH_WINDOW_MS
+    for more), runs each in a SAVEPOINT so one failure does not undo the
+    others, and commits once. Otherwise jobs run in the caller's thread in
+    their own session. Jobs should return plain values, not ORM objects.
+    """
+
+    def __init__(self):
+        self.session_factory: Optional[sessionmaker] = None
+        self.serialized = False
+        self._queue: "queue.Queue[Optional[Tuple[WriteJob, Future, float]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def configure(self, session_factory: sessionmaker, serialized: bool):
+        self.session_factory = session_factory
+        self.serialized = serialized
+
+    def submit(self, job: WriteJob) -> Future:
+        # The writer thread does not know whose write this is
+        replica_router.note_write()
+        future: Future = Future()
+        if not self.serialized:
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(self._run_direct(job))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self._ensure_thread()
+        self._queue.put((job, future, time.monotonic()))
+        return future
+
+    def run(self, job: WriteJob) -> Any:
+        """Blocking; for sync handlers and scripts"""
+        if not self.serialized:
+            return self._run_direct(job)
+        return self.submit(job).result()
+
+    async def run_async(self, job: WriteJob) -> Any:
+        if not self.serialized:
+            return await asyncio.get_running_loop().run_in_executor(None, self._run_direct, job)
+        return await asyncio.wrap_future(self.submit(job))
+
+    def _run_direct(self, job: WriteJob) -> Any:
+        db = self.session_factory()
+        try:
+            result = job(db)
+            db.commit()
+            return result
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._writer, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def _writer(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + settings.SQLITE_WRITE_BATCH_WINDOW_MS / 1000
+            while len(batch) < settings.SQLITE_WRITE_BATCH_SIZE:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch: List[Tuple[WriteJob, Future, float]]):
+        started = time.monotonic()
+        done: List[Tuple[Future, Any]] = []
+        db = self.session_factory()
+        try:
+            for job, future, queued_at in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                metrics.observe("sqlite_writer.queue_seconds", started - queued_at)
+                try:
+                    with db.begin_nested():
+                        done.append((future, job(db)))
+                except Exception as e:
+                    future.set_exception(e)
+            db.commit()
+        except Exception as e:
+            logger.error(f"SQLite group commit of {len(batch)} writes failed: {e}")
+            db.rollback()
+            for future, _ in done:
+                future.set_exception(e)
+            metrics.inc("sqlite_writer.failed_batches")
+            return
+        finally:
+            db.close()
+        for future, result in done:
+            future.set_result(result)
+        metrics.inc("sqlite_writer.batches")
+        metrics.inc("sqlite_writer.writes", len(done))
+        metrics.observe("sqlite_writer.commit_seconds", time.monotonic() - started)
+
+    def stop(self, timeout: float = 10.0):
+        """Finish queued writes and stop the writer thread"""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"serialized": self.serialized, "queued": self._queue.qsize(),
+                **metrics.snapshot("sqlite_writer.")}
+
+# Global write queue instance, configured in app.database.database
+write_queue = WriteQueue()
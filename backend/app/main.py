@@ -1,12 +1,20 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import auth, domains, users, emails, admin
 from app.api import chat, files, contacts
 # from app.api import rss  # Temporarily disabled due to feedparser Python 3.13 compatibility
 from app.core.config import settings
-from app.database.database import engine, Base
-
-Base.metadata.create_all(bind=engine)
+from app.core.compression import CompressionMiddleware
+from app.core.request_context import RequestContextMiddleware
+from app.database.database import engine, async_engine, Base
+from app.database.sqlite import write_queue
+from app.services.sent_copy import sent_copy_service
+from app.services.smtp_pool import smtp_pool
+from app.services.outbound_queue import outbound_queue
+from app.services.rate_limit import send_limiter
+from app.services.chat_fanout import manager as chat_manager
+from app.services.sessions import revoked_sessions
 
 app = FastAPI(title="Webmail Platform", version="1.0.0")
 
@@ -17,6 +25,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+app.add_middleware(RequestContextMiddleware)
 
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(domains.router, prefix="/api/domains", tags=["domains"])
@@ -28,6 +43,29 @@ app.include_router(files.router, prefix="/api/files", tags=["files"])
 app.include_router(contacts.router, prefix="/api", tags=["contacts"])
 # app.include_router(rss.router, prefix="/api")  # Temporarily disabled
 
+@app.on_event("startup")
+async def resume_background_jobs():
+    # Kept out of import so importing the app (workers, scripts, tests) stays cheap
+    if settings.AUTO_CREATE_SCHEMA:
+        await asyncio.to_thread(Base.metadata.create_all, bind=engine)
+    # Otherwise a fresh worker accepts tokens revoked elsewhere until its first poll
+    await revoked_sessions.prime()
+    # Sent copies spooled before a restart
+    sent_copy_service.resume()
+    # Otherwise deliveries are made by outbound_worker.py
+    if settings.OUTBOUND_WORKER_IN_PROCESS:
+        outbound_queue.start()
+    send_limiter.start()
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await outbound_queue.stop()
+    await smtp_pool.close_all()
+    await send_limiter.stop()
+    await chat_manager.close()
+    write_queue.stop()
+    await async_engine.dispose()
+
 @app.get("/")
 async def root():
     return {"message": "Webmail Platform API"}
\ No newline at end of file
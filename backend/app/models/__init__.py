@@ -1,3 +1,7 @@
 from .models import Domain, User, EmailAccount
 from .rss import RSSFeed, RSSEntry
-from .chat import ChatChannel, ChatMember, ChatMessage, UserPresence, ChatNotification
\ No newline at end of file
+from .chat import ChatChannel, ChatMember, ChatMessage, UserPresence, ChatNotification
+from .files import FileStorage, FileBookmark, FileSearchHistory
+from .contacts import Contact, ContactGroup, ContactGroupMembership
+from .outbound import OutboundMessage, OutboundStatus
+from .sessions import AuthSession
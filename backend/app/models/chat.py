@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database.database import Base
@@ -56,6 +56,11 @@ class ChatMember(Base):
     user = relationship("User")
     last_read_message = relationship("ChatMessage", foreign_keys=[last_read_message_id])
 
+    __table_args__ = (
+        # Membership checks on every chat read and post
+        Index("ix_chat_members_channel_id_user_id", "channel_id", "user_id"),
+    )
+
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
@@ -76,6 +81,12 @@ class ChatMessage(Base):
     user = relationship("User")
     reply_to = relationship("ChatMessage", remote_side=[id])
 
+    __table_args__ = (
+        # Unread counts (id > last read) and history pages (newest first) per channel
+        Index("ix_chat_messages_channel_id_id", "channel_id", "id"),
+        Index("ix_chat_messages_channel_id_created_at", "channel_id", "created_at"),
+    )
+
 class UserPresence(Base):
     __tablename__ = "user_presence"
 
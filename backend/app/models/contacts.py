@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from app.database.database import Base
 from datetime import datetime
@@ -26,6 +26,11 @@ class Contact(Base):
     domain = relationship("Domain")
     user = relationship("User", back_populates="contacts")
 
+    __table_args__ = (
+        # Contact lists and duplicate checks are per user, domain and address
+        Index("ix_contacts_user_id_domain_id_email", "user_id", "domain_id", "email"),
+    )
+
 class ContactGroup(Base):
     __tablename__ = "contact_groups"
     
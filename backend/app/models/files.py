@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from app.database.database import Base
 from datetime import datetime
@@ -37,6 +37,11 @@ class FileStorage(Base):
     user = relationship("User", back_populates="file_storages")
     bookmarks = relationship("FileBookmark", back_populates="storage", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Every storage lookup is scoped to the user and their domain
+        Index("ix_file_storages_user_id_domain_id", "user_id", "domain_id"),
+    )
+
 class FileBookmark(Base):
     __tablename__ = "file_bookmarks"
     
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database.database import Base
@@ -56,6 +56,11 @@ class User(Base):
     
     # Contact relationships
     contacts = relationship("Contact", back_populates="user")
+    
+    __table_args__ = (
+        # Login and token resolution look users up by address, within a domain
+        Index("ix_users_email_domain_id", "email", "domain_id"),
+    )
 
 class EmailAccount(Base):
     __tablename__ = "email_accounts"
@@ -72,6 +77,11 @@ class EmailAccount(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     user = relationship("User", back_populates="email_accounts")
+    
+    __table_args__ = (
+        # Active accounts of a user, listed on every mail page load
+        Index("ix_email_accounts_user_id_is_active", "user_id", "is_active"),
+    )
 
 class Theme(Base):
     __tablename__ = "themes"
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, JSON, LargeBinary, Index
+from app.database.database import Base
+from datetime import datetime
+import enum
+
+class OutboundStatus(enum.Enum):
+    QUEUED = "queued"
+    SENDING = "sending"
+    RETRY = "retry"
+    SENT = "sent"
+    DEAD = "dead"
+
+class OutboundMessage(Base):
+    """A composed message waiting for, or done with, SMTP delivery"""
+    __tablename__ = "outbound_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    email_account_id = Column(Integer, ForeignKey("email_accounts.id"), nullable=False)
+    domain_id = Column(Integer, ForeignKey("domains.id"), nullable=False)
+    sender = Column(String(255), nullable=False)
+    recipients = Column(JSON, nullable=False)
+    subject = Column(String(998), nullable=True)
+    message = Column(LargeBinary, nullable=True)  # serialized MIME, dropped once sent
+    message_path = Column(String(500), nullable=True)  # or a spooled MIME file, for large messages
+    status = Column(Enum(OutboundStatus), nullable=False, default=OutboundStatus.QUEUED)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)  # refreshed by the delivering worker's heartbeat
+    claim_token = Column(String(32), nullable=True)  # identifies the claim an outcome belongs to
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # The dispatcher polls for due messages by status and time
+        Index("ix_outbound_messages_status_next_attempt", "status", "next_attempt_at"),
+    )
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from app.database.database import Base
+from datetime import datetime
+
+class AuthSession(Base):
+    """A login, renewable through its refresh token until it expires or is revoked"""
+    __tablename__ = "auth_sessions"
+
+    id = Column(String(32), primary_key=True)  # random, also the "sid" claim of access tokens
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    refresh_hash = Column(String(64), nullable=False)  # HMAC of the current refresh secret
+    generation = Column(Integer, default=0)  # rotations so far
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_auth_sessions_user_id", "user_id"),
+        # Recently revoked sessions are polled into every worker's revocation list
+        Index("ix_auth_sessions_revoked_at", "revoked_at"),
+    )
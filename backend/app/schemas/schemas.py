@@ -89,6 +89,11 @@ class Theme(ThemeBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -104,6 +109,9 @@ class EmailMessage(BaseModel):
     body_html: Optional[str] = None
     is_read: bool = False
     has_attachments: bool = False
+    attachment_count: int = 0
+    attachment_size: int = 0
+    has_inline_images: bool = False
     folder: str = "INBOX"
     thread_id: Optional[str] = None
     message_id: Optional[str] = None
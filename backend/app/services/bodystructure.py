@@ -0,0 +1,168 @@
+import re
+from typing import Any, List, Optional, Sequence, Tuple
+
+_TOKEN = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|\{(\d+)\}\r\n|([^\s()"]+))')
+_LITERAL_MARKER = re.compile(rb"\{(\d+)\}$")
+_HEADER_LITERAL = re.compile(rb"BODY\[HEADER\.FIELDS \([^)]*\)\]\s*\{\d+\}$", re.IGNORECASE)
+_UNESCAPE = re.compile(rb"\\(.)")
+
+class AttachmentSummary:
+    """Attachment manifest derived from a BODYSTRUCTURE response"""
+
+    __slots__ = ("count", "total_size", "has_inline_images")
+
+    def __init__(self, count: int = 0, total_size: int = 0, has_inline_images: bool = False):
+        self.count = count
+        self.total_size = total_size
+        self.has_inline_images = has_inline_images
+
+    @property
+    def has_attachments(self) -> bool:
+        return self.count > 0
+
+def parse_sexp(data: bytes, start: int = 0) -> Optional[list]:
+    """Parse one parenthesized IMAP list starting at ``start``.
+
+    Strings (quoted or literal) are returned as bytes, NIL as None. Returns
+    None when the data is truncated.
+    """
+    stack: List[list] = []
+    current: Optional[list] = None
+    pos = start
+    length = len(data)
+
+    while pos < length:
+        match = _TOKEN.match(data, pos)
+        if match is None:
+            break
+        pos = match.end()
+        opened, closed, quoted, literal, atom = match.groups()
+        if literal is not None:
+            size = int(literal)
+            if pos + size > length:
+                return None
+            value = data[pos:pos + size]
+            pos += size
+            if current is not None:
+                current.append(value)
+        elif opened:
+            child: list = []
+            if current is not None:
+                current.append(child)
+                stack.append(current)
+            current = child
+        elif closed:
+            if current is None:
+                return None
+            if not stack:
+                return current
+            current = stack.pop()
+        elif current is None:
+            # Skip anything preceding the opening parenthesis
+            continue
+        elif quoted is not None:
+            current.append(_UNESCAPE.sub(rb"\1", quoted) if b"\\" in quoted else quoted)
+        elif atom.upper() == b"NIL":
+            current.append(None)
+        else:
+            current.append(atom)
+
+    return None
+
+def split_fetch_response(lines: Sequence[bytes]) -> Tuple[bytes, bytes]:
+    """Split aioimaplib FETCH response lines into (header literal, the rest).
+
+    The header literal is the one announced after BODY[HEADER.FIELDS. Any
+    other literal, such as an 8-bit filename inside BODYSTRUCTURE, is put
+    back inline as {N}\\r\\n<data> so parse_sexp reads it as a string.
+    """
+    header = b""
+    rest: List[bytes] = []
+    index = 0
+    while index < len(lines):
+        line = bytes(lines[index])
+        marker = _LITERAL_MARKER.search(line)
+        if marker is None or index + 1 >= len(lines):
+            rest.append(line)
+            index += 1
+            continue
+        literal = bytes(lines[index + 1])
+        if not header and _HEADER_LITERAL.search(line):
+            header = literal
+            rest.append(line[:marker.start()] + b'""')
+        else:
+            rest.append(line + b"\r\n" + literal)
+        index += 2
+    return header, b"".join(rest)
+
+def extract_bodystructure(response: bytes) -> Optional[list]:
+    index = response.upper().find(b"BODYSTRUCTURE")
+    if index < 0:
+        return None
+    return parse_sexp(response, index + len(b"BODYSTRUCTURE"))
+
+def _lower(value: Any) -> str:
+    return value.decode("ascii", errors="ignore").lower() if isinstance(value, bytes) else ""
+
+def _int(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+def _has_param(params: Any, *names: str) -> bool:
+    if not isinstance(params, list):
+        return False
+    return any(_lower(key) in names for key in params[0::2])
+
+def _disposition(part: list, main_type: str, sub_type: str):
+    # Extension data follows the basic fields (7), plus lines for text/*, plus
+    # envelope/body/lines for message/rfc822, plus body MD5
+    index = 8
+    if main_type == "text":
+        index = 9
+    elif main_type == "message" and sub_type == "rfc822":
+        index = 11
+    value = part[index] if len(part) > index else None
+    if isinstance(value, list) and value:
+        return _lower(value[0]), value[1] if len(value) > 1 else None
+    return "", None
+
+def _walk(part: list, summary: AttachmentSummary) -> None:
+    if not part:
+        return
+
+    if isinstance(part[0], list):
+        # Multipart: child parts followed by the subtype
+        for child in part:
+            if not isinstance(child, list):
+                break
+            _walk(child, summary)
+        return
+
+    if len(part) < 7:
+        return
+
+    main_type, sub_type = _lower(part[0]), _lower(part[1])
+    content_id = part[3]
+    encoding = _lower(part[5])
+    size = _int(part[6])
+    disposition, disposition_params = _disposition(part, main_type, sub_type)
+    named = _has_param(part[2], "name") or _has_param(disposition_params, "filename", "filename*")
+
+    if main_type == "image" and disposition != "attachment" and (content_id or disposition == "inline"):
+        summary.has_inline_images = True
+        return
+
+    is_body_text = main_type == "text" and sub_type in ("plain", "html") and not named
+    if disposition == "attachment" or (named and not is_body_text) or (
+            main_type not in ("text", "multipart") and disposition != "inline" and not content_id):
+        summary.count += 1
+        # BODYSTRUCTURE reports encoded octets; approximate the decoded size
+        summary.total_size += size * 3 // 4 if encoding == "base64" else size
+
+def summarize_attachments(structure: Optional[list]) -> AttachmentSummary:
+    summary = AttachmentSummary()
+    if structure:
+        _walk(structure, summary)
+    return summary
@@ -0,0 +1,240 @@
+import asyncio
+import html
+import logging
+import re
+import time
+import uuid
+from typing import Awaitable, Dict, Iterator, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.database.database import SessionLocal
+from app.models.models import Domain, EmailAccount
+from app.models.contacts import Contact, ContactGroupMembership
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.email_service import email_service
+from app.services.outbound_queue import outbound_queue, is_permanent_failure
+from app.services.rate_limit import send_limiter
+from app.services.smtp_pool import smtp_pool
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+def render_template(template: Optional[str], fields: Dict[str, str], escape: bool = False) -> Optional[str]:
+    """Replace {{ name }} placeholders; unknown names render empty"""
+    if not template:
+        return template
+
+    def substitute(match):
+        value = str(fields.get(match.group(1), "") or "")
+        return html.escape(value) if escape else value
+
+    return _PLACEHOLDER.sub(substitute, template)
+
+def contact_group_recipients(group_id: int, user_id: int, page_size: int = 500) -> Iterator[Dict[str, str]]:
+    """Stream a contact group's members as merge fields, one page at a time.
+
+    The session is closed between pages so a long send holds no connection.
+    Blocking; BulkSendService advances it in a worker thread.
+    """
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            contacts = db.query(Contact).join(
+                ContactGroupMembership, ContactGroupMembership.contact_id == Contact.id
+            ).filter(
+                ContactGroupMembership.group_id == group_id,
+                Contact.user_id == user_id,
+                Contact.id > last_id
+            ).order_by(Contact.id).limit(page_size).all()
+        finally:
+            db.close()
+        if not contacts:
+            return
+        for contact in contacts:
+            yield {
+                "email": contact.email,
+                "first_name": contact.first_name or "",
+                "last_name": contact.last_name or "",
+                "full_name": " ".join(filter(None, [contact.first_name, contact.last_name])),
+                "company": contact.company or "",
+                "job_title": contact.job_title or "",
+            }
+        last_id = contacts[-1].id
+
+class BulkTemplate:
+    __slots__ = ("subject", "body_text", "body_html")
+
+    def __init__(self, subject: str, body_text: Optional[str] = None, body_html: Optional[str] = None):
+        self.subject = subject
+        self.body_text = body_text
+        self.body_html = body_html
+
+def render_messages(email_account: EmailAccount, template: BulkTemplate,
+                    recipients: Iterator[Dict[str, str]]) -> Iterator[Tuple[str, str, bytes]]:
+    """Lazily yield (address, subject, message), one personalized message at a time.
+
+    Addresses are de-duplicated case-insensitively.
+    """
+    seen = set()
+    for fields in recipients:
+        address = (fields.get("email") or "").strip()
+        if not address or address.lower() in seen:
+            continue
+        seen.add(address.lower())
+        subject = render_template(template.subject, fields)
+        yield address, subject, email_service.compose_message(
+            email_account, [address], subject,
+            render_template(template.body_text, fields),
+            render_template(template.body_html, fields, escape=True),
+        )
+
+class BulkJob:
+    def __init__(self, owner_id: int, total: int):
+        self.id = uuid.uuid4().hex
+        self.owner_id = owner_id
+        self.status = "running"
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.queued = 0
+        self.skipped = 0
+        self.cancelled = False
+        self.results: List[Dict[str, str]] = []
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def record(self, address: str, status: str, error: Optional[str] = None):
+        setattr(self, status, getattr(self, status) + 1)
+        result = {"email": address, "status": status}
+        if error:
+            result["error"] = error
+        self.results.append(result)
+
+    def to_dict(self) -> Dict:
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.sent + self.failed + self.queued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "queued_for_retry": self.queued,
+            "skipped": self.skipped,
+            "messages_per_minute": round(self.sent / elapsed * 60, 1) if elapsed > 0 else 0.0,
+        }
+
+class BulkSendService:
+    """Mail merge: one template, many recipients, a few pooled SMTP sessions.
+
+    BULK_CONNECTIONS workers pull from a shared, lazily rendered message
+    stream, each reusing a pooled session. Rendering and any contact lookups
+    run in a worker thread, one message at a time.
+    Sends to any one recipient domain are spaced to BULK_DOMAIN_RATE per
+    second, and the sender's daily quota is reserved in blocks as it goes.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, BulkJob] = {}
+        self._domain_next_send: Dict[str, float] = {}
+        # Running jobs; the loop only holds weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    def start_job(self, owner_id: int, total: int) -> BulkJob:
+        self._evict_finished()
+        job = BulkJob(owner_id, total)
+        self.jobs[job.id] = job
+        return job
+
+    def run_in_background(self, coro: Awaitable) -> asyncio.Task:
+        """Run a job's coroutine, keeping the task referenced until it ends"""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _evict_finished(self):
+        """Forget finished jobs past their retention, and the oldest ones beyond BULK_MAX_JOBS"""
+        cutoff = time.time() - settings.BULK_JOB_RETENTION_SECONDS
+        finished = sorted((job for job in self.jobs.values() if job.finished_at is not None),
+                          key=lambda job: job.finished_at)
+        excess = len(self.jobs) - settings.BULK_MAX_JOBS + 1
+        for index, job in enumerate(finished):
+            if job.finished_at < cutoff or index < excess:
+                del self.jobs[job.id]
+
+    def get_job(self, job_id: str) -> Optional[BulkJob]:
+        return self.jobs.get(job_id)
+
+    async def _throttle(self, address: str):
+        recipient_domain = address.rpartition("@")[2].lower()
+        now = time.monotonic()
+        slot = max(now, self._domain_next_send.get(recipient_domain, 0.0))
+        self._domain_next_send[recipient_domain] = slot + 1.0 / settings.BULK_DOMAIN_RATE
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _worker(self, job: BulkJob, domain: Domain, email_account: EmailAccount,
+                      messages: Iterator[Tuple[str, str, bytes]], allowance: List[int],
+                      messages_lock: asyncio.Lock):
+        while not job.cancelled:
+            # A generator can only be advanced by one thread at a time
+            async with messages_lock:
+                item = await asyncio.to_thread(next, messages, None)
+            if item is None:
+                return
+            if allowance[0] == 0:
+                # Another worker may top up the allowance while this one waits
+                allowance[0] += await send_limiter.reserve_quota(job.owner_id, settings.BULK_QUOTA_BLOCK)
+                if allowance[0] == 0:
+                    job.status = "quota_exceeded"
+                    return
+            allowance[0] -= 1
+            address, subject, message = item
+
+            await self._throttle(address)
+            try:
+                async with smtp_pool.session(domain, email_account) as smtp:
+                    await smtp.sendmail(email_account.email_address, [address], message)
+                job.record(address, "sent")
+            except Exception as e:
+                if is_permanent_failure(e):
+                    job.record(address, "failed", str(e))
+                    continue
+                # Transient: hand the message to the durable queue instead of failing it
+                try:
+                    await outbound_queue.enqueue(job.owner_id, domain, email_account, [address],
+                                                 subject, message)
+                    job.record(address, "queued", str(e))
+                except Exception as queue_error:
+                    job.record(address, "failed", str(queue_error))
+                if isinstance(e, CircuitOpenError):
+                    await asyncio.sleep(min(e.retry_after, 5.0))
+
+    async def run(self, job: BulkJob, domain: Domain, email_account: EmailAccount,
+                  template: BulkTemplate, recipients: Iterator[Dict[str, str]]) -> BulkJob:
+        messages = render_messages(email_account, template, recipients)
+        allowance = [0]
+        messages_lock = asyncio.Lock()
+        try:
+            await asyncio.gather(*[
+                self._worker(job, domain, email_account, messages, allowance, messages_lock)
+                for _ in range(settings.BULK_CONNECTIONS)
+            ])
+            if job.cancelled:
+                job.status = "cancelled"
+            elif job.status == "running":
+                job.status = "completed"
+        except Exception as e:
+            logger.error(f"Bulk send {job.id} failed: {e}")
+            job.status = "failed"
+        finally:
+            await send_limiter.release_quota(job.owner_id, allowance[0])
+            # Duplicates, blank addresses and anything cut off by quota or cancel
+            job.skipped = max(0, job.total - (job.sent + job.failed + job.queued))
+            job.finished_at = time.time()
+        return job
+
+# Global bulk send service instance
+bulk_send_service = BulkSendService()
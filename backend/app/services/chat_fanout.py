@@ -0,0 +1,356 @@
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+from fastapi import WebSocket
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.database.database import AsyncSessionLocal
+from app.models.chat import ChatMember
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - only needed for CHAT_BUS_BACKEND=redis
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Bus events: SEND carries a frame for the topic's sockets, JOIN the id of a
+# channel the topic's user was just added to
+SEND = "send"
+JOIN = "join"
+
+EventHandler = Callable[[str, str, str], Awaitable[None]]
+
+class MemoryHub:
+    """Plays the part of the Redis server for MemoryBus instances in one process"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set["MemoryBus"]] = defaultdict(set)
+
+class MemoryBus:
+    """In-process bus; one worker on its own, or several simulated ones sharing a hub"""
+
+    def __init__(self, hub: Optional[MemoryHub] = None):
+        self.hub = hub or MemoryHub()
+        self.handler: Optional[EventHandler] = None
+        self.topics: Set[str] = set()
+
+    def start(self, handler: EventHandler):
+        self.handler = handler
+
+    async def subscribe(self, topic: str):
+        self.topics.add(topic)
+        self.hub.subscribers[topic].add(self)
+
+    async def unsubscribe(self, topic: str):
+        self.topics.discard(topic)
+        buses = self.hub.subscribers.get(topic)
+        if buses is not None:
+            buses.discard(self)
+            if not buses:
+                del self.hub.subscribers[topic]
+
+    async def publish(self, topic: str, event: str, data: str):
+        # The publishing worker delivers to its own sockets itself
+        for bus in list(self.hub.subscribers.get(topic, ())):
+            if bus is not self and bus.handler is not None:
+                await bus.handler(topic, event, data)
+
+    async def close(self):
+        for topic in list(self.topics):
+            await self.unsubscribe(topic)
+
+class RedisBus:
+    """Pub/sub through Redis, shared by every worker.
+
+    Each worker subscribes only to the topics of the channels and users it
+    holds sockets for, so Redis forwards an event only to the workers that
+    will deliver it. Events are "<origin>\\n<event>\\n<data>"; a worker skips
+    its own, having delivered them locally before publishing.
+    """
+
+    PREFIX = "chat:"
+
+    def __init__(self, url: str):
+        if aioredis is None:
+            raise RuntimeError("CHAT_BUS_BACKEND=redis requires the redis package")
+        self.client = aioredis.from_url(url)
+        self.pubsub = self.client.pubsub()
+        self.origin = uuid.uuid4().hex
+        self.handler: Optional[EventHandler] = None
+        self.topics: Set[str] = set()
+        self._listener: Optional[asyncio.Task] = None
+
+    def start(self, handler: EventHandler):
+        self.handler = handler
+
+    async def subscribe(self, topic: str):
+        self.topics.add(topic)
+        await self.pubsub.subscribe(self.PREFIX + topic)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.ensure_future(self._listen())
+
+    async def unsubscribe(self, topic: str):
+        self.topics.discard(topic)
+        await self.pubsub.unsubscribe(self.PREFIX + topic)
+
+    async def publish(self, topic: str, event: str, data: str):
+        await self.client.publish(self.PREFIX + topic, f"{self.origin}\n{event}\n{data}")
+
+    async def _listen(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # redis-py reconnects and resubscribes on the next read
+                logger.error(f"Chat bus connection failed, retrying: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            origin, event, data = message["data"].decode().split("\n", 2)
+            if origin == self.origin:
+                continue
+            topic = message["channel"].decode()[len(self.PREFIX):]
+            try:
+                await self.handler(topic, event, data)
+            except Exception as e:
+                logger.error(f"Failed to handle chat event on {topic}: {e}")
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        await self.pubsub.reset()
+        await self.client.close()
+
+# Last frame for a client dropped for falling behind: it should reload its
+# channels over HTTP, then reconnect
+RESYNC_FRAME = '{"type":"resync"}'
+RESYNC_CLOSE_CODE = 1013  # Try Again Later
+
+class Connection:
+    """One chat WebSocket with a bounded send queue drained by its own writer task"""
+
+    __slots__ = ("websocket", "user_id", "channels", "queue", "writer", "closed")
+
+    def __init__(self, websocket: WebSocket, user_id: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.channels: Set[int] = set()
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=settings.CHAT_SEND_QUEUE_SIZE)
+        self.writer: Optional[asyncio.Task] = None
+        self.closed = False
+
+class ConnectionManager:
+    """Chat WebSockets held by this worker, indexed by user and by channel.
+
+    A frame for a channel goes to the connections in ``channels[channel_id]``,
+    so fanout costs one queue put per subscriber rather than a walk over
+    every connected user, and never waits for a client: each connection's
+    writer task sends its queue in order. A client whose queue fills up
+    (CHAT_SEND_QUEUE_SIZE) or that takes longer than CHAT_SEND_TIMEOUT for
+    one frame is dropped with a resync hint instead of holding up the rest.
+    The bus carries frames to the other workers: CHAT_BUS_BACKEND=redis when
+    there are several, the in-process bus otherwise.
+    """
+
+    def __init__(self, bus=None):
+        self._bus = bus
+        if bus is not None:
+            bus.start(self._on_event)
+        self.sockets: Dict[WebSocket, Connection] = {}
+        self.active_connections: Dict[int, Set[Connection]] = {}
+        self.channels: Dict[int, Set[Connection]] = {}
+        self._closing: Set[asyncio.Task] = set()
+
+    @property
+    def bus(self):
+        if self._bus is None:
+            self._bus = (RedisBus(settings.REDIS_URL) if settings.CHAT_BUS_BACKEND == "redis"
+                         else MemoryBus())
+            self._bus.start(self._on_event)
+        return self._bus
+
+    async def connect(self, websocket: WebSocket, user_id: int):
+        await websocket.accept()
+        channel_ids = await self._load_channels(user_id)
+        connection = Connection(websocket, user_id)
+        connection.writer = asyncio.ensure_future(self._write(connection))
+        self.sockets[websocket] = connection
+        connections = self.active_connections.setdefault(user_id, set())
+        connections.add(connection)
+        if len(connections) == 1:
+            await self._subscribe(f"user:{user_id}")
+        for channel_id in channel_ids:
+            await self._index(connection, channel_id)
+
+    async def disconnect(self, websocket: WebSocket, user_id: int):
+        connection = self.sockets.get(websocket)
+        if connection is None:
+            # Already dropped as a slow consumer
+            return
+        connection.writer.cancel()
+        for topic in self._unindex(connection):
+            await self._unsubscribe(topic)
+
+    async def send_personal_message(self, message: str, user_id: int):
+        self._deliver(self.active_connections.get(user_id, ()), message)
+        await self._publish(f"user:{user_id}", SEND, message)
+
+    async def broadcast_to_channel(self, message: str, channel_id: int):
+        """Queue ``message``, an already serialized frame, for every subscriber of the channel"""
+        self._deliver(self.channels.get(channel_id, ()), message)
+        await self._publish(f"channel:{channel_id}", SEND, message)
+
+    async def add_members(self, channel_id: int, user_ids: Iterable[int]):
+        """Index the open sockets of users just added to a channel, on every worker"""
+        for user_id in user_ids:
+            await self._join(user_id, channel_id)
+            await self._publish(f"user:{user_id}", JOIN, str(channel_id))
+
+    async def _load_channels(self, user_id: int) -> List[int]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(ChatMember.channel_id).where(ChatMember.user_id == user_id))
+            return [channel_id for channel_id, in result]
+
+    async def _join(self, user_id: int, channel_id: int):
+        for connection in list(self.active_connections.get(user_id, ())):
+            await self._index(connection, channel_id)
+
+    async def _index(self, connection: Connection, channel_id: int):
+        if connection.closed or channel_id in connection.channels:
+            return
+        connection.channels.add(channel_id)
+        connections = self.channels.setdefault(channel_id, set())
+        connections.add(connection)
+        if len(connections) == 1:
+            await self._subscribe(f"channel:{channel_id}")
+
+    def _unindex(self, connection: Connection) -> List[str]:
+        """Forget ``connection``; returns the topics no local socket needs any more"""
+        connection.closed = True
+        self.sockets.pop(connection.websocket, None)
+        topics = []
+        for channel_id in connection.channels:
+            connections = self.channels.get(channel_id)
+            if connections is None:
+                continue
+            connections.discard(connection)
+            if not connections:
+                del self.channels[channel_id]
+                topics.append(f"channel:{channel_id}")
+        connections = self.active_connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self.active_connections[connection.user_id]
+                topics.append(f"user:{connection.user_id}")
+        return topics
+
+    def _deliver(self, connections: Iterable[Connection], message: str):
+        delivered = 0
+        for connection in list(connections):
+            try:
+                connection.queue.put_nowait(message)
+                delivered += 1
+            except asyncio.QueueFull:
+                self._evict(connection, "send queue full")
+        metrics.inc("chat_fanout.delivered", delivered)
+
+    async def _write(self, connection: Connection):
+        while True:
+            message = await connection.queue.get()
+            try:
+                await asyncio.wait_for(connection.websocket.send_text(message), settings.CHAT_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                self._evict(connection, f"send took over {settings.CHAT_SEND_TIMEOUT}s")
+                return
+            except Exception:
+                # Closed by the client; the endpoint's receive loop disconnects it
+                return
+            metrics.inc("chat_fanout.sent")
+
+    def _evict(self, connection: Connection, reason: str):
+        if connection.closed:
+            return
+        logger.warning(f"Dropping slow chat client of user {connection.user_id}: {reason}")
+        metrics.inc("chat_fanout.evicted")
+        task = asyncio.ensure_future(self._close_evicted(connection, self._unindex(connection)))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close_evicted(self, connection: Connection, topics: List[str]):
+        if connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        try:
+            await asyncio.wait_for(connection.websocket.send_text(RESYNC_FRAME), settings.CHAT_SEND_TIMEOUT)
+        except Exception:
+            pass
+        try:
+            # The close code and reason carry the hint if the frame did not get through
+            await connection.websocket.close(code=RESYNC_CLOSE_CODE, reason="resync")
+        except Exception:
+            pass
+        for topic in topics:
+            await self._unsubscribe(topic)
+
+    async def _on_event(self, topic: str, event: str, data: str):
+        """An event published by another worker"""
+        metrics.inc("chat_fanout.received")
+        kind, _, key = topic.partition(":")
+        if event == JOIN:
+            await self._join(int(key), int(data))
+        elif kind == "channel":
+            self._deliver(self.channels.get(int(key), ()), data)
+        else:
+            self._deliver(self.active_connections.get(int(key), ()), data)
+
+    async def _publish(self, topic: str, event: str, data: str):
+        metrics.inc("chat_fanout.published")
+        try:
+            await self.bus.publish(topic, event, data)
+        except Exception as e:
+            # Local sockets already have it; other workers miss this one
+            metrics.inc("chat_fanout.publish_errors")
+            logger.error(f"Failed to publish chat event on {topic}: {e}")
+
+    async def _subscribe(self, topic: str):
+        try:
+            await self.bus.subscribe(topic)
+        except Exception as e:
+            logger.error(f"Failed to subscribe to chat events on {topic}: {e}")
+
+    async def _unsubscribe(self, topic: str):
+        try:
+            await self.bus.unsubscribe(topic)
+        except Exception as e:
+            logger.error(f"Failed to unsubscribe from chat events on {topic}: {e}")
+
+    async def close(self):
+        writers = [connection.writer for connection in self.sockets.values()]
+        for writer in writers:
+            writer.cancel()
+        await asyncio.gather(*writers, *self._closing, return_exceptions=True)
+        if self._bus is not None:
+            await self._bus.close()
+
+    def stats(self):
+        return {
+            "backend": settings.CHAT_BUS_BACKEND,
+            "sockets": len(self.sockets),
+            "users": len(self.active_connections),
+            "channels": len(self.channels),
+            "topics": len(self._bus.topics) if self._bus is not None else 0,
+            "queued": sum(connection.queue.qsize() for connection in self.sockets.values()),
+            **metrics.snapshot("chat_fanout."),
+        }
+
+# Global connection manager instance
+manager = ConnectionManager()
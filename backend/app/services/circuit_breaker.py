@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+import aioimaplib
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Errors that say something about the health of the remote server, as opposed
+# to application-level failures such as a missing message
+UPSTREAM_ERRORS: Tuple[type, ...] = (
+    asyncio.TimeoutError, OSError, aioimaplib.CommandTimeout, aioimaplib.Abort
+)
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} is unavailable, retry in {retry_after:.0f}s")
+
+class LatencyWindow:
+    """Recent latency samples for one kind of operation"""
+
+    def __init__(self, size: int):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class CircuitBreaker:
+    """Tracks error rate and latency for one upstream server.
+
+    CLOSED lets every call through. When the error rate over the recent
+    window crosses the threshold the breaker OPENs and calls fail fast. After
+    the cooldown one probe is let through (HALF_OPEN); its outcome closes or
+    re-opens the breaker.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.outcomes: Deque[Tuple[float, bool]] = deque(maxlen=settings.CIRCUIT_WINDOW_SIZE)
+        self.latency: Dict[str, LatencyWindow] = {
+            "connect": LatencyWindow(settings.CIRCUIT_WINDOW_SIZE),
+            "command": LatencyWindow(settings.CIRCUIT_WINDOW_SIZE),
+        }
+
+    def timeout(self, kind: str) -> float:
+        """Adaptive timeout: a multiple of the observed p99, clamped to bounds"""
+        p99 = self.latency[kind].percentile(0.99)
+        if p99 is None or len(self.latency[kind].samples) < settings.CIRCUIT_MIN_CALLS:
+            return settings.UPSTREAM_TIMEOUT_MAX
+        return min(settings.UPSTREAM_TIMEOUT_MAX,
+                   max(settings.UPSTREAM_TIMEOUT_MIN, p99 * settings.UPSTREAM_TIMEOUT_P99_MULTIPLIER))
+
+    def error_rate(self) -> float:
+        cutoff = time.monotonic() - settings.CIRCUIT_WINDOW_SECONDS
+        recent = [ok for at, ok in self.outcomes if at >= cutoff]
+        if len(recent) < settings.CIRCUIT_MIN_CALLS:
+            return 0.0
+        return recent.count(False) / len(recent)
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may proceed now"""
+        if self.state == CLOSED:
+            return
+        remaining = self.opened_at + settings.CIRCUIT_OPEN_SECONDS - time.monotonic()
+        if self.state == OPEN and remaining <= 0:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return
+        raise CircuitOpenError(self.name, max(remaining, 1.0))
+
+    def record_success(self, kind: str, seconds: float):
+        self.latency[kind].add(seconds)
+        self.outcomes.append((time.monotonic(), True))
+        if self.state == HALF_OPEN:
+            logger.info(f"Circuit for {self.name} closed after successful probe")
+            self.state = CLOSED
+            self.probe_in_flight = False
+            self.outcomes.clear()
+
+    def record_failure(self):
+        self.outcomes.append((time.monotonic(), False))
+        if self.state == HALF_OPEN or (self.state == CLOSED and
+                                       self.error_rate() >= settings.CIRCUIT_ERROR_THRESHOLD):
+            if self.state == CLOSED:
+                logger.warning(f"Circuit for {self.name} opened, error rate {self.error_rate():.0%}")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def record_error(self, error: BaseException):
+        """Count ``error`` if it says the server is unhealthy and was not
+        already counted by call()"""
+        if isinstance(error, UPSTREAM_ERRORS) and not getattr(error, "breaker_recorded", False):
+            self.record_failure()
+
+    async def call(self, kind: str, operation: Callable[[], Awaitable[Any]],
+                   timeout: Optional[float] = None) -> Any:
+        """Run ``operation`` under the breaker with an adaptive timeout"""
+        self.before_call()
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(operation(), timeout or self.timeout(kind))
+        except UPSTREAM_ERRORS as e:
+            self.record_failure()
+            # Callers further up may see the same error; count it only once
+            e.breaker_recorded = True
+            raise
+        except BaseException:
+            # Not a server-health failure; release a half-open probe slot
+            self.probe_in_flight = False
+            raise
+        self.record_success(kind, time.monotonic() - started)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "error_rate": round(self.error_rate(), 3),
+            "connect_p99": self.latency["connect"].percentile(0.99),
+            "command_p99": self.latency["command"].percentile(0.99),
+            "connect_timeout": self.timeout("connect"),
+            "command_timeout": self.timeout("command"),
+        }
+
+class CircuitBreakerRegistry:
+    def __init__(self):
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, protocol: str, host: str, port: int) -> CircuitBreaker:
+        name = f"{protocol}://{host}:{port}"
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = self.breakers[name] = CircuitBreaker(name)
+        return breaker
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.stats() for name, breaker in self.breakers.items()}
+
+# Global registry shared by the mail services
+circuit_breakers = CircuitBreakerRegistry()
@@ -6,16 +6,22 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-from typing import List, Dict, Any, Optional, Tuple
+from email.policy import SMTP
+from email.utils import formatdate, make_msgid
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable, Union
 from datetime import datetime, timezone
 import logging
 import ssl
-import aiosmtplib
 import aioimaplib
 import hashlib
 import json
+from app.core.config import settings
 from app.models.models import Domain, EmailAccount
 from app.schemas.schemas import EmailMessage, EmailFolder
+from app.services.envelope_parser import ENVELOPE_FETCH, parse_header_fields, parse_date
+from app.services.bodystructure import extract_bodystructure, split_fetch_response, summarize_attachments
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError, circuit_breakers
+from app.services.smtp_pool import smtp_pool, sendmail_file
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +30,11 @@ class EmailService:
         self.message_cache: Dict[str, Dict] = {}
         self.folder_cache: Dict[str, List[EmailFolder]] = {}
         self.cache_ttl = 300  # 5 minutes
+        # Upstream fetches currently running, keyed like the caches
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Awaited with (domain, email_account, message) after a successful send, where
+        # message is the serialized bytes or the path of a spooled message file
+        self.post_send_hooks: List[Callable[[Domain, EmailAccount, Union[bytes, str]], Awaitable[None]]] = []
     
     def _get_cache_key(self, email_account: EmailAccount, domain: Domain, extra: str = "") -> str:
         return f"{email_account.id}_{domain.id}_{extra}"
@@ -33,22 +44,79 @@ class EmailService:
             return False
         return (datetime.now().timestamp() - cache_entry.get('timestamp', 0)) < self.cache_ttl
     
+    def invalidate_account_cache(self, email_account: EmailAccount, domain: Domain):
+        """Drop cached folders and message lists for one account"""
+        prefix = self._get_cache_key(email_account, domain)
+        for cache in (self.folder_cache, self.message_cache):
+            for key in [key for key in cache if key.startswith(prefix)]:
+                del cache[key]
+    
+    def note_appended(self, email_account: EmailAccount, domain: Domain, folder: str):
+        """Account for a message appended to ``folder`` without refetching the folder list"""
+        folders_entry = self.folder_cache.get(self._get_cache_key(email_account, domain, "folders"))
+        if folders_entry:
+            for cached_folder in folders_entry['data']:
+                if cached_folder.name == folder:
+                    cached_folder.message_count += 1
+        prefix = self._get_cache_key(email_account, domain, f"messages_{folder}_")
+        for key in [key for key in self.message_cache if key.startswith(prefix)]:
+            del self.message_cache[key]
+    
+    async def _single_flight(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fetch`` once for concurrent callers sharing the same key.
+        
+        The first caller starts the fetch as its own task; later callers await
+        the same task. Callers are shielded from each other's cancellation, and
+        an upstream error is raised in every waiting caller.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._finish_flight(key, done))
+        return await asyncio.shield(task)
+    
+    def _finish_flight(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved when every caller has gone away
+        if not task.cancelled():
+            task.exception()
+    
+    def _imap_breaker(self, domain: Domain) -> CircuitBreaker:
+        return circuit_breakers.get("imap", domain.imap_server, domain.imap_port)
+    
+    def _record_upstream_error(self, breaker: CircuitBreaker, error: Exception):
+        # Only timeouts and dropped connections count against the server
+        breaker.record_error(error)
+    
     async def get_imap_connection(self, domain: Domain, email_account: EmailAccount) -> aioimaplib.IMAP4_SSL:
         # Create fresh connection for each request to avoid SSL issues
+        breaker = self._imap_breaker(domain)
         try:
+            # The adaptive timeouts are learned from connect and LOGIN and only
+            # apply to those; later commands, such as a large FETCH or APPEND,
+            # get the fixed ceiling unless they pass their own timeout
+            command_timeout = settings.UPSTREAM_TIMEOUT_MAX
             if domain.use_ssl:
-                imap = aioimaplib.IMAP4_SSL(host=domain.imap_server, port=domain.imap_port)
+                imap = aioimaplib.IMAP4_SSL(host=domain.imap_server, port=domain.imap_port, timeout=command_timeout)
             else:
-                imap = aioimaplib.IMAP4(host=domain.imap_server, port=domain.imap_port)
+                imap = aioimaplib.IMAP4(host=domain.imap_server, port=domain.imap_port, timeout=command_timeout)
             
-            await imap.wait_hello_from_server()
-            await imap.login(email_account.imap_username, email_account.imap_password)
+            await breaker.call("connect", imap.wait_hello_from_server)
+            await breaker.call(
+                "command", lambda: imap.login(email_account.imap_username, email_account.imap_password)
+            )
             
             return imap
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Failed to connect to IMAP server {domain.imap_server}: {e}")
-            raise Exception(f"IMAP connection failed: {str(e)}")
+            # Re-raised as is, so callers can tell timeouts and dropped
+            # connections from other failures
+            raise
     
     async def get_folders(self, domain: Domain, email_account: EmailAccount) -> List[EmailFolder]:
         cache_key = self._get_cache_key(email_account, domain, "folders")
@@ -57,6 +125,11 @@ class EmailService:
         if cache_key in self.folder_cache and self._is_cache_valid(self.folder_cache[cache_key]):
             return self.folder_cache[cache_key]['data']
         
+        return await self._single_flight(
+            cache_key, lambda: self._fetch_folders(domain, email_account, cache_key)
+        )
+    
+    async def _fetch_folders(self, domain: Domain, email_account: EmailAccount, cache_key: str) -> List[EmailFolder]:
         imap = None
         try:
             imap = await self.get_imap_connection(domain, email_account)
@@ -103,7 +176,10 @@ class EmailService:
             
             return sorted_folders
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
+            self._record_upstream_error(self._imap_breaker(domain), e)
             logger.error(f"Failed to get folders: {e}")
             raise Exception(f"Failed to get folders: {str(e)}")
         finally:
@@ -121,6 +197,12 @@ class EmailService:
         if cache_key in self.message_cache and self._is_cache_valid(self.message_cache[cache_key]):
             return self.message_cache[cache_key]['data']
         
+        return await self._single_flight(
+            cache_key, lambda: self._fetch_messages(domain, email_account, folder, limit, offset, cache_key)
+        )
+    
+    async def _fetch_messages(self, domain: Domain, email_account: EmailAccount, folder: str,
+                              limit: int, offset: int, cache_key: str) -> List[EmailMessage]:
         imap = None
         try:
             imap = await self.get_imap_connection(domain, email_account)
@@ -157,7 +239,10 @@ class EmailService:
             
             return messages
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
+            self._record_upstream_error(self._imap_breaker(domain), e)
             logger.error(f"Failed to get messages from {folder}: {e}")
             raise Exception(f"Failed to get messages: {str(e)}")
         finally:
@@ -172,53 +257,42 @@ class EmailService:
         
         for msg_id in message_ids:
             try:
-                # Fetch headers and flags first for efficiency
-                fetch_response = await imap.fetch(msg_id, '(RFC822.HEADER FLAGS)')
+                # Fetch only the header fields shown in the list, plus flags and
+                # the MIME structure for the attachment manifest
+                fetch_response = await imap.fetch(msg_id, f'(FLAGS BODYSTRUCTURE {ENVELOPE_FETCH})')
                 
-                if fetch_response.result != 'OK':
+                if fetch_response.result != 'OK' or len(fetch_response.lines) < 2:
                     continue
                 
-                header_data = fetch_response.lines[1]
-                flags_data = fetch_response.lines[0]
+                # FLAGS and BODYSTRUCTURE may be reported before or after the header
+                # literal, and BODYSTRUCTURE may carry literals of its own
+                header_data, flags_data = split_fetch_response(fetch_response.lines)
                 
-                email_message = email.message_from_bytes(header_data)
+                envelope = parse_header_fields(header_data)
+                attachments = summarize_attachments(extract_bodystructure(flags_data))
                 
                 # Parse flags
-                is_read = b'\\\\Seen' in flags_data
-                
-                # Parse headers
-                subject = self._decode_header(email_message.get('Subject', ''))
-                sender = self._decode_header(email_message.get('From', ''))
-                recipient = [self._decode_header(email_message.get('To', ''))]
-                date_str = email_message.get('Date', '')
-                message_id_header = email_message.get('Message-ID', f'<{msg_id}@local>')
-                in_reply_to = email_message.get('In-Reply-To', '')
-                references = email_message.get('References', '')
-                
-                # Parse date
-                try:
-                    date = email.utils.parsedate_to_datetime(date_str)
-                    if date.tzinfo is None:
-                        date = date.replace(tzinfo=timezone.utc)
-                except:
-                    date = datetime.now(timezone.utc)
+                is_read = b'\\Seen' in flags_data
                 
                 # For message list, we don't need the full body yet
                 messages.append(EmailMessage(
                     id=msg_id,
-                    subject=subject,
-                    sender=sender,
-                    recipient=recipient,
-                    date=date.isoformat(),
+                    subject=envelope.subject,
+                    sender=envelope.sender,
+                    recipient=[envelope.to],
+                    date=parse_date(envelope.date).isoformat(),
                     body_text=None,
                     body_html=None,
                     is_read=is_read,
-                    has_attachments=False,  # Will be determined when full message is loaded
+                    has_attachments=attachments.has_attachments,
+                    attachment_count=attachments.count,
+                    attachment_size=attachments.total_size,
+                    has_inline_images=attachments.has_inline_images,
                     folder=folder,
                     thread_id=msg_id,  # Simple thread ID
-                    message_id=message_id_header,
-                    in_reply_to=in_reply_to,
-                    references=references
+                    message_id=envelope.message_id or f'<{msg_id}@local>',
+                    in_reply_to=envelope.in_reply_to,
+                    references=envelope.references
                 ))
                 
             except Exception as e:
@@ -280,6 +354,8 @@ class EmailService:
                 body_html=body_html,
                 is_read=True,
                 has_attachments=len(attachments) > 0,
+                attachment_count=len(attachments),
+                attachment_size=sum(attachment['size'] for attachment in attachments),
                 folder=folder,
                 thread_id=message_id,
                 message_id=message_id_header,
@@ -289,7 +365,10 @@ class EmailService:
             
             return message
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
+            self._record_upstream_error(self._imap_breaker(domain), e)
             logger.error(f"Failed to get message content {message_id}: {e}")
             raise Exception(f"Failed to get message: {str(e)}")
         finally:
@@ -299,62 +378,79 @@ class EmailService:
                 except:
                     pass
     
+    def compose_message(self, email_account: EmailAccount, to_addresses: List[str], subject: str,
+                        body_text: str = None, body_html: str = None,
+                        cc_addresses: List[str] = None, attachments: List[Dict] = None) -> bytes:
+        """Build the MIME message and serialize it once, with CRLF line endings"""
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = email_account.email_address
+        msg['To'] = ', '.join(to_addresses)
+        msg['Date'] = formatdate(localtime=True)
+        msg['Message-ID'] = make_msgid(domain=email_account.email_address.rpartition('@')[2] or None)
+        
+        if cc_addresses:
+            msg['Cc'] = ', '.join(cc_addresses)
+        
+        # Add text and HTML parts
+        if body_text:
+            msg.attach(MIMEText(body_text, 'plain'))
+        if body_html:
+            msg.attach(MIMEText(body_html, 'html'))
+        
+        # Add attachments
+        if attachments:
+            for attachment in attachments:
+                part = MIMEBase('application', 'octet-stream')
+                part.set_payload(attachment['content'])
+                encoders.encode_base64(part)
+                part.add_header(
+                    'Content-Disposition',
+                    f'attachment; filename= {attachment["filename"]}'
+                )
+                msg.attach(part)
+        
+        # The same bytes go to SMTP and to the Sent folder
+        return msg.as_bytes(policy=SMTP)
+    
+    async def deliver(self, domain: Domain, email_account: EmailAccount,
+                      recipients: List[str], message: Union[bytes, str]):
+        """Submit an already serialized message, given as bytes or as the path of
+        a spooled message file. SMTP errors propagate unchanged.
+        """
+        # Send via a pooled, already authenticated SMTP session
+        async with smtp_pool.session(domain, email_account) as smtp:
+            if isinstance(message, bytes):
+                await smtp.sendmail(email_account.email_address, recipients, message)
+            else:
+                with open(message, 'rb') as message_file:
+                    await sendmail_file(smtp, email_account.email_address, recipients, message_file)
+        
+        for hook in self.post_send_hooks:
+            try:
+                await hook(domain, email_account, message)
+            except Exception as e:
+                # The message is already submitted; never fail the send here
+                logger.error(f"Post-send hook failed: {e}")
+    
     async def send_message(self, domain: Domain, email_account: EmailAccount, 
                           to_addresses: List[str], subject: str, 
                           body_text: str = None, body_html: str = None,
                           cc_addresses: List[str] = None, bcc_addresses: List[str] = None,
                           attachments: List[Dict] = None) -> bool:
-        smtp = None
         try:
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = email_account.email_address
-            msg['To'] = ', '.join(to_addresses)
-            
-            if cc_addresses:
-                msg['Cc'] = ', '.join(cc_addresses)
-            
-            # Add text and HTML parts
-            if body_text:
-                msg.attach(MIMEText(body_text, 'plain'))
-            if body_html:
-                msg.attach(MIMEText(body_html, 'html'))
-            
-            # Add attachments
-            if attachments:
-                for attachment in attachments:
-                    part = MIMEBase('application', 'octet-stream')
-                    part.set_payload(attachment['content'])
-                    encoders.encode_base64(part)
-                    part.add_header(
-                        'Content-Disposition',
-                        f'attachment; filename= {attachment["filename"]}'
-                    )
-                    msg.attach(part)
-            
-            # Send via SMTP
-            if domain.use_ssl:
-                smtp = aiosmtplib.SMTP(hostname=domain.smtp_server, port=domain.smtp_port, use_tls=True)
-            else:
-                smtp = aiosmtplib.SMTP(hostname=domain.smtp_server, port=domain.smtp_port)
-            
-            await smtp.connect()
-            await smtp.login(email_account.imap_username, email_account.imap_password)
-            
+            message_bytes = self.compose_message(
+                email_account, to_addresses, subject, body_text, body_html, cc_addresses, attachments
+            )
             all_recipients = to_addresses + (cc_addresses or []) + (bcc_addresses or [])
-            await smtp.send_message(msg, recipients=all_recipients)
-            
+            await self.deliver(domain, email_account, all_recipients, message_bytes)
             return True
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Failed to send message: {e}")
             raise Exception(f"Failed to send message: {str(e)}")
-        finally:
-            if smtp:
-                try:
-                    await smtp.quit()
-                except:
-                    pass
     
     def _decode_header(self, header: str) -> str:
         if not header:
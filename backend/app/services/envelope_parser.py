@@ -0,0 +1,153 @@
+import binascii
+import codecs
+import re
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_tz
+from functools import lru_cache
+from typing import Dict, Optional
+
+# Header fields needed to render a message list row
+ENVELOPE_FIELDS = ("SUBJECT", "FROM", "TO", "DATE", "MESSAGE-ID", "IN-REPLY-TO", "REFERENCES")
+ENVELOPE_FETCH = f"BODY.PEEK[HEADER.FIELDS ({' '.join(ENVELOPE_FIELDS)})]"
+
+_ENCODED_WORD = re.compile(r"=\?([^?\s]+)\?([bBqQ])\?([^?]*)\?=")
+_ENCODED_GAP = re.compile(r"(\?=)[ \t]+(=\?)")
+_HEADER_LINE = re.compile(r"^([!-9;-~]+)[ \t]*:[ \t]*([^\r\n]*)", re.MULTILINE)
+
+_MONTHS = {name: index for index, name in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+
+class Envelope:
+    """Compact record holding the header fields shown in a message list"""
+
+    __slots__ = ("subject", "sender", "to", "date", "message_id", "in_reply_to", "references")
+
+    def __init__(self, subject: str = "", sender: str = "", to: str = "", date: str = "",
+                 message_id: str = "", in_reply_to: str = "", references: str = ""):
+        self.subject = subject
+        self.sender = sender
+        self.to = to
+        self.date = date
+        self.message_id = message_id
+        self.in_reply_to = in_reply_to
+        self.references = references
+
+@lru_cache(maxsize=128)
+def _codec_name(charset: str) -> str:
+    """Resolve a MIME charset label to a Python codec, memoized per label"""
+    # RFC 2231 language suffix, e.g. "utf-8*en"
+    charset = charset.split("*", 1)[0].strip().lower()
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return "utf-8"
+
+def _decode_word(match: "re.Match") -> str:
+    charset, encoding, text = match.groups()
+    try:
+        if encoding in "bB":
+            raw = binascii.a2b_base64(text + "=" * (-len(text) % 4))
+        else:
+            raw = binascii.a2b_qp(text, header=True)
+    except binascii.Error:
+        return match.group(0)
+    return raw.decode(_codec_name(charset), errors="ignore")
+
+def decode_words(value: str) -> str:
+    """Decode RFC 2047 encoded words; plain values are returned unchanged"""
+    if "=?" not in value:
+        return value
+    if value.count("=?") == 1:
+        match = _ENCODED_WORD.fullmatch(value)
+        if match is not None:
+            return _decode_word(match)
+    else:
+        # Whitespace between adjacent encoded words is not significant
+        value = _ENCODED_GAP.sub(r"\1\2", value)
+    return _ENCODED_WORD.sub(_decode_word, value)
+
+def _to_text(raw: bytes) -> str:
+    try:
+        return raw.decode("ascii")
+    except UnicodeDecodeError:
+        return raw.decode("utf-8", errors="replace")
+
+@lru_cache(maxsize=64)
+def _zone(offset: str) -> Optional[timezone]:
+    if len(offset) != 5 or offset[0] not in "+-" or not offset[1:].isdigit():
+        return None
+    minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+    return timezone(timedelta(minutes=-minutes if offset[0] == "-" else minutes))
+
+def _parse_common_date(value: str) -> Optional[datetime]:
+    """Fast path for the canonical 'Tue, 14 Nov 2023 09:12:44 +0100' form"""
+    fields = value.split()
+    if fields and fields[0].endswith(","):
+        del fields[0]
+    if len(fields) < 5:
+        return None
+    day, month, year, clock, offset = fields[:5]
+    month_index = _MONTHS.get(month[:3].lower())
+    tz = _zone(offset)
+    clock_parts = clock.split(":")
+    # Two- and three-digit years need the RFC 5322 obsolete-year rules,
+    # which parsedate_tz applies
+    if month_index is None or tz is None or len(year) != 4 or len(clock_parts) not in (2, 3):
+        return None
+    try:
+        return datetime(int(year), month_index, int(day), int(clock_parts[0]),
+                        int(clock_parts[1]), int(clock_parts[2]) if len(clock_parts) == 3 else 0,
+                        tzinfo=tz)
+    except ValueError:
+        return None
+
+def parse_date(value: str) -> datetime:
+    """Parse an RFC 5322 Date header; naive dates are UTC, unparsable ones are now()"""
+    if not value:
+        return datetime.now(timezone.utc)
+    date = _parse_common_date(value)
+    if date is not None:
+        return date
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return datetime.now(timezone.utc)
+    try:
+        offset = parsed[9]
+        tz = timezone.utc if offset is None else timezone(timedelta(seconds=offset))
+        return datetime(*parsed[:6], tzinfo=tz)
+    except (ValueError, OverflowError):
+        return datetime.now(timezone.utc)
+
+def _field(fields: Dict[str, str], name: str) -> str:
+    value = fields.get(name)
+    if not value:
+        return ""
+    value = value.rstrip()
+    return decode_words(value) if "=?" in value else value
+
+def parse_header_fields(data: bytes) -> Envelope:
+    """Parse a BODY[HEADER.FIELDS (...)] literal into an Envelope.
+
+    Only the fields in ENVELOPE_FIELDS are decoded; anything else the server
+    returns is skipped. Folded continuation lines are unfolded.
+    """
+    # Unfold continuation lines, keeping the folding whitespace
+    if b"\n " in data or b"\n\t" in data:
+        data = data.replace(b"\r\n", b"\n").replace(b"\n ", b" ").replace(b"\n\t", b"\t")
+    text = _to_text(data)
+
+    # Iterate in reverse so the first occurrence of a repeated header wins,
+    # like email.message
+    fields: Dict[str, str] = {}
+    for name, value in reversed(_HEADER_LINE.findall(text)):
+        fields[name.lower()] = value
+
+    return Envelope(
+        _field(fields, "subject"),
+        _field(fields, "from"),
+        _field(fields, "to"),
+        _field(fields, "date"),
+        _field(fields, "message-id"),
+        _field(fields, "in-reply-to"),
+        _field(fields, "references"),
+    )
@@ -1,7 +1,4 @@
 import asyncio
-import paramiko
-import boto3
-from botocore.exceptions import ClientError
 import ftplib
 from typing import List, Optional
 from datetime import datetime
@@ -10,6 +7,24 @@ import stat
 from app.models.files import FileStorage, FileStorageType
 from app.schemas.files import FileItem, DirectoryListing, FileSearchResult
 
+# paramiko and boto3 are slow to import, so each is loaded the first time a
+# storage of its type is used rather than by every worker at startup
+
+def _ssh_client():
+    import paramiko
+    ssh = paramiko.SSHClient()
+    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    return ssh
+
+def _s3_client(storage: FileStorage):
+    import boto3
+    return boto3.client(
+        's3',
+        aws_access_key_id=storage.access_key,
+        aws_secret_access_key=storage.secret_key,
+        region_name=storage.region
+    )
+
 class FileBrowserService:
     def __init__(self, storage: FileStorage):
         self.storage = storage
@@ -56,8 +71,7 @@ class FileBrowserService:
     # SFTP Implementation
     async def _list_sftp_directory(self, path: str) -> DirectoryListing:
         def _sftp_list():
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            ssh = _ssh_client()
             
             try:
                 ssh.connect(
@@ -105,8 +119,7 @@ class FileBrowserService:
     
     async def _search_sftp_files(self, search_term: str, path: str, max_results: int) -> FileSearchResult:
         def _sftp_search():
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            ssh = _ssh_client()
             
             try:
                 ssh.connect(
@@ -143,8 +156,7 @@ class FileBrowserService:
     
     async def _download_sftp_file(self, file_path: str) -> bytes:
         def _sftp_download():
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            ssh = _ssh_client()
             
             try:
                 ssh.connect(
@@ -167,12 +179,8 @@ class FileBrowserService:
     # S3 Implementation
     async def _list_s3_directory(self, path: str) -> DirectoryListing:
         def _s3_list():
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=self.storage.access_key,
-                aws_secret_access_key=self.storage.secret_key,
-                region_name=self.storage.region
-            )
+            from botocore.exceptions import ClientError
+            s3_client = _s3_client(self.storage)
             
             prefix = path.lstrip('/') if path != '/' else ''
             if prefix and not prefix.endswith('/'):
@@ -227,12 +235,8 @@ class FileBrowserService:
     
     async def _search_s3_files(self, search_term: str, path: str, max_results: int) -> FileSearchResult:
         def _s3_search():
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=self.storage.access_key,
-                aws_secret_access_key=self.storage.secret_key,
-                region_name=self.storage.region
-            )
+            from botocore.exceptions import ClientError
+            s3_client = _s3_client(self.storage)
             
             prefix = path.lstrip('/') if path != '/' else ''
             
@@ -274,12 +278,8 @@ class FileBrowserService:
     
     async def _download_s3_file(self, file_path: str) -> bytes:
         def _s3_download():
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=self.storage.access_key,
-                aws_secret_access_key=self.storage.secret_key,
-                region_name=self.storage.region
-            )
+            from botocore.exceptions import ClientError
+            s3_client = _s3_client(self.storage)
             
             try:
                 response = s3_client.get_object(Bucket=self.storage.bucket_name, Key=file_path)
@@ -0,0 +1,260 @@
+import asyncio
+import re
+import time
+import zipfile
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+from app.core.config import settings
+from app.models.models import Domain, EmailAccount
+from app.services.email_service import email_service
+
+_FETCH_HEADER = re.compile(rb"UID (\d+)")
+_FLAGS = re.compile(rb"FLAGS \(([^)]*)\)")
+_INTERNALDATE = re.compile(rb'INTERNALDATE "([^"]+)"')
+_SIZE = re.compile(rb"RFC822\.SIZE (\d+)")
+_UIDVALIDITY = re.compile(rb"UIDVALIDITY (\d+)")
+_FROM_LINE = re.compile(rb"^(>*From )", re.MULTILINE)
+_UNSAFE_FILENAME = re.compile(r'[^A-Za-z0-9._ -]+')
+
+def attachment_disposition(filename: str) -> str:
+    """Content-Disposition for a download named ``filename`` (RFC 6266).
+
+    Plain-ASCII clients get a sanitized quoted name; others the exact name
+    as an RFC 5987 filename* parameter.
+    """
+    fallback = _UNSAFE_FILENAME.sub("_", filename).strip() or "export"
+    return f'attachment; filename="{fallback}"; filename*=UTF-8\'\'{quote(filename, safe="")}'
+
+class ExportedMessage:
+    __slots__ = ("uid", "flags", "internal_date", "body")
+
+    def __init__(self, uid: int, flags: bytes, internal_date: Optional[datetime], body: bytes):
+        self.uid = uid
+        self.flags = flags
+        self.internal_date = internal_date
+        self.body = body
+
+def _parse_internal_date(line: bytes) -> Optional[datetime]:
+    match = _INTERNALDATE.search(line)
+    if not match:
+        return None
+    try:
+        # INTERNALDATE is "14-Nov-2023 09:12:44 +0100"
+        return datetime.strptime(match.group(1).decode(), "%d-%b-%Y %H:%M:%S %z")
+    except ValueError:
+        return None
+
+def parse_fetch_literals(lines: List[bytes]) -> Iterator[ExportedMessage]:
+    """Pair each FETCH response line with the BODY[] literal that follows it"""
+    for index, line in enumerate(lines[:-1]):
+        literal = lines[index + 1]
+        if not isinstance(literal, bytearray) or not isinstance(line, bytes):
+            continue
+        uid = _FETCH_HEADER.search(line)
+        if uid is None:
+            continue
+        # FLAGS may follow the literal
+        trailer = lines[index + 2] if index + 2 < len(lines) else b""
+        context = line + b" " + (trailer if isinstance(trailer, bytes) else b"")
+        flags = _FLAGS.search(context)
+        yield ExportedMessage(
+            int(uid.group(1)),
+            flags.group(1) if flags else b"",
+            _parse_internal_date(context),
+            bytes(literal),
+        )
+
+def _uid_set(uids: List[int]) -> str:
+    """Compress sorted UIDs into an IMAP sequence set, e.g. 1:4,7,9:10"""
+    ranges = []
+    start = previous = uids[0]
+    for uid in uids[1:]:
+        if uid != previous + 1:
+            ranges.append(f"{start}:{previous}" if start != previous else str(start))
+            start = uid
+        previous = uid
+    ranges.append(f"{start}:{previous}" if start != previous else str(start))
+    return ",".join(ranges)
+
+def plan_batches(sizes: List[Tuple[int, int]], max_bytes: int, max_count: int) -> List[str]:
+    """Group (uid, size) pairs into UID sets bounded by total size and count"""
+    batches: List[str] = []
+    current: List[int] = []
+    total = 0
+    for uid, size in sizes:
+        if current and (total + size > max_bytes or len(current) >= max_count):
+            batches.append(_uid_set(current))
+            current, total = [], 0
+        current.append(uid)
+        total += size
+    if current:
+        batches.append(_uid_set(current))
+    return batches
+
+class MboxWriter:
+    """mboxrd: From_ separator lines, '>'-quoted From lines, LF line endings"""
+
+    media_type = "application/mbox"
+    extension = "mbox"
+
+    def write(self, message: ExportedMessage) -> bytes:
+        date = message.internal_date or datetime.now(timezone.utc)
+        body = message.body.replace(b"\r\n", b"\n")
+        body = _FROM_LINE.sub(rb">\1", body)
+        if not body.endswith(b"\n"):
+            body += b"\n"
+        separator = f"From MAILER-DAEMON {date.astimezone(timezone.utc).strftime('%a %b %d %H:%M:%S %Y')}\n"
+        # X-UID lets a client resume an interrupted export from the last complete message
+        return separator.encode() + f"X-UID: {message.uid}\n".encode() + body + b"\n"
+
+    def close(self) -> bytes:
+        return b""
+
+class _ChunkSink:
+    """Write-only, non-seekable sink that zipfile streams into"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+class MaildirZipWriter:
+    """Zipped Maildir, streamed entry by entry using zip data descriptors"""
+
+    media_type = "application/zip"
+    extension = "zip"
+
+    def __init__(self, folder: str):
+        self.folder = folder.replace("/", ".")
+        self.sink = _ChunkSink()
+        self.archive = zipfile.ZipFile(self.sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+        for sub in ("cur", "new", "tmp"):
+            self.archive.writestr(f"{self.folder}/{sub}/", b"")
+
+    def write(self, message: ExportedMessage) -> bytes:
+        flags = message.flags.decode(errors="ignore")
+        info = "".join(sorted(code for flag, code in (
+            ("\\Draft", "D"), ("\\Flagged", "F"), ("\\Answered", "R"), ("\\Seen", "S"), ("\\Deleted", "T"),
+        ) if flag in flags))
+        timestamp = int((message.internal_date.timestamp() if message.internal_date else time.time()))
+        name = f"{self.folder}/cur/{timestamp}.U{message.uid}.webmail:2,{info}"
+        entry = zipfile.ZipInfo(name, date_time=time.gmtime(timestamp)[:6])
+        entry.compress_type = zipfile.ZIP_DEFLATED
+        with self.archive.open(entry, mode="w", force_zip64=len(message.body) > 0x7FFFFFFF) as handle:
+            handle.write(message.body)
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        self.archive.close()
+        return self.sink.drain()
+
+class MailExportService:
+    async def folder_uid_validity(self, imap, folder: str) -> Optional[int]:
+        response = await imap.examine(folder)
+        if response.result != "OK":
+            raise Exception(f"Folder {folder} not found")
+        for line in response.lines:
+            match = _UIDVALIDITY.search(line) if isinstance(line, (bytes, bytearray)) else None
+            if match:
+                return int(match.group(1))
+        return None
+
+    async def _message_sizes(self, imap, start_uid: int) -> List[Tuple[int, int]]:
+        response = await imap.uid("fetch", f"{start_uid}:*", "(UID RFC822.SIZE)")
+        if response.result != "OK":
+            raise Exception("Failed to list messages for export")
+        sizes = []
+        for line in response.lines:
+            if not isinstance(line, (bytes, bytearray)):
+                continue
+            uid, size = _FETCH_HEADER.search(line), _SIZE.search(line)
+            # "start:*" always matches the highest UID, even below start_uid
+            if uid and size and int(uid.group(1)) >= start_uid:
+                sizes.append((int(uid.group(1)), int(size.group(1))))
+        sizes.sort()
+        return sizes
+
+    async def _fetch_batch(self, imap, uid_set: str) -> List[ExportedMessage]:
+        response = await imap.uid(
+            "fetch", uid_set, "(UID FLAGS INTERNALDATE BODY.PEEK[])", timeout=settings.EXPORT_FETCH_TIMEOUT
+        )
+        if response.result != "OK":
+            raise Exception(f"Failed to fetch messages {uid_set}")
+        return sorted(parse_fetch_literals(response.lines), key=lambda m: m.uid)
+
+    async def export_folder(self, domain: Domain, email_account: EmailAccount, folder: str,
+                            export_format: str = "mbox", start_uid: int = 1,
+                            uid_validity: Optional[int] = None) -> Tuple[dict, AsyncIterator[bytes]]:
+        """Open the folder and return response headers plus a byte stream.
+
+        Messages are fetched in UID ranges bounded by EXPORT_BATCH_BYTES, with
+        the next range requested while the current one is being written out.
+        At most two batches are held in memory, whatever the folder size.
+        """
+        imap = await email_service.get_imap_connection(domain, email_account)
+        try:
+            current_validity = await self.folder_uid_validity(imap, folder)
+            if uid_validity is not None and current_validity is not None and uid_validity != current_validity:
+                raise ValueError("UIDVALIDITY changed, the export cannot be resumed")
+            sizes = await self._message_sizes(imap, max(start_uid, 1))
+        except BaseException:
+            await self._logout(imap)
+            raise
+
+        writer = MboxWriter() if export_format == "mbox" else MaildirZipWriter(folder)
+        batches = plan_batches(sizes, settings.EXPORT_BATCH_BYTES, settings.EXPORT_BATCH_MAX_MESSAGES)
+        headers = {
+            "X-Export-Uid-Validity": str(current_validity or ""),
+            "X-Export-Message-Count": str(len(sizes)),
+            "Content-Disposition": attachment_disposition(f'{folder.replace("/", "_")}.{writer.extension}'),
+        }
+        return headers, self._stream(imap, writer, batches)
+
+    async def _stream(self, imap, writer, batches: List[str]) -> AsyncIterator[bytes]:
+        pending: Optional[asyncio.Task] = None
+        try:
+            if batches:
+                pending = asyncio.ensure_future(self._fetch_batch(imap, batches[0]))
+            for index in range(len(batches)):
+                messages = await pending
+                # Pipeline: request the next range before writing this one out
+                pending = (asyncio.ensure_future(self._fetch_batch(imap, batches[index + 1]))
+                           if index + 1 < len(batches) else None)
+                for message in messages:
+                    # Yielding per message lets the ASGI server apply backpressure
+                    yield writer.write(message)
+            tail = writer.close()
+            if tail:
+                yield tail
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+            await self._logout(imap)
+
+    async def _logout(self, imap):
+        try:
+            await imap.logout()
+        except Exception:
+            pass
+
+    def media_type(self, export_format: str) -> str:
+        return MboxWriter.media_type if export_format == "mbox" else MaildirZipWriter.media_type
+
+# Global export service instance
+mail_export_service = MailExportService()
@@ -0,0 +1,282 @@
+import asyncio
+import hashlib
+import logging
+import re
+import time
+import uuid
+import zipfile
+from typing import Awaitable, BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.models.models import Domain, EmailAccount
+from app.services.email_service import email_service
+from app.services.envelope_parser import parse_header_fields, parse_date
+
+logger = logging.getLogger(__name__)
+
+_MBOXRD_QUOTED = re.compile(rb"^>(>*From )", re.MULTILINE)
+_LONE_LF = re.compile(rb"(?<!\r)\n")
+_SEEN = re.compile(rb"^Status:[^\r\n]*R", re.MULTILINE | re.IGNORECASE)
+
+def _header_block(message: bytes) -> bytes:
+    for separator in (b"\r\n\r\n", b"\n\n"):
+        end = message.find(separator)
+        if end >= 0:
+            return message[:end + len(separator)]
+    return message
+
+def message_fingerprint(message: bytes) -> str:
+    """Hash of the Message-ID, or of the whole message when it has none"""
+    message_id = parse_header_fields(_header_block(message)).message_id
+    source = message_id.strip().lower().encode() if message_id else message
+    return hashlib.sha1(source).hexdigest()
+
+def split_mbox(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Split an mbox byte stream into messages without loading it whole.
+
+    From_ separator lines are dropped and mboxrd '>From ' quoting is undone.
+    """
+    message: List[bytes] = []
+    pending = b""
+    previous_blank = True
+
+    def finish() -> Optional[bytes]:
+        if not message:
+            return None
+        data = b"".join(message)
+        # The blank line before a From_ separator belongs to the mbox format
+        if data.endswith(b"\n\n"):
+            data = data[:-1]
+        elif data.endswith(b"\r\n\r\n"):
+            data = data[:-2]
+        return _MBOXRD_QUOTED.sub(rb"\1", data)
+
+    for chunk in chunks:
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            line += b"\n"
+            if previous_blank and line.startswith(b"From "):
+                data = finish()
+                if data:
+                    yield data
+                message = []
+            else:
+                message.append(line)
+            previous_blank = line in (b"\n", b"\r\n")
+
+    if pending:
+        message.append(pending)
+    data = finish()
+    if data:
+        yield data
+
+def split_eml_zip(file: BinaryIO) -> Iterator[bytes]:
+    """Yield each .eml entry of a zip archive, one at a time"""
+    with zipfile.ZipFile(file) as archive:
+        for info in archive.infolist():
+            if not info.is_dir() and info.filename.lower().endswith(".eml"):
+                yield archive.read(info)
+
+def read_chunks(file: BinaryIO, size: int = 64 * 1024) -> Iterator[bytes]:
+    while True:
+        chunk = file.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+def _single_message(file: BinaryIO) -> Iterator[bytes]:
+    yield file.read()
+
+def iter_messages(file: BinaryIO, filename: str) -> Iterator[bytes]:
+    """Lazily split an upload into messages; nothing is read until iterated"""
+    if filename.lower().endswith(".zip"):
+        return split_eml_zip(file)
+    if filename.lower().endswith(".eml"):
+        return _single_message(file)
+    return split_mbox(read_chunks(file))
+
+def _next_message(messages: Iterator[bytes]) -> Optional[Tuple[bytes, str]]:
+    # Runs in a worker thread: reading, decompressing and splitting the
+    # upload must not stall the event loop
+    message = next(messages, None)
+    if message is None:
+        return None
+    return message, message_fingerprint(message)
+
+class ImportJob:
+    def __init__(self, folder: str, owner_id: Optional[int] = None):
+        self.id = uuid.uuid4().hex
+        self.owner_id = owner_id
+        self.folder = folder
+        self.status = "running"
+        self.parsed = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.errors: List[str] = []
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "job_id": self.id,
+            "folder": self.folder,
+            "status": self.status,
+            "parsed": self.parsed,
+            "imported": self.imported,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "errors": self.errors[-20:],
+            "messages_per_minute": round(self.imported / elapsed * 60, 1) if elapsed > 0 else 0.0,
+        }
+
+class MailImportService:
+    def __init__(self):
+        self.jobs: Dict[str, ImportJob] = {}
+        # Running import and append tasks; the loop only holds weak references
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _spawn(self, coro: Awaitable) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _enqueue(self, queue: asyncio.Queue, item: Optional[bytes], workers: List[asyncio.Task]):
+        # Never block forever on a full queue whose consumers have all died
+        while True:
+            if all(worker.done() for worker in workers):
+                raise Exception("All IMAP connections failed")
+            try:
+                await asyncio.wait_for(queue.put(item), timeout=1.0)
+                return
+            except asyncio.TimeoutError:
+                continue
+
+    async def _existing_fingerprints(self, imap, folder: str) -> Set[str]:
+        """Message-ID hashes already present in the target folder"""
+        response = await imap.fetch("1:*", "(BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])")
+        fingerprints = set()
+        if response.result != "OK":
+            return fingerprints
+        for line in response.lines:
+            if isinstance(line, bytearray):
+                message_id = parse_header_fields(bytes(line)).message_id
+                if message_id:
+                    fingerprints.add(hashlib.sha1(message_id.strip().lower().encode()).hexdigest())
+        return fingerprints
+
+    async def _append_worker(self, domain: Domain, email_account: EmailAccount, folder: str,
+                             queue: asyncio.Queue, job: ImportJob):
+        imap = None
+        try:
+            imap = await email_service.get_imap_connection(domain, email_account)
+            while True:
+                message = await queue.get()
+                try:
+                    if message is None:
+                        return
+                    header = _header_block(message)
+                    flags = "(\\Seen)" if _SEEN.search(header) else None
+                    date_header = parse_header_fields(header).date
+                    date = parse_date(date_header) if date_header else None
+                    response = await imap.append(
+                        _LONE_LF.sub(b"\r\n", message), mailbox=folder, flags=flags, date=date,
+                        timeout=settings.IMPORT_APPEND_TIMEOUT
+                    )
+                    if response.result == "OK":
+                        job.imported += 1
+                    else:
+                        job.failed += 1
+                        job.errors.append(f"APPEND rejected: {response.lines[-1]!r}")
+                except Exception as e:
+                    job.failed += 1
+                    job.errors.append(f"APPEND failed: {e}")
+                finally:
+                    queue.task_done()
+        finally:
+            if imap:
+                try:
+                    await imap.logout()
+                except Exception:
+                    pass
+
+    async def run_import(self, domain: Domain, email_account: EmailAccount, folder: str,
+                         messages: Iterator[bytes], job: ImportJob) -> ImportJob:
+        """Append messages to ``folder`` over a bounded pool of IMAP connections.
+
+        Parsing stays ahead of the workers by at most IMPORT_QUEUE_SIZE
+        messages, so memory is bounded regardless of the upload size.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.IMPORT_QUEUE_SIZE)
+        workers: List[asyncio.Task] = []
+        try:
+            imap = await email_service.get_imap_connection(domain, email_account)
+            try:
+                await imap.create(folder)  # no-op error when it already exists
+                await imap.select(folder)
+                seen = await self._existing_fingerprints(imap, folder)
+            finally:
+                await imap.logout()
+
+            workers = [
+                self._spawn(self._append_worker(domain, email_account, folder, queue, job))
+                for _ in range(settings.IMPORT_CONNECTIONS)
+            ]
+
+            while True:
+                item = await asyncio.to_thread(_next_message, messages)
+                if item is None:
+                    break
+                message, fingerprint = item
+                job.parsed += 1
+                if fingerprint in seen:
+                    job.duplicates += 1
+                    continue
+                seen.add(fingerprint)
+                await self._enqueue(queue, message, workers)
+
+            for _ in workers:
+                await self._enqueue(queue, None, workers)
+            for result in await asyncio.gather(*workers, return_exceptions=True):
+                if isinstance(result, Exception):
+                    job.errors.append(f"IMAP connection failed: {result}")
+            job.status = "completed"
+        except Exception as e:
+            logger.error(f"Mail import {job.id} failed: {e}")
+            job.status = "failed"
+            job.errors.append(str(e))
+            for worker in workers:
+                worker.cancel()
+        finally:
+            job.finished_at = time.time()
+            email_service.invalidate_account_cache(email_account, domain)
+        return job
+
+    def start_job(self, folder: str, owner_id: Optional[int] = None) -> ImportJob:
+        self._evict_finished()
+        job = ImportJob(folder, owner_id)
+        self.jobs[job.id] = job
+        return job
+
+    def run_in_background(self, coro: Awaitable) -> asyncio.Task:
+        """Run an import job's coroutine, keeping the task referenced until it ends"""
+        return self._spawn(coro)
+
+    def _evict_finished(self):
+        """Forget finished jobs past their retention, and the oldest ones beyond IMPORT_MAX_JOBS"""
+        cutoff = time.time() - settings.IMPORT_JOB_RETENTION_SECONDS
+        finished = sorted((job for job in self.jobs.values() if job.finished_at is not None),
+                          key=lambda job: job.finished_at)
+        excess = len(self.jobs) - settings.IMPORT_MAX_JOBS + 1
+        for index, job in enumerate(finished):
+            if job.finished_at < cutoff or index < excess:
+                del self.jobs[job.id]
+
+    def get_job(self, job_id: str) -> Optional[ImportJob]:
+        return self.jobs.get(job_id)
+
+# Global import service instance
+mail_import_service = MailImportService()
@@ -0,0 +1,118 @@
+import base64
+import mimetypes
+from email.message import Message
+from email.mime.text import MIMEText
+from email.policy import SMTP
+from email.utils import formatdate, make_msgid
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+# 57 input bytes encode to one 76-character base64 line, so whole-line chunks
+# can be encoded independently and concatenated
+BASE64_CHUNK = 57 * 1024
+
+class AttachmentSource:
+    """An attachment to be read from an already spooled file object"""
+
+    __slots__ = ("filename", "content_type", "file")
+
+    def __init__(self, filename: str, file: BinaryIO, content_type: Optional[str] = None):
+        self.filename = filename
+        self.file = file
+        self.content_type = (content_type if content_type and "/" in content_type
+                             else mimetypes.guess_type(filename)[0] or "application/octet-stream")
+
+def _boundary() -> str:
+    return "=_" + make_msgid().strip("<>").replace("@", ".")
+
+def _header_block(headers: List[Tuple[str, str]], params: Optional[List[Tuple[str, str, dict]]] = None) -> bytes:
+    """Serialize headers only, folded and RFC 2047/2231 encoded, ending in a blank line"""
+    message = Message(policy=SMTP)
+    for name, value in headers:
+        message[name] = value
+    for name, value, extra in params or []:
+        message.add_header(name, value, **extra)
+    # Not as_bytes(): a multipart Content-Type would make it emit empty boundaries
+    return b"".join(SMTP.fold_binary(name, value) for name, value in message.items()) + b"\r\n"
+
+def _text_part(body: str, subtype: str) -> bytes:
+    return MIMEText(body, subtype).as_bytes(policy=SMTP)
+
+def _encode_base64(file: BinaryIO, max_bytes: Optional[int], used: List[int]) -> Iterator[bytes]:
+    while True:
+        chunk = file.read(BASE64_CHUNK)
+        if not chunk:
+            return
+        used[0] += len(chunk)
+        if max_bytes is not None and used[0] > max_bytes:
+            raise ValueError(f"Attachments exceed the {max_bytes // (1024 * 1024)} MB limit")
+        yield base64.encodebytes(chunk).replace(b"\n", b"\r\n")
+
+def generate_message(sender: str, to_addresses: List[str], subject: str,
+                     body_text: Optional[str] = None, body_html: Optional[str] = None,
+                     cc_addresses: Optional[List[str]] = None,
+                     attachments: Optional[List[AttachmentSource]] = None,
+                     max_attachment_bytes: Optional[int] = None) -> Iterator[bytes]:
+    """Yield a MIME message piece by piece, with CRLF line endings.
+
+    Attachments are read and base64-encoded BASE64_CHUNK bytes at a time, so
+    memory use does not depend on attachment size.
+    """
+    headers = [
+        ("Subject", subject),
+        ("From", sender),
+        ("To", ", ".join(to_addresses)),
+        ("Date", formatdate(localtime=True)),
+        ("Message-ID", make_msgid(domain=sender.rpartition("@")[2] or None)),
+        ("MIME-Version", "1.0"),
+    ]
+    if cc_addresses:
+        headers.append(("Cc", ", ".join(cc_addresses)))
+
+    bodies = []
+    if body_text:
+        bodies.append(_text_part(body_text, "plain"))
+    if body_html:
+        bodies.append(_text_part(body_html, "html"))
+    if not bodies:
+        bodies.append(_text_part("", "plain"))
+
+    alternative = _boundary()
+    # Each delimiter starts with the CRLF that ends the preceding part
+    body_block = (f"--{alternative}\r\n".encode()
+                  + f"\r\n--{alternative}\r\n".encode().join(bodies)
+                  + f"\r\n--{alternative}--\r\n".encode())
+
+    if not attachments:
+        yield _header_block(headers + [("Content-Type", f'multipart/alternative; boundary="{alternative}"')])
+        yield body_block
+        return
+
+    mixed = _boundary()
+    yield _header_block(headers + [("Content-Type", f'multipart/mixed; boundary="{mixed}"')])
+    yield f"--{mixed}\r\nContent-Type: multipart/alternative; boundary=\"{alternative}\"\r\n\r\n".encode()
+    yield body_block
+
+    used = [0]
+    for attachment in attachments:
+        yield f"\r\n--{mixed}\r\n".encode()
+        yield _header_block(
+            [("Content-Transfer-Encoding", "base64")],
+            [("Content-Type", attachment.content_type, {"name": attachment.filename}),
+             ("Content-Disposition", "attachment", {"filename": attachment.filename})],
+        )
+        yield from _encode_base64(attachment.file, max_attachment_bytes, used)
+    yield f"\r\n--{mixed}--\r\n".encode()
+
+def write_message(out: BinaryIO, parts: Iterator[bytes]) -> int:
+    size = 0
+    for part in parts:
+        out.write(part)
+        size += len(part)
+    return size
+
+def dot_stuff(chunk: bytes, at_line_start: bool) -> bytes:
+    """Escape leading dots for SMTP DATA; ``at_line_start`` is whether the previous chunk ended a line"""
+    stuffed = chunk.replace(b"\n.", b"\n..")
+    if at_line_start and stuffed.startswith(b"."):
+        stuffed = b"." + stuffed
+    return stuffed
@@ -0,0 +1,313 @@
+import asyncio
+import logging
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+import aiosmtplib
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.database.database import SessionLocal
+from app.database.sqlite import write_queue
+from app.models.models import Domain, EmailAccount
+from app.models.outbound import OutboundMessage, OutboundStatus
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.email_service import email_service
+
+logger = logging.getLogger(__name__)
+
+PENDING = (OutboundStatus.QUEUED, OutboundStatus.RETRY)
+FINAL = (OutboundStatus.SENT, OutboundStatus.DEAD)
+
+def is_permanent_failure(error: Exception) -> bool:
+    """5xx replies and refused recipients will not succeed on retry"""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return 500 <= error.code < 600
+    return isinstance(error, LookupError)
+
+def status_dict(message: OutboundMessage) -> Dict[str, Any]:
+    return {
+        "id": message.id,
+        "status": message.status.value,
+        "subject": message.subject,
+        "recipients": message.recipients,
+        "attempts": message.attempts,
+        "last_error": message.last_error,
+        "next_attempt_at": message.next_attempt_at.isoformat() if message.status in PENDING else None,
+        "created_at": message.created_at.isoformat() if message.created_at else None,
+        "sent_at": message.sent_at.isoformat() if message.sent_at else None,
+    }
+
+class OutboundQueue:
+    """Spool table plus the dispatcher that delivers from it.
+
+    /send only inserts a row. The dispatcher claims due rows with a
+    conditional UPDATE, so several worker processes can share one table, and
+    tags each claim with a token that a delivery's heartbeat and outcome must
+    match. It delivers at most OUTBOUND_WORKERS messages at a time, of which
+    at most OUTBOUND_DOMAIN_CONCURRENCY go through the same sending domain.
+    """
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._deliveries: Set[asyncio.Task] = set()
+        self._domain_in_flight: Dict[int, int] = {}
+        self._changed: Dict[int, asyncio.Event] = {}
+
+    async def enqueue(self, user_id: int, domain: Domain, email_account: EmailAccount,
+                recipients: List[str], subject: str, message: Union[bytes, str]) -> Dict[str, Any]:
+        """Queue ``message``, given as bytes or as the path of a spooled MIME
+        file; returns the new message's status_dict
+        """
+        def insert(db: Session) -> Dict[str, Any]:
+            outbound = OutboundMessage(
+                user_id=user_id,
+                email_account_id=email_account.id,
+                domain_id=domain.id,
+                sender=email_account.email_address,
+                recipients=recipients,
+                subject=subject,
+                message=message if isinstance(message, bytes) else None,
+                message_path=message if isinstance(message, str) else None,
+                status=OutboundStatus.QUEUED,
+                next_attempt_at=datetime.utcnow(),
+            )
+            db.add(outbound)
+            db.flush()
+            return status_dict(outbound)
+
+        queued = await write_queue.run_async(insert)
+        self._wakeup.set()
+        return queued
+
+    async def retry(self, message_id: int) -> Optional[Dict[str, Any]]:
+        """Put a dead-lettered message back in the queue; returns its
+        status_dict, or None if it was no longer dead
+        """
+        def requeue(db: Session) -> Optional[Dict[str, Any]]:
+            updated = db.query(OutboundMessage).filter(
+                OutboundMessage.id == message_id,
+                OutboundMessage.status == OutboundStatus.DEAD
+            ).update({
+                OutboundMessage.status: OutboundStatus.QUEUED,
+                OutboundMessage.attempts: 0,
+                OutboundMessage.next_attempt_at: datetime.utcnow(),
+            }, synchronize_session=False)
+            if not updated:
+                return None
+            return status_dict(db.query(OutboundMessage).populate_existing().get(message_id))
+
+        requeued = await write_queue.run_async(requeue)
+        if requeued is not None:
+            self._wakeup.set()
+        return requeued
+
+    async def wait_for_change(self, message_id: int, timeout: float):
+        """Return when this process updates the message, or after ``timeout``"""
+        event = self._changed.setdefault(message_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _publish(self, message_id: int):
+        event = self._changed.pop(message_id, None)
+        if event is not None:
+            event.set()
+
+    def start(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        tasks = [task for task in [self._dispatcher, *self._deliveries] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatcher = None
+
+    async def run(self):
+        logger.info(f"Outbound queue running with {settings.OUTBOUND_WORKERS} workers")
+        while True:
+            self._wakeup.clear()
+            try:
+                for message_id, domain_id, token in await self._claim_due():
+                    task = asyncio.ensure_future(self._deliver(message_id, domain_id, token))
+                    self._deliveries.add(task)
+                    task.add_done_callback(self._deliveries.discard)
+            except Exception as e:
+                logger.error(f"Outbound dispatcher failed to claim messages: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.OUTBOUND_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim_due(self) -> List[Tuple[int, int, str]]:
+        capacity = settings.OUTBOUND_WORKERS - len(self._deliveries)
+        if capacity <= 0:
+            return []
+        in_flight = dict(self._domain_in_flight)
+        claimed = await write_queue.run_async(lambda db: self._claim(db, capacity, in_flight))
+        for _, domain_id, _ in claimed:
+            self._domain_in_flight[domain_id] = self._domain_in_flight.get(domain_id, 0) + 1
+        return claimed
+
+    def _claim(self, db: Session, capacity: int, in_flight: Dict[int, int]) -> List[Tuple[int, int, str]]:
+        now = datetime.utcnow()
+        # Rows whose worker stopped sending heartbeats go back to the queue;
+        # they keep their claim token until claimed again
+        db.query(OutboundMessage).filter(
+            OutboundMessage.status == OutboundStatus.SENDING,
+            OutboundMessage.claimed_at < now - timedelta(seconds=settings.OUTBOUND_CLAIM_TIMEOUT)
+        ).update({OutboundMessage.status: OutboundStatus.RETRY}, synchronize_session=False)
+
+        candidates = db.query(OutboundMessage.id, OutboundMessage.domain_id).filter(
+            OutboundMessage.status.in_(PENDING),
+            OutboundMessage.next_attempt_at <= now
+        ).order_by(OutboundMessage.next_attempt_at).limit(capacity * 4).all()
+
+        claimed = []
+        for message_id, domain_id in candidates:
+            if len(claimed) >= capacity:
+                break
+            if in_flight.get(domain_id, 0) >= settings.OUTBOUND_DOMAIN_CONCURRENCY:
+                continue
+            token = uuid.uuid4().hex
+            updated = db.query(OutboundMessage).filter(
+                OutboundMessage.id == message_id,
+                OutboundMessage.status.in_(PENDING)
+            ).update({
+                OutboundMessage.status: OutboundStatus.SENDING,
+                OutboundMessage.claimed_at: now,
+                OutboundMessage.claim_token: token,
+            }, synchronize_session=False)
+            if updated:
+                in_flight[domain_id] = in_flight.get(domain_id, 0) + 1
+                claimed.append((message_id, domain_id, token))
+        return claimed
+
+    def _load(self, message_id: int, domain_id: int):
+        db = SessionLocal()
+        try:
+            message = db.query(OutboundMessage).filter(OutboundMessage.id == message_id).first()
+            if message is None:
+                return None
+            email_account = db.query(EmailAccount).filter(
+                EmailAccount.id == message.email_account_id,
+                EmailAccount.is_active == True
+            ).first()
+            domain = db.query(Domain).filter(Domain.id == domain_id).first()
+            source = message.message if message.message is not None else message.message_path
+            return email_account, domain, message.recipients, source
+        finally:
+            db.close()
+
+    async def _heartbeat(self, message_id: int, token: str):
+        """Keep a slow but live delivery's claim from being taken over"""
+        def touch(db: Session) -> int:
+            return db.query(OutboundMessage).filter(
+                OutboundMessage.id == message_id,
+                OutboundMessage.claim_token == token
+            ).update({OutboundMessage.claimed_at: datetime.utcnow()}, synchronize_session=False)
+
+        while True:
+            await asyncio.sleep(settings.OUTBOUND_CLAIM_TIMEOUT / 3)
+            try:
+                if not await write_queue.run_async(touch):
+                    logger.warning(f"Outbound message {message_id} was claimed by another worker")
+                    return
+            except Exception as e:
+                logger.warning(f"Heartbeat for outbound message {message_id} failed: {e}")
+
+    async def _deliver(self, message_id: int, domain_id: int, token: str):
+        try:
+            # Hold no database connection while talking to the SMTP server
+            loaded = await asyncio.to_thread(self._load, message_id, domain_id)
+            if loaded is None:
+                return
+            email_account, domain, recipients, source = loaded
+
+            error: Optional[BaseException] = None
+            heartbeat = asyncio.ensure_future(self._heartbeat(message_id, token))
+            try:
+                if email_account is None or domain is None:
+                    raise LookupError("Email account no longer exists")
+                await email_service.deliver(domain, email_account, recipients, source)
+            except (asyncio.CancelledError, Exception) as e:
+                error = e
+            finally:
+                heartbeat.cancel()
+
+            sent_path = await write_queue.run_async(
+                lambda db: self._record_outcome(db, message_id, token, error)
+            )
+            if sent_path:
+                await asyncio.to_thread(_remove_quietly, sent_path)
+            if isinstance(error, asyncio.CancelledError):
+                raise error
+        finally:
+            self._domain_in_flight[domain_id] -= 1
+            self._publish(message_id)
+            # A slot is free; look for more work
+            self._wakeup.set()
+
+    def _record_outcome(self, db: Session, message_id: int, token: str,
+                        error: Optional[BaseException]) -> Optional[str]:
+        """Apply a delivery's outcome if its claim is still held.
+
+        Returns the spooled message file to remove once the send is recorded.
+        """
+        message = db.query(OutboundMessage).filter(
+            OutboundMessage.id == message_id,
+            OutboundMessage.claim_token == token
+        ).with_for_update().first()
+        if message is None:
+            logger.warning(f"Outbound message {message_id} was claimed by another worker; "
+                           f"dropping this attempt's outcome")
+            return None
+        now = datetime.utcnow()
+        message.claimed_at = None
+        message.claim_token = None
+        sent_path = None
+        if error is None:
+            message.status = OutboundStatus.SENT
+            message.sent_at = now
+            message.last_error = None
+            message.message = None
+            sent_path = message.message_path
+            message.message_path = None
+        elif isinstance(error, asyncio.CancelledError):
+            # Shutting down mid-delivery; try again on the next start
+            message.status = OutboundStatus.RETRY
+            message.next_attempt_at = now
+        elif isinstance(error, CircuitOpenError):
+            # The server is known to be down; wait it out without using up an attempt
+            message.status = OutboundStatus.RETRY
+            message.next_attempt_at = now + timedelta(seconds=error.retry_after)
+            message.last_error = str(error)
+        else:
+            message.attempts += 1
+            message.last_error = str(error)
+            if is_permanent_failure(error) or message.attempts >= settings.OUTBOUND_MAX_ATTEMPTS:
+                logger.warning(f"Outbound message {message_id} dead-lettered: {error}")
+                message.status = OutboundStatus.DEAD
+            else:
+                delay = min(settings.OUTBOUND_RETRY_MAX,
+                            settings.OUTBOUND_RETRY_BASE * 2 ** (message.attempts - 1))
+                # Jitter keeps retries for one outage from arriving together
+                message.next_attempt_at = now + timedelta(seconds=delay * random.uniform(0.5, 1.0))
+                message.status = OutboundStatus.RETRY
+        return sent_path
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+# Global outbound queue instance
+outbound_queue = OutboundQueue()
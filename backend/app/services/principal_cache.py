@@ -0,0 +1,104 @@
+import hashlib
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+from app.core.config import settings
+from app.models.models import User
+
+class Principal:
+    """The parts of a User that request handlers need to authorize a request"""
+
+    __slots__ = ("id", "domain_id", "is_admin", "email", "username", "session_id")
+
+    def __init__(self, id: int, domain_id: Optional[int], is_admin: bool, email: str, username: str,
+                 session_id: Optional[str] = None):
+        self.id = id
+        self.domain_id = domain_id
+        self.is_admin = is_admin
+        self.email = email
+        self.username = username
+        self.session_id = session_id
+
+    @classmethod
+    def from_user(cls, user: User, session_id: Optional[str] = None) -> "Principal":
+        return cls(user.id, user.domain_id, bool(user.is_admin), user.email, user.username, session_id)
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class PrincipalCache:
+    """Resolved principals by access-token hash, for PRINCIPAL_CACHE_TTL seconds.
+
+    A hit skips both the JWT decode and the user query. Entries never outlive
+    their token, and admin changes to a user drop that user's entries at
+    once; other workers pick the change up when their entries expire.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Tuple[Principal, float]] = {}
+        self.by_user: Dict[int, Set[str]] = {}
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "invalidated": 0}
+
+    def get(self, token_hash: str) -> Optional[Principal]:
+        entry = self.entries.get(token_hash)
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        principal, expires_at = entry
+        if expires_at <= time.time():
+            self.counters["expired"] += 1
+            self.counters["misses"] += 1
+            self._remove(token_hash)
+            return None
+        self.counters["hits"] += 1
+        return principal
+
+    def put(self, token_hash: str, principal: Principal, token_expires_at: Optional[float] = None):
+        if settings.PRINCIPAL_CACHE_TTL <= 0:
+            return
+        expires_at = time.time() + settings.PRINCIPAL_CACHE_TTL
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        while len(self.entries) >= settings.PRINCIPAL_CACHE_MAX_ENTRIES:
+            # Dicts keep insertion order, so this is the oldest entry
+            self.counters["evicted"] += 1
+            self._remove(next(iter(self.entries)))
+        self.entries[token_hash] = (principal, expires_at)
+        self.by_user.setdefault(principal.id, set()).add(token_hash)
+
+    def _remove(self, token_hash: str):
+        entry = self.entries.pop(token_hash, None)
+        if entry is None:
+            return
+        hashes = self.by_user.get(entry[0].id)
+        if hashes is not None:
+            hashes.discard(token_hash)
+            if not hashes:
+                del self.by_user[entry[0].id]
+
+    def invalidate(self, token_hash: str):
+        if token_hash in self.entries:
+            self.counters["invalidated"] += 1
+            self._remove(token_hash)
+
+    def invalidate_user(self, user_id: int):
+        hashes = self.by_user.pop(user_id, set())
+        for token_hash in hashes:
+            self.entries.pop(token_hash, None)
+        self.counters["invalidated"] += len(hashes)
+
+    def clear(self):
+        self.counters["invalidated"] += len(self.entries)
+        self.entries.clear()
+        self.by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            "size": len(self.entries),
+            "users": len(self.by_user),
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            **self.counters,
+        }
+
+# Global principal cache instance
+principal_cache = PrincipalCache()
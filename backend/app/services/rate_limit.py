@@ -0,0 +1,332 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.database.database import AsyncSessionLocal, SessionLocal
+from app.models.models import User
+from app.services.principal_cache import Principal
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - only needed for RATE_LIMIT_BACKEND=redis
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+class RateLimitExceeded(Exception):
+    def __init__(self, scope: str, retry_after: float):
+        self.scope = scope
+        self.retry_after = retry_after
+        super().__init__(f"{scope} send limit reached, retry in {retry_after:.0f}s")
+
+def _start_of_day() -> datetime:
+    return datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _seconds_until_tomorrow() -> float:
+    return (_start_of_day() + timedelta(days=1) - datetime.utcnow()).total_seconds()
+
+def _sent_today(user: User) -> int:
+    """User.email_sent_today, or 0 if it was last reset before today (lazy daily reset)"""
+    reset = user.last_quota_reset
+    if reset is not None and reset.tzinfo is not None:
+        reset = reset.astimezone(timezone.utc).replace(tzinfo=None)
+    if reset is None or reset < _start_of_day():
+        return 0
+    return user.email_sent_today or 0
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, count: int) -> float:
+        return 0.0 if self.tokens >= count else (count - self.tokens) / self.rate
+
+class DailyCounter:
+    __slots__ = ("day", "limit", "sent")
+
+    def __init__(self, day: datetime, limit: int, sent: int):
+        self.day = day
+        self.limit = limit
+        self.sent = sent
+
+class MemoryBackend:
+    """Buckets and counters in this process; atomic because nothing here awaits"""
+
+    def __init__(self):
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.counters: Dict[int, DailyCounter] = {}
+
+    async def take(self, buckets: List[Tuple[str, float, int]], count: int) -> Tuple[Optional[str], float]:
+        now = time.monotonic()
+        states = []
+        for key, rate, burst in buckets:
+            bucket = self.buckets.get(key)
+            if bucket is None or bucket.rate != rate or bucket.burst != burst:
+                bucket = self.buckets[key] = TokenBucket(rate, burst)
+            bucket.refill(now)
+            wait = bucket.wait_time(count)
+            if wait > 0:
+                return key, wait
+            states.append(bucket)
+        for bucket in states:
+            bucket.tokens -= count
+        return None, 0.0
+
+    async def has_counter(self, user_id: int) -> bool:
+        counter = self.counters.get(user_id)
+        return counter is not None and counter.day == _start_of_day()
+
+    async def seed(self, user_id: int, limit: int, sent: int):
+        self.counters[user_id] = DailyCounter(_start_of_day(), limit, sent)
+
+    async def reserve(self, user_id: int, count: int) -> int:
+        counter = self.counters[user_id]
+        if counter.day != _start_of_day():
+            counter.day, counter.sent = _start_of_day(), 0
+        granted = max(0, min(count, counter.limit - counter.sent))
+        counter.sent += granted
+        return granted
+
+    async def release(self, user_id: int, count: int):
+        counter = self.counters.get(user_id)
+        if counter is not None and counter.day == _start_of_day():
+            counter.sent = max(0, counter.sent - count)
+
+    async def set_limit(self, user_id: int, limit: int):
+        counter = self.counters.get(user_id)
+        if counter is not None:
+            counter.limit = limit
+
+    async def sent(self, user_id: int) -> Optional[int]:
+        counter = self.counters.get(user_id)
+        if counter is None or counter.day != _start_of_day():
+            return None
+        return counter.sent
+
+# Takes ARGV[2] tokens from every bucket in KEYS, or from none of them; each
+# bucket's rate and burst follow in ARGV. Returns the 1-based index of the
+# first bucket that was short, and how long until it would not be.
+_TAKE_SCRIPT = """
+local now, count = tonumber(ARGV[1]), tonumber(ARGV[2])
+local states = {}
+for i, key in ipairs(KEYS) do
+    local rate, burst = tonumber(ARGV[1 + 2 * i]), tonumber(ARGV[2 + 2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    if tokens < count then
+        return {i, tostring((count - tokens) / rate)}
+    end
+    states[i] = {tokens, math.ceil(burst / rate) + 1}
+end
+for i, key in ipairs(KEYS) do
+    redis.call('HSET', key, 'tokens', states[i][1] - count, 'ts', now)
+    redis.call('EXPIRE', key, states[i][2])
+end
+return {0, '0'}
+"""
+
+# Grants up to ARGV[2] against the limit ARGV[1]; returns the amount granted
+_RESERVE_SCRIPT = """
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+local granted = math.min(tonumber(ARGV[2]), tonumber(ARGV[1]) - used)
+if granted <= 0 then
+    return 0
+end
+redis.call('INCRBY', KEYS[1], granted)
+return granted
+"""
+
+_RELEASE_SCRIPT = """
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+if used > 0 then
+    redis.call('SET', KEYS[1], math.max(0, used - tonumber(ARGV[1])), 'KEEPTTL')
+end
+return 0
+"""
+
+class RedisBackend:
+    """Buckets and counters shared by every worker through Redis scripts.
+
+    Daily counters are keyed by day, so they reset themselves; quota limits
+    are cached per process and refreshed on every write-back.
+    """
+
+    def __init__(self, url: str):
+        if aioredis is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the redis package")
+        self.client = aioredis.from_url(url)
+        self.limits: Dict[int, int] = {}
+        self._take = self.client.register_script(_TAKE_SCRIPT)
+        self._reserve = self.client.register_script(_RESERVE_SCRIPT)
+        self._release = self.client.register_script(_RELEASE_SCRIPT)
+
+    @staticmethod
+    def _counter_key(user_id: int) -> str:
+        return f"quota:{user_id}:{_start_of_day():%Y%m%d}"
+
+    async def take(self, buckets: List[Tuple[str, float, int]], count: int) -> Tuple[Optional[str], float]:
+        args: List[float] = [time.time(), count]
+        for _, rate, burst in buckets:
+            args += [rate, burst]
+        index, wait = await self._take(keys=[f"bucket:{key}" for key, _, _ in buckets], args=args)
+        if int(index) == 0:
+            return None, 0.0
+        return buckets[int(index) - 1][0], float(wait)
+
+    async def has_counter(self, user_id: int) -> bool:
+        return user_id in self.limits and bool(await self.client.exists(self._counter_key(user_id)))
+
+    async def seed(self, user_id: int, limit: int, sent: int):
+        self.limits[user_id] = limit
+        # Another worker may have seeded it first; its count wins
+        await self.client.set(self._counter_key(user_id), sent, nx=True, ex=2 * 24 * 3600)
+
+    async def reserve(self, user_id: int, count: int) -> int:
+        return int(await self._reserve(keys=[self._counter_key(user_id)], args=[self.limits[user_id], count]))
+
+    async def release(self, user_id: int, count: int):
+        await self._release(keys=[self._counter_key(user_id)], args=[count])
+
+    async def set_limit(self, user_id: int, limit: int):
+        self.limits[user_id] = limit
+
+    async def sent(self, user_id: int) -> Optional[int]:
+        value = await self.client.get(self._counter_key(user_id))
+        return None if value is None else int(value)
+
+class SendLimiter:
+    """Per-user and per-domain send rate limits plus the daily send quota.
+
+    Rates are token buckets: SEND_RATE_PER_* messages per second sustained,
+    with bursts of up to SEND_BURST_PER_*. Daily counts live in the backend,
+    seeded from User.email_sent_today, and are written back every
+    QUOTA_FLUSH_SECONDS instead of updating the user row on each send. With
+    several API workers, use RATE_LIMIT_BACKEND=redis so they share state.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._dirty: Set[int] = set()
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = (RedisBackend(settings.REDIS_URL) if settings.RATE_LIMIT_BACKEND == "redis"
+                             else MemoryBackend())
+        return self._backend
+
+    async def _ensure_counter(self, user_id: int):
+        if await self.backend.has_counter(user_id):
+            return
+        async with AsyncSessionLocal() as db:
+            user = await db.get(User, user_id)
+            if user is None:
+                raise LookupError(f"User {user_id} not found")
+            limit, sent = user.email_quota_daily or 0, _sent_today(user)
+        await self.backend.seed(user_id, limit, sent)
+
+    async def acquire(self, user: Principal, count: int = 1, quota: Optional[int] = None):
+        """Take ``count`` sends for ``user`` from the rate limits and ``quota``
+        (default ``count``) from the daily quota, e.g. one per recipient, or
+        raise RateLimitExceeded without taking any"""
+        quota = count if quota is None else quota
+        buckets = [(f"user:{user.id}", settings.SEND_RATE_PER_USER, settings.SEND_BURST_PER_USER)]
+        if user.domain_id is not None:
+            buckets.append((f"domain:{user.domain_id}", settings.SEND_RATE_PER_DOMAIN,
+                            settings.SEND_BURST_PER_DOMAIN))
+        try:
+            await self._ensure_counter(user.id)
+            granted = await self.backend.reserve(user.id, quota)
+            if granted < quota:
+                await self.backend.release(user.id, granted)
+                raise RateLimitExceeded("Daily quota", _seconds_until_tomorrow())
+            limited, wait = await self.backend.take(buckets, count)
+            if limited is not None:
+                await self.backend.release(user.id, granted)
+                raise RateLimitExceeded(limited.partition(":")[0].capitalize(), wait)
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            # Better to let mail through than to fail every send with the limiter
+            logger.error(f"Send limiter unavailable, not enforcing limits: {e}")
+            return
+        self._dirty.add(user.id)
+
+    async def reserve_quota(self, user_id: int, count: int) -> int:
+        """Reserve up to ``count`` sends against the daily quota; returns how many were granted"""
+        await self._ensure_counter(user_id)
+        granted = await self.backend.reserve(user_id, count)
+        if granted:
+            self._dirty.add(user_id)
+        return granted
+
+    async def release_quota(self, user_id: int, count: int):
+        """Give back reserved sends that were not used"""
+        if count > 0:
+            await self.backend.release(user_id, count)
+            self._dirty.add(user_id)
+
+    async def flush(self):
+        """Write daily counts back to the user rows and pick up changed quotas"""
+        dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return
+        counts = {}
+        for user_id in dirty:
+            sent = await self.backend.sent(user_id)
+            if sent is not None:
+                counts[user_id] = sent
+        db = SessionLocal()
+        try:
+            today = _start_of_day()
+            for user_id, sent in counts.items():
+                db.query(User).filter(User.id == user_id).update(
+                    {User.email_sent_today: sent, User.last_quota_reset: today}, synchronize_session=False
+                )
+            db.commit()
+            for user_id, limit in db.query(User.id, User.email_quota_daily).filter(User.id.in_(dirty)):
+                await self.backend.set_limit(user_id, limit or 0)
+        except Exception:
+            self._dirty |= dirty
+            raise
+        finally:
+            db.close()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(settings.QUOTA_FLUSH_SECONDS)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to write back send quotas: {e}")
+
+    def start(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.ensure_future(self._flush_loop())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to write back send quotas: {e}")
+
+# Global send limiter instance
+send_limiter = SendLimiter()
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import uuid
+from typing import Dict, Optional, Tuple, Union
+import aioimaplib
+from app.core.config import settings
+from app.database.database import SessionLocal
+from app.models.models import Domain, EmailAccount
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.email_service import email_service
+
+logger = logging.getLogger(__name__)
+
+_LIST_LINE = re.compile(rb'^\(([^)]*)\) (?:"[^"]*"|NIL) "?([^"]*)"?$')
+# "<id>.json" from before records were claimed, or "<id>.<pid>.claimed"
+_RECORD_NAME = re.compile(r"^([0-9a-f]+)(?:\.json|\.(\d+)\.claimed)$")
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, under another user
+        pass
+    return True
+
+class SentCopyJob:
+    """One sent message waiting to be appended to the Sent folder.
+
+    The MIME bytes live in the spool directory, next to a small JSON record,
+    so pending copies survive a restart. The record's name carries the pid
+    of the process that owns the copy, so only one process appends it.
+    """
+
+    def __init__(self, job_id: str, domain: Domain, email_account: EmailAccount, attempts: int = 0):
+        self.id = job_id
+        self.domain = domain
+        self.email_account = email_account
+        self.attempts = attempts
+        self.owner = os.getpid()
+
+    @property
+    def message_path(self) -> str:
+        return os.path.join(settings.SENT_COPY_SPOOL_DIR, f"{self.id}.eml")
+
+    @property
+    def record_path(self) -> str:
+        return os.path.join(settings.SENT_COPY_SPOOL_DIR, f"{self.id}.{self.owner}.claimed")
+
+    def save(self, failed: bool = False, error: str = ""):
+        record = {
+            "account_id": self.email_account.id,
+            "domain_id": self.domain.id,
+            "attempts": self.attempts,
+            "failed": failed,
+            "error": error,
+        }
+        with open(self.record_path, "w") as handle:
+            json.dump(record, handle)
+
+    def read_message(self) -> bytes:
+        with open(self.message_path, "rb") as handle:
+            return handle.read()
+
+    def remove(self):
+        for path in (self.message_path, self.record_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+class SentCopyService:
+    """Appends sent messages to the Sent folder off the request path.
+
+    Each account gets one worker holding one IMAP connection, reused for
+    every queued copy and closed after SENT_COPY_IDLE_SECONDS without work.
+    Failed APPENDs are retried with exponential backoff.
+    """
+
+    def __init__(self):
+        self.queues: Dict[Tuple[int, int], asyncio.Queue] = {}
+        self.workers: Dict[Tuple[int, int], asyncio.Task] = {}
+
+    async def enqueue(self, domain: Domain, email_account: EmailAccount, message: Union[bytes, str]):
+        """Spool ``message`` (bytes or a spooled file's path) and schedule its
+        APPEND; returns without any IMAP I/O.
+        """
+        if not settings.SENT_COPY_ENABLED:
+            return
+        job = SentCopyJob(uuid.uuid4().hex, domain, email_account)
+        # Disk writes stay off the event loop; the copy must exist before
+        # the sender is told it may delete its own file
+        await asyncio.to_thread(self._spool, job, message)
+        self._submit(job)
+
+    def _spool(self, job: SentCopyJob, message: Union[bytes, str]):
+        os.makedirs(settings.SENT_COPY_SPOOL_DIR, exist_ok=True)
+        if isinstance(message, bytes):
+            with open(job.message_path, "wb") as handle:
+                handle.write(message)
+        else:
+            try:
+                # The sender may delete its file; a hard link costs no copy
+                os.link(message, job.message_path)
+            except OSError:
+                shutil.copyfile(message, job.message_path)
+        # The record is written last: a spool entry without one is incomplete
+        job.save()
+
+    def _submit(self, job: SentCopyJob):
+        key = (job.email_account.id, job.domain.id)
+        queue = self.queues.setdefault(key, asyncio.Queue())
+        queue.put_nowait(job)
+        worker = self.workers.get(key)
+        if worker is None or worker.done():
+            self.workers[key] = asyncio.ensure_future(self._worker(key, queue))
+
+    def _retry(self, job: SentCopyJob, error: Exception):
+        job.attempts += 1
+        if job.attempts >= settings.SENT_COPY_MAX_ATTEMPTS:
+            logger.error(f"Giving up copying sent message {job.id} to Sent: {error}")
+            job.save(failed=True, error=str(error))
+            return
+        delay = min(settings.SENT_COPY_RETRY_MAX, settings.SENT_COPY_RETRY_BASE * 2 ** (job.attempts - 1))
+        if isinstance(error, CircuitOpenError):
+            delay = max(delay, error.retry_after)
+        logger.warning(f"Copy of sent message {job.id} to Sent failed, retrying in {delay:.0f}s: {error}")
+        job.save(error=str(error))
+        asyncio.get_running_loop().call_later(delay, self._submit, job)
+
+    async def _sent_folder(self, imap: aioimaplib.IMAP4_SSL) -> str:
+        """The folder flagged \\Sent (RFC 6154), else SENT_COPY_FOLDER"""
+        response = await imap.list('""', '*')
+        names = []
+        for line in response.lines:
+            match = _LIST_LINE.match(line) if isinstance(line, bytes) else None
+            if not match:
+                continue
+            name = match.group(2).decode(errors="ignore")
+            if b"\\sent" in match.group(1).lower():
+                return name
+            names.append(name)
+        for name in names:
+            if name.lower() == settings.SENT_COPY_FOLDER.lower():
+                return name
+        await imap.create(settings.SENT_COPY_FOLDER)
+        return settings.SENT_COPY_FOLDER
+
+    async def _worker(self, key: Tuple[int, int], queue: asyncio.Queue):
+        imap = None
+        folder = None
+        try:
+            while True:
+                try:
+                    job = await asyncio.wait_for(queue.get(), timeout=settings.SENT_COPY_IDLE_SECONDS)
+                except asyncio.TimeoutError:
+                    if queue.empty():
+                        return
+                    continue
+                try:
+                    message = await asyncio.to_thread(job.read_message)
+                    if imap is None:
+                        imap = await email_service.get_imap_connection(job.domain, job.email_account)
+                        folder = await self._sent_folder(imap)
+                    response = await imap.append(
+                        message, mailbox=folder, flags="(\\Seen)",
+                        timeout=settings.SENT_COPY_APPEND_TIMEOUT
+                    )
+                    if response.result != "OK":
+                        raise Exception(f"APPEND rejected: {response.lines[-1]!r}")
+                    job.remove()
+                    email_service.note_appended(job.email_account, job.domain, folder)
+                except FileNotFoundError:
+                    logger.warning(f"Spooled sent message {job.id} disappeared, skipping")
+                except Exception as e:
+                    # The connection state is unknown after a failure; start afresh
+                    await self._logout(imap)
+                    imap = None
+                    self._retry(job, e)
+        finally:
+            if self.workers.get(key) is asyncio.current_task():
+                del self.workers[key]
+            await self._logout(imap)
+
+    async def _logout(self, imap: Optional[aioimaplib.IMAP4_SSL]):
+        if imap is None:
+            return
+        try:
+            await imap.logout()
+        except Exception:
+            pass
+
+    def resume(self):
+        """Re-queue copies spooled before the last shutdown.
+
+        Every API and outbound worker process calls this at startup. A record
+        is taken over only when its owner is no longer running (or is this
+        process, after a restart that reused the pid), by renaming it to this
+        process's claim; of several processes racing for it, one rename wins.
+        """
+        if not os.path.isdir(settings.SENT_COPY_SPOOL_DIR):
+            return
+        records = {}
+        for filename in os.listdir(settings.SENT_COPY_SPOOL_DIR):
+            match = _RECORD_NAME.match(filename)
+            if not match:
+                continue
+            job_id, owner = match.group(1), match.group(2)
+            if owner is not None and int(owner) != os.getpid() and _pid_alive(int(owner)):
+                continue
+            path = os.path.join(settings.SENT_COPY_SPOOL_DIR, filename)
+            try:
+                with open(path) as handle:
+                    record = json.load(handle)
+            except (OSError, ValueError):
+                continue
+            if record.get("failed"):
+                continue
+            try:
+                os.rename(path, os.path.join(settings.SENT_COPY_SPOOL_DIR, f"{job_id}.{os.getpid()}.claimed"))
+            except FileNotFoundError:
+                # Another process claimed it first
+                continue
+            records[job_id] = record
+        if not records:
+            return
+
+        db = SessionLocal()
+        try:
+            accounts = {account.id: account for account in db.query(EmailAccount).filter(
+                EmailAccount.id.in_({record["account_id"] for record in records.values()})
+            )}
+            domains = {domain.id: domain for domain in db.query(Domain).filter(
+                Domain.id.in_({record["domain_id"] for record in records.values()})
+            )}
+        finally:
+            db.close()
+
+        for job_id, record in records.items():
+            account, domain = accounts.get(record["account_id"]), domains.get(record["domain_id"])
+            if account is None or domain is None:
+                logger.warning(f"Dropping spooled sent message {job_id}: account no longer exists")
+                SentCopyJob(job_id, domain, account).remove()
+                continue
+            self._submit(SentCopyJob(job_id, domain, account, record.get("attempts", 0)))
+        logger.info(f"Resumed {len(records)} pending Sent copies")
+
+# Global sent-copy pipeline instance
+sent_copy_service = SentCopyService()
+email_service.post_send_hooks.append(sent_copy_service.enqueue)
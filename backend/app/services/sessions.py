@@ -0,0 +1,184 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.database.database import SessionLocal
+from app.models.models import User
+from app.models.sessions import AuthSession
+
+logger = logging.getLogger(__name__)
+
+class InvalidRefreshToken(Exception):
+    pass
+
+def _refresh_hash(secret: str) -> str:
+    return hmac.new(settings.SECRET_KEY.encode(), secret.encode(), hashlib.sha256).hexdigest()
+
+def _new_refresh_token(session_id: str) -> Tuple[str, str]:
+    """(token, stored hash); the token is "<session id>.<secret>" """
+    secret = secrets.token_urlsafe(32)
+    return f"{session_id}.{secret}", _refresh_hash(secret)
+
+def _successor_secret(secret: str) -> str:
+    """The secret that replaces ``secret`` on rotation.
+
+    Derived rather than random so concurrent refreshes with the same token
+    all receive the same successor. Without SECRET_KEY it cannot be computed,
+    and it is keyed differently from the stored hash.
+    """
+    digest = hmac.new(settings.SECRET_KEY.encode(), b"refresh-successor:" + secret.encode(), hashlib.sha256)
+    return base64.urlsafe_b64encode(digest.digest()).rstrip(b"=").decode()
+
+class RevocationList:
+    """Revoked session ids whose access tokens could still be unexpired.
+
+    Checked on every authenticated request, so it is a set lookup. Sessions
+    revoked by other workers are picked up by polling the session table at
+    most every SESSION_REVOCATION_POLL_SECONDS, in a background task whose
+    query runs in a worker thread.
+    """
+
+    def __init__(self):
+        self.revoked: Dict[str, datetime] = {}
+        self._polled_at = 0.0
+        self._polled_until: Optional[datetime] = None
+        self._poller: Optional[asyncio.Task] = None
+
+    def add(self, session_ids: List[str], revoked_at: Optional[datetime] = None):
+        for session_id in session_ids:
+            self.revoked[session_id] = revoked_at or datetime.utcnow()
+
+    def is_revoked(self, session_id: str) -> bool:
+        if (time.monotonic() - self._polled_at >= settings.SESSION_REVOCATION_POLL_SECONDS
+                and (self._poller is None or self._poller.done())):
+            self._polled_at = time.monotonic()
+            self._poller = asyncio.ensure_future(self._poll())
+        return session_id in self.revoked
+
+    async def prime(self):
+        """Load current revocations before the first request is served"""
+        self._polled_at = time.monotonic()
+        await self._poll()
+
+    async def _poll(self):
+        now = datetime.utcnow()
+        # Older revocations no longer matter: no access token issued before them is still valid
+        horizon = now - timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        since = max(horizon, self._polled_until - timedelta(seconds=5)) if self._polled_until else horizon
+        try:
+            rows = await asyncio.to_thread(self._fetch, since)
+        except Exception as e:
+            logger.warning(f"Polling revoked sessions failed: {e}")
+            return
+        self._polled_until = now
+        for session_id, revoked_at in rows:
+            self.revoked[session_id] = revoked_at
+        for session_id in [sid for sid, revoked_at in self.revoked.items() if revoked_at < horizon]:
+            del self.revoked[session_id]
+
+    def _fetch(self, since: datetime) -> List[Tuple[str, datetime]]:
+        db = SessionLocal()
+        try:
+            return db.query(AuthSession.id, AuthSession.revoked_at).filter(AuthSession.revoked_at >= since).all()
+        finally:
+            db.close()
+
+class SessionStore:
+    """Refresh-token sessions with rotation.
+
+    Renewing is one primary-key lookup, an HMAC comparison and a conditional
+    UPDATE on the current hash, so of two concurrent refreshes exactly one
+    rotates. A token rotated less than SESSION_REFRESH_GRACE_SECONDS ago
+    still renews, to the same successor, so two tabs refreshing at once both
+    succeed. Presenting an older token means it leaked, and the whole session
+    is revoked.
+    """
+
+    def create(self, db: Session, user_id: int) -> Tuple[str, str]:
+        """Start a session; returns (session id, refresh token)"""
+        now = datetime.utcnow()
+        db.query(AuthSession).filter(
+            AuthSession.user_id == user_id, AuthSession.expires_at < now
+        ).delete(synchronize_session=False)
+        session_id = secrets.token_hex(16)
+        token, refresh_hash = _new_refresh_token(session_id)
+        db.add(AuthSession(
+            id=session_id,
+            user_id=user_id,
+            refresh_hash=refresh_hash,
+            created_at=now,
+            last_used_at=now,
+            expires_at=now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+        ))
+        db.commit()
+        return session_id, token
+
+    def rotate(self, db: Session, refresh_token: str) -> Tuple[AuthSession, User, str]:
+        """Exchange a refresh token for its successor; raises InvalidRefreshToken"""
+        session_id, _, secret = refresh_token.partition(".")
+        row = db.query(AuthSession, User).join(User, User.id == AuthSession.user_id).filter(
+            AuthSession.id == session_id
+        ).first()
+        if row is None or not secret:
+            raise InvalidRefreshToken("Unknown session")
+        auth_session, user = row
+        now = datetime.utcnow()
+        if auth_session.revoked_at is not None or auth_session.expires_at <= now or not user.is_active:
+            raise InvalidRefreshToken("Session expired or revoked")
+
+        presented_hash = _refresh_hash(secret)
+        successor = _successor_secret(secret)
+        successor_hash = _refresh_hash(successor)
+        token = f"{session_id}.{successor}"
+        if hmac.compare_digest(auth_session.refresh_hash, presented_hash):
+            rotated = db.query(AuthSession).filter(
+                AuthSession.id == session_id,
+                AuthSession.refresh_hash == presented_hash
+            ).update({
+                AuthSession.refresh_hash: successor_hash,
+                AuthSession.generation: func.coalesce(AuthSession.generation, 0) + 1,
+                AuthSession.last_used_at: now,
+            }, synchronize_session=False)
+            db.commit()
+            if rotated:
+                return auth_session, user, token
+            # A concurrent refresh with the same token got there first
+            db.refresh(auth_session)
+
+        if (hmac.compare_digest(auth_session.refresh_hash, successor_hash)
+                and auth_session.last_used_at >= now - timedelta(seconds=settings.SESSION_REFRESH_GRACE_SECONDS)):
+            return auth_session, user, token
+
+        self.revoke(db, session_id)
+        raise InvalidRefreshToken("Refresh token was already used")
+
+    def _revoke(self, db: Session, *criteria):
+        now = datetime.utcnow()
+        session_ids = [sid for (sid,) in db.query(AuthSession.id).filter(
+            *criteria, AuthSession.revoked_at == None, AuthSession.expires_at > now
+        )]
+        if session_ids:
+            db.query(AuthSession).filter(AuthSession.id.in_(session_ids)).update(
+                {AuthSession.revoked_at: now}, synchronize_session=False
+            )
+            db.commit()
+            revoked_sessions.add(session_ids, now)
+
+    def revoke(self, db: Session, session_id: str):
+        self._revoke(db, AuthSession.id == session_id)
+
+    def revoke_user(self, db: Session, user_id: int):
+        """End every session of a user, e.g. when they are deactivated"""
+        self._revoke(db, AuthSession.user_id == user_id)
+
+# Global session store and revocation list instances
+session_store = SessionStore()
+revoked_sessions = RevocationList()
@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional, Tuple
+import aiosmtplib
+from app.core.config import settings
+from app.models.models import Domain, EmailAccount
+from app.services.circuit_breaker import circuit_breakers
+from app.services.mime_stream import dot_stuff
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, int, bool, str, str]
+
+class SMTPSession:
+    """An authenticated SMTP connection plus its reuse bookkeeping"""
+
+    __slots__ = ("smtp", "created_at", "last_used", "messages_sent")
+
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.messages_sent = 0
+
+    def idle_for(self) -> float:
+        return time.monotonic() - self.last_used
+
+class SMTPPool:
+    """Reusable authenticated SMTP sessions keyed by (server, credentials).
+
+    A reused session is RSET before the next message, and one that sat idle
+    for more than SMTP_POOL_NOOP_AFTER seconds is probed with NOOP first.
+    Sessions are retired after SMTP_POOL_MAX_MESSAGES messages or
+    SMTP_POOL_IDLE_SECONDS without use.
+    """
+
+    def __init__(self):
+        self.idle: Dict[PoolKey, List[SMTPSession]] = {}
+        self.in_use = 0
+        self.counters = {"created": 0, "reused": 0, "stale": 0, "recycled": 0, "expired": 0, "failed": 0}
+        self._reaper: Optional[asyncio.Task] = None
+
+    def _key(self, domain: Domain, email_account: EmailAccount) -> PoolKey:
+        # Keep the password out of the key itself
+        secret = hashlib.sha256(email_account.imap_password.encode()).hexdigest()
+        return (domain.smtp_server, domain.smtp_port, bool(domain.use_ssl), email_account.imap_username, secret)
+
+    async def _connect(self, domain: Domain, email_account: EmailAccount) -> SMTPSession:
+        breaker = circuit_breakers.get("smtp", domain.smtp_server, domain.smtp_port)
+        # Adaptive timeouts cover connect and login only; a large DATA on the
+        # same session gets the fixed ceiling
+        smtp = aiosmtplib.SMTP(hostname=domain.smtp_server, port=domain.smtp_port,
+                               use_tls=bool(domain.use_ssl), timeout=settings.UPSTREAM_TIMEOUT_MAX)
+        await breaker.call("connect", smtp.connect)
+        try:
+            await breaker.call(
+                "command", lambda: smtp.login(email_account.imap_username, email_account.imap_password)
+            )
+        except BaseException:
+            await self._close(smtp)
+            raise
+        self.counters["created"] += 1
+        return SMTPSession(smtp)
+
+    async def _revive(self, session: SMTPSession) -> bool:
+        """Make an idle session ready for the next message; False if it is dead"""
+        if not session.smtp.is_connected:
+            return False
+        try:
+            if session.idle_for() > settings.SMTP_POOL_NOOP_AFTER:
+                await session.smtp.noop()
+            await session.smtp.rset()
+            return True
+        except (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError):
+            return False
+
+    async def _acquire(self, key: PoolKey, domain: Domain, email_account: EmailAccount) -> SMTPSession:
+        sessions = self.idle.get(key)
+        while sessions:
+            session = sessions.pop()
+            if session.idle_for() > settings.SMTP_POOL_IDLE_SECONDS:
+                self.counters["expired"] += 1
+                await self._close(session.smtp)
+            elif await self._revive(session):
+                self.counters["reused"] += 1
+                return session
+            else:
+                self.counters["stale"] += 1
+                await self._close(session.smtp)
+        return await self._connect(domain, email_account)
+
+    async def _release(self, key: PoolKey, session: SMTPSession):
+        session.last_used = time.monotonic()
+        sessions = self.idle.setdefault(key, [])
+        if session.messages_sent >= settings.SMTP_POOL_MAX_MESSAGES:
+            self.counters["recycled"] += 1
+            await self._close(session.smtp)
+        elif len(sessions) >= settings.SMTP_POOL_MAX_IDLE_PER_KEY:
+            await self._close(session.smtp)
+        else:
+            sessions.append(session)
+            self._start_reaper()
+
+    @asynccontextmanager
+    async def session(self, domain: Domain, email_account: EmailAccount) -> AsyncIterator[aiosmtplib.SMTP]:
+        """Borrow an authenticated session for sending one message.
+
+        The session goes back to the pool when the block succeeds and is
+        closed when it raises, since its protocol state is then unknown.
+        Timeouts and dropped connections during the transaction count
+        against the server's circuit breaker, like connect and login do.
+        """
+        key = self._key(domain, email_account)
+        session = await self._acquire(key, domain, email_account)
+        self.in_use += 1
+        try:
+            yield session.smtp
+        except BaseException as e:
+            self.counters["failed"] += 1
+            circuit_breakers.get("smtp", domain.smtp_server, domain.smtp_port).record_error(e)
+            await self._close(session.smtp)
+            raise
+        else:
+            session.messages_sent += 1
+            await self._release(key, session)
+        finally:
+            self.in_use -= 1
+
+    def _start_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.ensure_future(self._reap())
+
+    async def _reap(self):
+        """Close sessions idle past SMTP_POOL_IDLE_SECONDS; exits once the pool is empty"""
+        while any(self.idle.values()):
+            await asyncio.sleep(settings.SMTP_POOL_IDLE_SECONDS / 2)
+            for key, sessions in list(self.idle.items()):
+                expired = [s for s in sessions if s.idle_for() > settings.SMTP_POOL_IDLE_SECONDS]
+                if not expired:
+                    continue
+                self.idle[key] = [s for s in sessions if s not in expired]
+                for session in expired:
+                    self.counters["expired"] += 1
+                    await self._close(session.smtp)
+
+    async def _close(self, smtp: aiosmtplib.SMTP):
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    async def close_all(self):
+        for sessions in self.idle.values():
+            for session in sessions:
+                await self._close(session.smtp)
+        self.idle.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "idle": sum(len(sessions) for sessions in self.idle.values()),
+            "in_use": self.in_use,
+            "accounts": len([sessions for sessions in self.idle.values() if sessions]),
+            **self.counters,
+        }
+
+async def _read_chunks(file: BinaryIO, size: int) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await asyncio.to_thread(file.read, size)
+        if not chunk:
+            return
+        yield chunk
+
+async def _expect(protocol, code: int, timeout: Optional[float]):
+    response = await protocol.read_response(timeout=timeout)
+    if response.code != code:
+        raise aiosmtplib.SMTPDataError(response.code, response.message)
+
+async def sendmail_file(smtp: aiosmtplib.SMTP, sender: str, recipients: List[str], file: BinaryIO):
+    """Send a CRLF-terminated message from ``file`` without loading it whole.
+
+    Uses BDAT (RFC 3030) when the server offers CHUNKING, otherwise DATA with
+    dot-stuffing applied chunk by chunk. At most SMTP_STREAM_CHUNK_BYTES of
+    the message are buffered, and the socket's flow control is respected.
+    """
+    await smtp.mail(sender)
+    refused = []
+    for recipient in recipients:
+        try:
+            await smtp.rcpt(recipient)
+        except aiosmtplib.SMTPRecipientRefused as e:
+            refused.append(e)
+    if len(refused) == len(recipients):
+        raise aiosmtplib.SMTPRecipientsRefused(refused)
+
+    protocol = smtp.protocol
+    if protocol is None:
+        raise aiosmtplib.SMTPServerDisconnected("Connection lost")
+    chunks = _read_chunks(file, settings.SMTP_STREAM_CHUNK_BYTES)
+
+    # aiosmtplib has no streaming API; hold its command lock and drive the
+    # protocol directly, as SMTP.data() does for in-memory messages
+    async with protocol._command_lock:
+        if smtp.supports_extension("chunking"):
+            # One chunk of lookahead, so the final one can be marked LAST
+            previous: Optional[bytes] = None
+            async for chunk in chunks:
+                if previous is not None:
+                    protocol.write(b"BDAT %d\r\n" % len(previous))
+                    protocol.write(previous)
+                    await protocol._drain_helper()
+                    await _expect(protocol, 250, smtp.timeout)
+                previous = chunk
+            previous = previous or b""
+            protocol.write(b"BDAT %d LAST\r\n" % len(previous))
+            protocol.write(previous)
+        else:
+            protocol.write(b"DATA\r\n")
+            await _expect(protocol, 354, smtp.timeout)
+            at_line_start = True
+            async for chunk in chunks:
+                protocol.write(dot_stuff(chunk, at_line_start))
+                await protocol._drain_helper()
+                at_line_start = chunk.endswith(b"\n")
+            protocol.write(b".\r\n" if at_line_start else b"\r\n.\r\n")
+        await _expect(protocol, 250, smtp.timeout)
+
+# Global SMTP session pool
+smtp_pool = SMTPPool()
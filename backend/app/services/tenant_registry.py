@@ -0,0 +1,99 @@
+import time
+from typing import Any, Dict, Optional, Tuple, Type
+from sqlalchemy import inspect
+from app.core.config import settings
+from app.database.database import AsyncSessionLocal
+from app.models.models import Domain, EmailAccount
+
+class RowSnapshot:
+    """Column values of a Domain or EmailAccount row, detached from any session.
+
+    Read-only stand-in for the ORM object: services only read columns, and a
+    snapshot can be shared between requests without lazy loads or expiry.
+    """
+
+    def __init__(self, row):
+        for attr in inspect(row).mapper.column_attrs:
+            self.__dict__[attr.key] = getattr(row, attr.key)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __repr__(self):
+        return f"<RowSnapshot id={self.__dict__.get('id')}>"
+
+class TenantRegistry:
+    """In-memory Domain and EmailAccount rows for resolving a request's mail context.
+
+    Rows load on first use and are kept for TENANT_REGISTRY_TTL seconds.
+    Routes that change domains or accounts invalidate them here, which also
+    bumps the version, so a load that raced an invalidation is not cached.
+    Other workers pick changes up when their entries expire.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._rows: Dict[Tuple[Type, int], Tuple[RowSnapshot, float]] = {}
+        self.counters = {"hits": 0, "misses": 0, "invalidated": 0}
+
+    async def _get(self, model: Type, row_id: int) -> Optional[RowSnapshot]:
+        entry = self._rows.get((model, row_id))
+        if entry is not None and entry[1] > time.monotonic():
+            self.counters["hits"] += 1
+            return entry[0]
+
+        self.counters["misses"] += 1
+        version = self.version
+        async with AsyncSessionLocal() as db:
+            row = await db.get(model, row_id)
+            snapshot = RowSnapshot(row) if row is not None else None
+        # Rows that do not exist are not remembered, so new ones are visible at once
+        if snapshot is not None and version == self.version:
+            if len(self._rows) >= settings.TENANT_REGISTRY_MAX_ENTRIES:
+                self._rows.pop(next(iter(self._rows)))
+            self._rows[(model, row_id)] = (snapshot, time.monotonic() + settings.TENANT_REGISTRY_TTL)
+        return snapshot
+
+    async def domain(self, domain_id: int) -> Optional[RowSnapshot]:
+        return await self._get(Domain, domain_id)
+
+    async def account(self, account_id: int) -> Optional[RowSnapshot]:
+        return await self._get(EmailAccount, account_id)
+
+    async def resolve(self, account_id: int, user_id: int) -> Tuple[Optional[RowSnapshot], Optional[RowSnapshot]]:
+        """(account, domain) if the account is active and belongs to the user; missing parts are None"""
+        account = await self.account(account_id)
+        if account is None or account.user_id != user_id or not account.is_active:
+            return None, None
+        return account, await self.domain(account.domain_id)
+
+    def _invalidate(self, key: Tuple[Type, int]):
+        self.version += 1
+        if self._rows.pop(key, None) is not None:
+            self.counters["invalidated"] += 1
+
+    def invalidate_domain(self, domain_id: int):
+        self._invalidate((Domain, domain_id))
+
+    def invalidate_account(self, account_id: int):
+        self._invalidate((EmailAccount, account_id))
+
+    def invalidate_user(self, user_id: int):
+        self.version += 1
+        stale = [key for key, (row, _) in self._rows.items()
+                 if key[0] is EmailAccount and row.user_id == user_id]
+        for key in stale:
+            del self._rows[key]
+        self.counters["invalidated"] += len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            "size": len(self._rows),
+            "version": self.version,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            **self.counters,
+        }
+
+# Global tenant registry instance
+tenant_registry = TenantRegistry()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark header parsing for message list rows.
+
+Compares the previous path (email.message_from_bytes + decode_header +
+parsedate_to_datetime) with app.services.envelope_parser on the same
+HEADER.FIELDS literal, reporting CPU time and allocations per message.
+
+Run from the backend directory:
+    python benchmarks/bench_envelope.py [messages]
+"""
+
+import email
+import email.utils
+import os
+import sys
+import time
+import tracemalloc
+from datetime import timezone
+from email.header import decode_header
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.services.envelope_parser import parse_header_fields, parse_date
+
+ENCODED = (
+    b"Subject: =?UTF-8?B?UXVhcnRhbHNiZXJpY2h0IMOcYmVyc2ljaHQ=?=\r\n"
+    b"From: =?iso-8859-1?Q?J=FCrgen_M=FCller?= <juergen@example.de>\r\n"
+    b"To: Team <team@example.com>, Bob <bob@example.com>\r\n"
+    b"Date: Tue, 14 Nov 2023 09:12:44 +0100\r\n"
+    b"Message-ID: <20231114081244.12345@mail.example.de>\r\n"
+    b"In-Reply-To: <20231113170000.999@mail.example.com>\r\n"
+    b"References: <20231113160000.111@mail.example.com>\r\n"
+    b" <20231113170000.999@mail.example.com>\r\n"
+    b"\r\n"
+)
+
+PLAIN = (
+    b"Subject: Re: Quarterly report draft for review\r\n"
+    b"From: Alice Example <alice@example.com>\r\n"
+    b"To: Team <team@example.com>\r\n"
+    b"Date: Tue, 14 Nov 2023 09:12:44 -0500\r\n"
+    b"Message-ID: <CAF1234567890abcdef@mail.example.com>\r\n"
+    b"In-Reply-To: <CAF0987654321fedcba@mail.example.com>\r\n"
+    b"References: <CAF0987654321fedcba@mail.example.com>\r\n"
+    b"\r\n"
+)
+
+def _decode_header(header):
+    if not header:
+        return ""
+    decoded = ""
+    for part, encoding in decode_header(header):
+        if isinstance(part, bytes):
+            decoded += part.decode(encoding or "utf-8", errors="ignore")
+        else:
+            decoded += part
+    return decoded.strip()
+
+def legacy(data: bytes):
+    msg = email.message_from_bytes(data)
+    date = email.utils.parsedate_to_datetime(msg.get("Date", ""))
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return (
+        _decode_header(msg.get("Subject", "")),
+        _decode_header(msg.get("From", "")),
+        _decode_header(msg.get("To", "")),
+        date.isoformat(),
+        msg.get("Message-ID", ""),
+        msg.get("In-Reply-To", ""),
+        msg.get("References", ""),
+    )
+
+def fast(data: bytes):
+    env = parse_header_fields(data)
+    return (env.subject, env.sender, env.to, parse_date(env.date).isoformat(),
+            env.message_id, env.in_reply_to, env.references)
+
+def cpu_per_message(fn, sample: bytes, count: int, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(count):
+            fn(sample)
+        best = min(best, time.perf_counter() - start)
+    return best / count
+
+def allocations_per_message(fn, sample: bytes, count: int):
+    """Peak transient bytes per call, via tracemalloc"""
+    fn(sample)  # warm memoized lookups
+    tracemalloc.start()
+    peak = 0
+    for _ in range(count):
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        result = fn(sample)
+        _, call_peak = tracemalloc.get_traced_memory()
+        peak += call_peak - baseline
+        del result
+    tracemalloc.stop()
+    return peak / count
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"messages={count}")
+
+    for name, sample in (("plain", PLAIN), ("rfc2047", ENCODED)):
+        legacy_row, fast_row = legacy(sample), fast(sample)
+        # email.message keeps folding CRLFs in raw header values; the envelope
+        # parser unfolds them
+        if [" ".join(v.split()) for v in legacy_row] != list(fast_row):
+            print(f"WARNING: parsers disagree on {name} sample")
+            print(" legacy:", legacy_row)
+            print(" fast:  ", fast_row)
+
+        legacy_cpu = cpu_per_message(legacy, sample, count)
+        fast_cpu = cpu_per_message(fast, sample, count)
+        legacy_peak = allocations_per_message(legacy, sample, 200)
+        fast_peak = allocations_per_message(fast, sample, 200)
+
+        print(f"[{name}]")
+        print(f"  legacy   {legacy_cpu * 1e6:8.2f} us/msg   {legacy_peak:8.0f} peak bytes/msg")
+        print(f"  envelope {fast_cpu * 1e6:8.2f} us/msg   {fast_peak:8.0f} peak bytes/msg")
+        print(f"  speedup  {legacy_cpu / fast_cpu:8.1f}x CPU   {legacy_peak / max(fast_peak, 1):8.1f}x peak memory")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark event loop lag under concurrent user lookups.
+
+A ticker task sleeps for 1ms in a loop and records how late it wakes up
+while N concurrent tasks load User rows, first through the blocking
+SessionLocal and then through AsyncSessionLocal. Lag is what every other
+request on the worker waits while a query holds the loop.
+
+Run from the backend directory:
+    python benchmarks/bench_event_loop_lag.py [concurrency] [lookups]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench_event_loop_lag.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sqlalchemy import select
+
+from app.database.database import Base, engine, SessionLocal, AsyncSessionLocal
+from app.models.models import Domain, User
+
+USERS = 2000
+TICK = 0.001
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        domain = Domain(name="bench.example", imap_server="localhost", smtp_server="localhost")
+        db.add(domain)
+        db.flush()
+        db.add_all([
+            User(email=f"user{i}@bench.example", username=f"user{i}", hashed_password="x", domain_id=domain.id)
+            for i in range(USERS)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+async def sync_lookup(i: int):
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.email == f"user{i % USERS}@bench.example").first()
+    finally:
+        db.close()
+
+async def async_lookup(i: int):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(User).where(User.email == f"user{i % USERS}@bench.example"))
+        result.scalars().first()
+
+async def measure(lookup, concurrency: int, lookups: int):
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append((time.perf_counter() - start - TICK) * 1000)
+
+    async def worker(offset: int):
+        for i in range(offset, lookups, concurrency):
+            await lookup(i)
+
+    tick_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick_task
+    return lags, elapsed
+
+def report(name: str, lags, elapsed: float, lookups: int):
+    lags = sorted(lags) or [0.0]
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(f"{name:<14} {lookups / elapsed:>10.0f} {statistics.median(lags):>9.2f} {p99:>9.2f} {lags[-1]:>9.2f}")
+
+async def main(concurrency: int, lookups: int):
+    print(f"{concurrency} concurrent tasks, {lookups} lookups over {USERS} users")
+    print(f"{'session':<14} {'lookups/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, lookup in (("SessionLocal", sync_lookup), ("AsyncSession", async_lookup)):
+        await lookup(0)
+        lags, elapsed = await measure(lookup, concurrency, lookups)
+        report(name, lags, elapsed, lookups)
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    seed()
+    try:
+        asyncio.run(main(concurrency, lookups))
+    finally:
+        os.remove(DB_PATH)
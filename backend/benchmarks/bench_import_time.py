@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Import-time budget for the API.
+
+Imports a module (app.main by default) in fresh interpreters with
+`python -X importtime`, keeps the fastest of --runs for each module and
+reports the most expensive modules, cumulative and self, plus the cost per
+top-level package. Fails if the whole import is over --budget-ms, or if a
+storage backend that should only load on first use (paramiko, boto3,
+botocore) was imported.
+
+Run from the backend directory:
+    python benchmarks/bench_import_time.py [--module app.main] [--budget-ms 1500] [--runs 3] [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, Tuple
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Imported lazily by app.services.file_browser
+LAZY_MODULES = ("paramiko", "boto3", "botocore")
+
+def measure(module: str) -> Dict[str, Tuple[int, int]]:
+    """{module: (self us, cumulative us)} for one fresh interpreter"""
+    env = dict(os.environ)
+    # Importing must not need a real database
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'import_time.db')}"
+    env.pop("ASYNC_DATABASE_URL", None)
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr}")
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    # Disk cache and scheduler noise only ever add time, so take the minimum
+    best: Dict[str, Tuple[int, int]] = {}
+    for _ in range(args.runs):
+        for name, (self_us, cumulative_us) in measure(args.module).items():
+            previous = best.get(name)
+            best[name] = (self_us, cumulative_us) if previous is None else \
+                (min(previous[0], self_us), min(previous[1], cumulative_us))
+
+    total_ms = best[args.module][1] / 1000
+    print(f"import {args.module}: {total_ms:.1f}ms, {len(best)} modules (best of {args.runs})\n")
+
+    print(f"Slowest modules, cumulative (top {args.top}):")
+    for name, (_, cumulative_us) in sorted(best.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  {name}")
+
+    print(f"\nSlowest modules, self (top {args.top}):")
+    for name, (self_us, _) in sorted(best.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"  {self_us / 1000:8.1f}ms  {name}")
+
+    packages: Dict[str, int] = defaultdict(int)
+    for name, (self_us, _) in best.items():
+        packages[name.split(".")[0]] += self_us
+    print(f"\nPer package, self time summed (top {args.top}):")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {self_us / 1000:8.1f}ms  {package}")
+
+    failures = 0
+    eager = sorted(package for package in LAZY_MODULES if package in packages)
+    if eager:
+        failures += 1
+        print(f"\nFAIL {', '.join(eager)} imported at startup; load them on first use")
+    if total_ms > args.budget_ms:
+        failures += 1
+        print(f"\nFAIL {total_ms:.1f}ms is over the {args.budget_ms:.0f}ms budget")
+    if not failures:
+        print(f"\nok   within the {args.budget_ms:.0f}ms budget")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
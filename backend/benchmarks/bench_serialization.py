@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-row cost of serializing list payloads.
+
+Compares FastAPI's default response path (response_model validation followed
+by stdlib json rendering) against app.core.responses.fast_response.
+
+Run from the backend directory:
+    python benchmarks/bench_serialization.py [rows] [repeat]
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.core import responses
+from app.schemas.schemas import EmailMessage
+from app.schemas.contacts import ContactResponse
+
+def make_messages(count: int) -> List[EmailMessage]:
+    return [
+        EmailMessage(
+            id=str(i),
+            subject=f"Quarterly report #{i} – draft",
+            sender="Alice Example <alice@example.com>",
+            recipient=["bob@example.com"],
+            date=datetime.now(timezone.utc).isoformat(),
+            is_read=bool(i % 2),
+            folder="INBOX",
+            thread_id=str(i),
+            message_id=f"<{i}@example.com>",
+            in_reply_to="",
+            references="",
+        )
+        for i in range(count)
+    ]
+
+def make_contact_rows(count: int):
+    now = datetime.utcnow()
+    return [
+        SimpleNamespace(
+            id=i, first_name="Contact", last_name=str(i), email=f"c{i}@example.com",
+            phone="+1 555 0100", company="Example Inc", job_title="Engineer",
+            notes=None, is_favorite=False, created_at=now, updated_at=now,
+        )
+        for i in range(count)
+    ]
+
+def default_path(field, rows) -> bytes:
+    content = asyncio.run(serialize_response(field=field, response_content=rows))
+    return JSONResponse(content).body
+
+def fast_path(rows, schema=None) -> bytes:
+    return responses.fast_response(rows, schema).body
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def report(name: str, rows: int, default_s: float, fast_s: float):
+    print(f"{name:<18} default {default_s / rows * 1e6:8.2f} us/row   "
+          f"fast {fast_s / rows * 1e6:8.2f} us/row   speedup {default_s / fast_s:5.1f}x")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"encoder: {'orjson' if responses.orjson else 'stdlib json'}, rows={rows}, repeat={repeat}")
+
+    messages = make_messages(rows)
+    message_field = create_response_field("response", List[EmailMessage], mode="serialization")
+    report("emails/messages", rows,
+           timed(lambda: default_path(message_field, messages), repeat),
+           timed(lambda: fast_path(messages), repeat))
+
+    contacts = make_contact_rows(rows)
+    contact_field = create_response_field("response", List[ContactResponse], mode="serialization")
+    report("contacts", rows,
+           timed(lambda: default_path(contact_field, contacts), repeat),
+           timed(lambda: fast_path(contacts, ContactResponse), repeat))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression check for hot query paths.
+
+Builds a scratch SQLite database with `alembic upgrade head` (or uses the
+already migrated database given with --url, e.g. PostgreSQL), EXPLAINs each
+hot query and fails if any of them scans its table instead of using one of
+the expected indexes. On PostgreSQL sequential scans are disabled for the
+check, so tiny tables still show whether a usable index exists.
+
+Run from the backend directory:
+    python benchmarks/check_query_plans.py [--url DATABASE_URL]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="migrated database to check instead of a scratch SQLite file")
+    return parser.parse_args()
+
+ARGS = parse_args()
+SCRATCH = None if ARGS.url else os.path.join(tempfile.mkdtemp(), "query_plans.db")
+os.environ["DATABASE_URL"] = ARGS.url or f"sqlite:///{SCRATCH}"
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, func, select
+
+from app.models import ChatMember, ChatMessage, Contact, EmailAccount, FileStorage, RSSEntry, User
+
+# (name, statement, table, indexes any of which is acceptable)
+HOT_QUERIES = [
+    ("chat unread count",
+     select(func.count()).select_from(ChatMessage).where(ChatMessage.channel_id == 1, ChatMessage.id > 100),
+     "chat_messages", {"ix_chat_messages_channel_id_id"}),
+    ("chat history page",
+     select(ChatMessage).where(ChatMessage.channel_id == 1, ChatMessage.is_deleted == False)
+     .order_by(ChatMessage.created_at.desc()).limit(50),
+     "chat_messages", {"ix_chat_messages_channel_id_created_at"}),
+    ("chat membership",
+     select(ChatMember).where(ChatMember.channel_id == 1, ChatMember.user_id == 2),
+     "chat_members", {"ix_chat_members_channel_id_user_id"}),
+    ("contact by address",
+     select(Contact).where(Contact.user_id == 2, Contact.domain_id == 1, Contact.email == "a@example.com"),
+     "contacts", {"ix_contacts_user_id_domain_id_email"}),
+    ("user by email",
+     select(User).where(User.email == "a@example.com"),
+     "users", {"ix_users_email_domain_id"}),
+    ("active accounts",
+     select(EmailAccount).where(EmailAccount.user_id == 2, EmailAccount.is_active == True),
+     "email_accounts", {"ix_email_accounts_user_id_is_active"}),
+    ("rss entry by guid",
+     select(RSSEntry).where(RSSEntry.feed_id == 1, RSSEntry.guid == "urn:entry:1"),
+     # guid is unique, so its own index answers the lookup
+     "rss_entries", {"ix_rss_entries_guid"}),
+    ("user file storages",
+     select(FileStorage).where(FileStorage.user_id == 2, FileStorage.domain_id == 1),
+     "file_storages", {"ix_file_storages_user_id_domain_id"}),
+]
+
+def sqlite_plan(connection, sql: str):
+    """(indexes used, tables scanned without an index) from EXPLAIN QUERY PLAN"""
+    used, scanned = set(), set()
+    for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"):
+        detail = row[-1]
+        words = detail.split()
+        if "INDEX" in words:
+            used.add(words[words.index("INDEX") + 1])
+        elif words[:1] == ["SCAN"] and "USING" not in words:
+            scanned.add(words[1])
+    return used, scanned
+
+def postgres_plan(connection, sql: str):
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    used, scanned = set(), set()
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if "Index Name" in node:
+            used.add(node["Index Name"])
+        if node["Node Type"] == "Seq Scan":
+            scanned.add(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return used, scanned
+
+def check(url: str) -> int:
+    engine = create_engine(url)
+    failures = 0
+    with engine.connect() as connection:
+        postgres = connection.dialect.name == "postgresql"
+        if postgres:
+            connection.exec_driver_sql("SET enable_seqscan = off")
+        explain = postgres_plan if postgres else sqlite_plan
+        for name, statement, table, expected in HOT_QUERIES:
+            sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+            used, scanned = explain(connection, sql)
+            ok = table not in scanned and bool(used & expected)
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {name:<20} {', '.join(sorted(used)) or 'no index'}"
+                  + (f" (scans {', '.join(sorted(scanned))})" if scanned else ""))
+    engine.dispose()
+    return failures
+
+def main() -> int:
+    if SCRATCH:
+        config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+        config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+        command.upgrade(config, "head")
+    try:
+        failures = check(os.environ["DATABASE_URL"])
+    finally:
+        if SCRATCH:
+            os.remove(SCRATCH)
+    print(f"{len(HOT_QUERIES) - failures}/{len(HOT_QUERIES)} hot queries use their indexes")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Bulk-import an mbox file, a .eml file or a zip of .eml files into a mailbox.
+
+Usage:
+    python import_mail.py <email_address> <path> [folder]
+
+Messages whose Message-ID already exists in the target folder are skipped,
+so an interrupted import can simply be run again.
+"""
+
+import asyncio
+import os
+import sys
+from app.database.database import SessionLocal
+from app.models.models import Domain, EmailAccount
+from app.services.mail_import import mail_import_service, iter_messages
+
+async def report_progress(job):
+    while job.status == "running":
+        await asyncio.sleep(2)
+        stats = job.to_dict()
+        print(f"  parsed {stats['parsed']}, imported {stats['imported']}, "
+              f"duplicates {stats['duplicates']}, failed {stats['failed']} "
+              f"({stats['messages_per_minute']} msg/min)")
+
+async def import_mail(email_address: str, path: str, folder: str):
+    db = SessionLocal()
+    try:
+        email_account = db.query(EmailAccount).filter(
+            EmailAccount.email_address == email_address,
+            EmailAccount.is_active == True
+        ).first()
+        if not email_account:
+            print(f"❌ Email account not found: {email_address}")
+            sys.exit(1)
+        domain = db.query(Domain).filter(Domain.id == email_account.domain_id).first()
+    finally:
+        db.close()
+
+    print(f"Importing {path} into {email_address}/{folder}...")
+    job = mail_import_service.start_job(folder)
+    progress = asyncio.ensure_future(report_progress(job))
+    with open(path, "rb") as source:
+        await mail_import_service.run_import(
+            domain, email_account, folder, iter_messages(source, os.path.basename(path)), job
+        )
+    progress.cancel()
+
+    stats = job.to_dict()
+    for error in stats["errors"]:
+        print(f"  ! {error}")
+    status = "✅" if job.status == "completed" else "❌"
+    print(f"\n{status} Import {job.status}: {stats['imported']} imported, "
+          f"{stats['duplicates']} duplicates skipped, {stats['failed']} failed")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(import_mail(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else "INBOX"))
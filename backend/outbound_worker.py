@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Run outbound mail delivery in its own process.
+
+Usage:
+    OUTBOUND_WORKER_IN_PROCESS=false uvicorn app.main:app   # API only queues
+    python outbound_worker.py                               # delivers
+
+Several worker processes may run against the same database; each message
+is claimed by exactly one of them.
+"""
+
+import asyncio
+import logging
+from app.core.config import settings
+from app.database.database import engine, async_engine, Base
+from app.database.sqlite import write_queue
+import app.models  # noqa: F401 - registers every table and mapper
+from app.services.outbound_queue import outbound_queue
+from app.services.sent_copy import sent_copy_service
+from app.services.smtp_pool import smtp_pool
+
+async def run_worker():
+    if settings.AUTO_CREATE_SCHEMA:
+        await asyncio.to_thread(Base.metadata.create_all, bind=engine)
+    sent_copy_service.resume()
+    print("📤 Outbound worker started, press Ctrl+C to stop")
+    try:
+        await outbound_queue.run()
+    finally:
+        await outbound_queue.stop()
+        await smtp_pool.close_all()
+        write_queue.stop()
+        await async_engine.dispose()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(run_worker())
+    except KeyboardInterrupt:
+        print("\n👋 Outbound worker stopped")
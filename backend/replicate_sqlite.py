@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Copy the primary SQLite database into replica files, for trying read-replica
+routing locally.
+
+Usage:
+    DATABASE_URL=sqlite:///./webmail.db \\
+    DATABASE_REPLICA_URLS='["sqlite:///./webmail-replica.db"]' uvicorn app.main:app
+    python replicate_sqlite.py [--interval 2]   # in another terminal
+
+Each copy uses SQLite's online backup, so it is consistent while the API
+keeps writing. A long --interval simulates a lagging replica: the API sees
+the lag and sends reads to the primary once it passes REPLICA_MAX_LAG_SECONDS.
+"""
+
+import argparse
+import sqlite3
+import time
+from sqlalchemy.engine import make_url
+from app.core.config import settings
+
+def sqlite_path(url: str) -> str:
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        raise SystemExit(f"Not a SQLite file URL: {url}")
+    return parsed.database
+
+def copy_database(primary: str, replica: str):
+    source = sqlite3.connect(f"file:{primary}?mode=ro", uri=True)
+    target = sqlite3.connect(replica, timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy the primary SQLite database into its replicas")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between copies")
+    parser.add_argument("--once", action="store_true", help="copy once and exit")
+    args = parser.parse_args()
+
+    primary = sqlite_path(settings.DATABASE_URL)
+    replicas = [sqlite_path(url) for url in settings.DATABASE_REPLICA_URLS]
+    if not replicas:
+        raise SystemExit("DATABASE_REPLICA_URLS is empty")
+
+    print(f"🔁 Copying {primary} to {', '.join(replicas)} every {args.interval}s, press Ctrl+C to stop")
+    while True:
+        for replica in replicas:
+            copy_database(primary, replica)
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n👋 Replication stopped")
@@ -378,14 +378,22 @@ const ComposeModal: React.FC<ComposeModalProps> = ({ currentAccount, onClose, mo
 
     setIsSending(true);
     try {
-      await emailAPI.sendMessage(currentAccount.id, {
+      const messageData = {
         to: to.split(',').map(email => email.trim()),
         cc: cc ? cc.split(',').map(email => email.trim()) : undefined,
         bcc: bcc ? bcc.split(',').map(email => email.trim()) : undefined,
         subject: subject,
         body_text: editorMode === 'text' ? textContent : undefined,
         body_html: editorMode === 'html' ? htmlContent : undefined
-      });
+      };
+
+      if (attachments.length > 0) {
+        await emailAPI.sendMessageWithAttachments(
+          currentAccount.id, messageData, attachments.map(attachment => attachment.file)
+        );
+      } else {
+        await emailAPI.sendMessage(currentAccount.id, messageData);
+      }
 
       alert('Message sent successfully!');
       onClose();
@@ -265,7 +265,11 @@ const EmailList: React.FC<EmailListProps> = ({
               
               <EmailMeta>
                 {message.has_attachments && (
-                  <AttachmentIcon>📎</AttachmentIcon>
+                  <AttachmentIcon
+                    title={message.attachment_count ? `${message.attachment_count} attachment(s)` : undefined}
+                  >
+                    📎
+                  </AttachmentIcon>
                 )}
               </EmailMeta>
             </EmailItem>
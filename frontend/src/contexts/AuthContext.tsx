@@ -48,6 +48,7 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
       console.error('Failed to fetch current user:', error);
       // Clear invalid token
       localStorage.removeItem('webmail-token');
+      localStorage.removeItem('webmail-refresh-token');
       setToken(null);
     } finally {
       setIsLoading(false);
@@ -57,10 +58,13 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
   const login = async (username: string, password: string) => {
     try {
       const response = await authAPI.login(username, password);
-      const { access_token } = response;
+      const { access_token, refresh_token } = response;
       
       setToken(access_token);
       localStorage.setItem('webmail-token', access_token);
+      if (refresh_token) {
+        localStorage.setItem('webmail-refresh-token', refresh_token);
+      }
       
       // Fetch user data
       await fetchCurrentUser(access_token);
@@ -70,9 +74,14 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
   };
 
   const logout = () => {
+    // Ends the server-side session too; the local logout does not wait for it
+    if (token) {
+      authAPI.logout(token).catch(() => {});
+    }
     setUser(null);
     setToken(null);
     localStorage.removeItem('webmail-token');
+    localStorage.removeItem('webmail-refresh-token');
   };
 
   const value: AuthContextType = {
@@ -18,12 +18,44 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
-// Handle token expiration
+// One renewal at a time; concurrent 401s wait for the same refresh
+let refreshing: Promise<string> | null = null;
+
+const refreshAccessToken = (): Promise<string> => {
+  if (!refreshing) {
+    const refreshToken = localStorage.getItem('webmail-refresh-token');
+    refreshing = (refreshToken
+      ? axios.post(`${BASE_URL}/auth/refresh`, { refresh_token: refreshToken }).then((response) => {
+          localStorage.setItem('webmail-token', response.data.access_token);
+          localStorage.setItem('webmail-refresh-token', response.data.refresh_token);
+          return response.data.access_token as string;
+        })
+      : Promise.reject(new Error('No refresh token'))
+    ).finally(() => {
+      refreshing = null;
+    });
+  }
+  return refreshing;
+};
+
+// Handle token expiration: renew once with the refresh token, then give up
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const request = error.config;
+    if (error.response?.status === 401 && request && !request._retried && !request.url?.startsWith('/auth/')) {
+      request._retried = true;
+      try {
+        const token = await refreshAccessToken();
+        request.headers.Authorization = `Bearer ${token}`;
+        return api(request);
+      } catch {
+        // fall through to the login page
+      }
+    }
     if (error.response?.status === 401) {
       localStorage.removeItem('webmail-token');
+      localStorage.removeItem('webmail-refresh-token');
       window.location.href = '/login';
     }
     return Promise.reject(error);
@@ -40,6 +72,9 @@ export interface EmailMessage {
   body_html?: string;
   is_read: boolean;
   has_attachments: boolean;
+  attachment_count?: number;
+  attachment_size?: number;
+  has_inline_images?: boolean;
   folder: string;
   thread_id?: string;
   message_id?: string;
@@ -75,6 +110,11 @@ export const authAPI = {
     return response.data;
   },
 
+  logout: async (token: string) => {
+    // Token passed explicitly: the caller clears localStorage right away
+    await axios.post(`${BASE_URL}/auth/logout`, null, { headers: { Authorization: `Bearer ${token}` } });
+  },
+
   getCurrentUser: async (token?: string) => {
     const config = token ? { headers: { Authorization: `Bearer ${token}` } } : {};
     const response: AxiosResponse = await api.get('/auth/me', config);
@@ -126,6 +166,31 @@ export const emailAPI = {
     );
     return response.data;
   },
+
+  sendMessageWithAttachments: async (accountId: number, messageData: {
+    to: string[];
+    cc?: string[];
+    bcc?: string[];
+    subject: string;
+    body_text?: string;
+    body_html?: string;
+  }, files: File[]) => {
+    const formData = new FormData();
+    formData.append('to', messageData.to.join(','));
+    formData.append('subject', messageData.subject);
+    if (messageData.cc) formData.append('cc', messageData.cc.join(','));
+    if (messageData.bcc) formData.append('bcc', messageData.bcc.join(','));
+    if (messageData.body_text) formData.append('body_text', messageData.body_text);
+    if (messageData.body_html) formData.append('body_html', messageData.body_html);
+    files.forEach(file => formData.append('files', file));
+
+    const response: AxiosResponse = await api.post(
+      `/emails/send/multipart?account_id=${accountId}`,
+      formData,
+      { headers: { 'Content-Type': 'multipart/form-data' } }
+    );
+    return response.data;
+  },
 };
 
 export interface ChatChannel {